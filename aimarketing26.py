@@ -7,10 +7,17 @@ import os
 import re
 import json
 import hashlib
+import io
+import time
+import contextvars
+import unicodedata
+from collections import OrderedDict
+import zipfile
 import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
 import streamlit as st
 from dotenv import load_dotenv
-from openai import OpenAI
 from openai import RateLimitError
 from crewai import Agent, Task, Crew
 
@@ -23,13 +30,86 @@ import yt_dlp
 # ETL OFICIAL
 from etl_ilumeo2 import executar_etl  # <<< ATENÇÃO: usa etl_ilumeo2
 
+# Áudio longo → segmentos transcritos em paralelo
+from audio_ilumeo import transcrever_com_tempos, verificar_cancelamento, TranscricaoCancelada
+
+# Segmentos com tempo (arrays compactos) → marcas [mm:ss] e links para o vídeo
+from segmentos_ilumeo import segmentos_de_legenda, texto_com_marcas, trechos_por_tokens, vincular_marcas
+
+# Armazém persistente de transcrições (por ID do vídeo + idioma)
+from transcricoes_ilumeo import (
+    buscar_transcricao,
+    buscar_por_hash_audio,
+    salvar_transcricao,
+    chave_audio,
+    hash_arquivo,
+    buscar_resumo_trecho,
+    salvar_resumo_trecho,
+)
+
+# Prompts de insights/canais (compartilhados com o modo em lote via Batch API)
+from conteudo_ilumeo import (
+    AGENTE_INSIGHTS,
+    AGENTE_CONTEUDO,
+    SAIDA_INSIGHTS,
+    CANAIS,
+    descricao_insights,
+    descricao_canal,
+    hash_canal,
+    mensagens_equivalentes,
+    validar_saida,
+    secoes_a_reparar,
+    substituir_secao,
+    descricao_reparo,
+    descricao_reparo_secao,
+    formato_resposta,
+    instrucao_estruturada,
+    ler_estruturado,
+    renderizar_canal,
+    validar_estruturado,
+)
+
+# Agendador das chamadas à OpenAI (limites RPM/TPM, prioridade, novas tentativas)
+from openai_ilumeo import (
+    chamar_openai,
+    cliente_openai,
+    prioridade,
+    metricas as metricas_openai,
+    PRIORIDADE_LOTE,
+)
+
+# Modelo por tarefa (faixa econômica/forte), escalonamento e relatório de custo
+from modelos_ilumeo import (
+    executar_roteado,
+    modelo_da_tarefa,
+    problemas_basicos,
+    somar_uso,
+    relatorio as relatorio_modelos,
+)
+
+# Contagem de tokens (tiktoken vem com o litellm/crewai; sem ele, estimativa)
+try:
+    import tiktoken
+    _CODIFICADOR = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _CODIFICADOR = None
+
 # -------------------------------------------------------------------------------------------------------------
 # CONFIG
 # -------------------------------------------------------------------------------------------------------------
 load_dotenv()
 #os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY") para uso em máquina local
 st.set_page_config(page_title="ILUMEO - AI Marketing", layout="wide")
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Um cliente (e um pool de conexões HTTP) por processo, não um por rerun.
+# As novas tentativas ficam a cargo do agendador (openai_ilumeo), não do SDK.
+@st.cache_resource
+def _cliente_openai():
+    return cliente_openai(os.getenv("OPENAI_API_KEY"))
+
+client = _cliente_openai()
+
+# Reserva de saída somada à entrada na estimativa de tokens de cada chamada
+TOKENS_RESPOSTA_ESTIMADOS = 1500
 
 # -------------------------------------------------------------------------------------------------------------
 # CSS — PERSONALIZAÇÃO ILUMEO
@@ -94,14 +174,11 @@ st.markdown(
 # ESTADOS
 # -------------------------------------------------------------------------------------------------------------
 defaults = {
-    "json_etl": "",
+    "etl_chave": "",  # handle do resultado no cache compartilhado do ETL
     "insights": "",
-    "conteudos_multicanais": "",
-    "etl_logs": [],
-    "t_simples": {},
-    "t_multi": {},
-    "t_matriz": {},
-    "t_nota": {},
+    "conteudos_canais": {},  # canal → {"texto", "hash" do prompt, "pendencias", "dados" (JSON)}
+    "conteudos_estruturados": False,  # canais em JSON schema, renderizados localmente
+    "canais_pedidos": [],  # canais a regenerar na próxima execução (botões por canal)
 
     # <<< GOVERNANÇA DE IA: só consome token sob demanda
     "autorizar_insights": False,
@@ -113,6 +190,12 @@ defaults = {
     "yt_transcricao": "",
     "yt_blog": "",
     "yt_origem_transcricao": "",  # "legenda" | "upload"
+    "yt_segmentos": None,  # Segmentos com tempo da transcrição atual (se houver)
+    "yt_transcricao_ativa": None,  # (url, threading.Event) da transcrição em andamento
+
+    # YOUTUBE — LOTE
+    "yt_lote": "",
+    "yt_lote_resultados": [],
 }
 
 for k, v in defaults.items():
@@ -125,6 +208,24 @@ for k, v in defaults.items():
 def _hash_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
+# Uploads são copiados em blocos fixos, sem montar outra cópia inteira em memória
+TAMANHO_BLOCO_UPLOAD = 1024 * 1024
+
+# Idioma pedido às legendas/Whisper e usado como chave no armazém de transcrições
+IDIOMA_TRANSCRICAO = "pt"
+
+def _salvar_upload(uploaded_file, destino) -> str:
+    """Copia o upload em blocos e devolve o sha256 do conteúdo."""
+    uploaded_file.seek(0)
+    sha = hashlib.sha256()
+    while True:
+        bloco = uploaded_file.read(TAMANHO_BLOCO_UPLOAD)
+        if not bloco:
+            break
+        sha.update(bloco)
+        destino.write(bloco)
+    return sha.hexdigest()
+
 def validar_url_youtube(url: str) -> bool:
     if not url:
         return False
@@ -132,10 +233,10 @@ def validar_url_youtube(url: str) -> bool:
     return re.search(pattern, url) is not None
 
 def extrair_video_id(url: str) -> str | None:
-    m = re.search(r"[?&]v=([^&]+)", url)
+    m = re.search(r"[?&]v=([\w\-]+)", url)
     if m:
         return m.group(1)
-    m = re.search(r"youtu\.be/([^?&]+)", url)
+    m = re.search(r"youtu\.be/([\w\-]+)", url)
     if m:
         return m.group(1)
     return None
@@ -144,117 +245,183 @@ def extrair_video_id(url: str) -> str | None:
 # IA — INSIGHTS PROFUNDOS COM CRUZAMENTO
 # -------------------------------------------------------------------------------------------------------------
 def gerar_insights(json_text):
-    agente = Agent(
-        role="Analista de Mercado e Inteligência Competitiva Sênior",
-        goal=("Realizar análise profunda, cruzada e estratégica do JSON,"
-              "identificando padrões, clusters, motivações, barreiras e oportunidades."
-            ),
-        backstory=("Especialista em comportamento do consumidor, marketing estratégico, "
-                   "estatística de pesquisa e análise de frequência."
-                  ),
-    )
+    def gerar(modelo):
+        agente = Agent(**AGENTE_INSIGHTS, llm=modelo)
+
+        tarefa = Task(
+            description=descricao_insights(json_text),
+            expected_output=SAIDA_INSIGHTS,
+            agent=agente,
+        )
+
+        equipe = Crew(agents=[agente], tasks=[tarefa])
+        resultado = chamar_openai(
+            equipe.kickoff, tokens=contar_tokens(json_text) + TOKENS_RESPOSTA_ESTIMADOS
+        )
+        return resultado.raw, resultado
+
+    def reparar(modelo, texto, problemas):
+        return _chamar_agente(modelo, AGENTE_INSIGHTS, descricao_reparo(texto, problemas), SAIDA_INSIGHTS)
 
-    tarefa = Task(
-        description=(
-                    "Seu objetivo é gerar INSIGHTS PROFUNDOS e estratégicos a partir dos dados da pesquisa. "
-                    "Não use expressões referenciais como:\n"
-                    "“conforme acima”, “como visto”, “analisado anteriormente”, "
-                    "“segue abaixo”, “resultado da análise”.\n\n"
-
-            "Você receberá o JSON completo contendo tabelas de frequências, múltiplas respostas, "
-            "matriz de texto e matriz de notas. Realize uma ANÁLISE PROFUNDA REAL, com cruzamento de dados "
-            "entre perguntas, comparações entre categorias, interpretação de padrões e hipóteses de comportamento.\n\n"
-            "Identifique:\n"
-            "- Tendências e padrões fortes\n"
-            "- Contradições e comportamentos divergentes\n"
-            "- Barreiras, gatilhos e drivers de decisão\n"
-            "- Oportunidades estratégicas para marketing\n"
-            "- Relações ocultas entre respostas\n"
-            "- Segmentações implícitas ou grupos naturais\n\n"
-            "- Detalhe clusterizações específicas\n\n"
-            "- Faça análises cruzadas entre perfil socioeconômico e comportamento de consumo\n\n"
-            "Use linguagem clara, humana, estratégica e orientada a marketing.\n\n"
-            "JSON:\n"
-            f"{json_text}"
-        ),
-        expected_output=("Insight completo, estratégico, profundo e humanizado."),
-        agent=agente,
+    return executar_roteado(
+        "insights", gerar, validar=lambda texto: validar_saida("insights", texto), reparar=reparar
     )
 
-    equipe = Crew(agents=[agente], tasks=[tarefa])
-    resultado = equipe.kickoff()
-    return resultado.raw
+def _chamar_agente(modelo: str, agente: dict, descricao: str, esperado: str, **parametros):
+    """Agente + tarefa numa chamada de chat direta, sem Crew (reparos e saída estruturada)."""
+    resposta = chamar_openai(
+        client.chat.completions.create,
+        tokens=contar_tokens(descricao) + TOKENS_RESPOSTA_ESTIMADOS,
+        model=modelo,
+        messages=mensagens_equivalentes(agente, descricao, esperado),
+        temperature=0.0,
+        **parametros,
+    )
+    return resposta.choices[0].message.content.strip(), resposta
 
 # -------------------------------------------------------------------------------------------------------------
 # IA — CONTEÚDOS MULTICANAIS
 # -------------------------------------------------------------------------------------------------------------
-def carregar_prompt(nome_arquivo: str) -> str:
-    caminho = os.path.join("prompts", nome_arquivo)
-    with open(caminho, "r", encoding="utf-8") as f:
-        return f.read().strip()
-
-def gerar_conteudos_multicanais(insights):
-    agente = Agent(
-        role="Especialista em Conteúdo Multicanal baseado em Insights de Dados",
-        goal="Gerar conteúdos editoriais por canal a partir de insights de pesquisa.",
-        backstory="Especialista em branding, marketing, jornalismo e escrita executiva.",
+def _gerar_canal(chave: str, arquivo: str, esperado: str, insights: str) -> str:
+    def gerar(modelo):
+        agente = Agent(**AGENTE_CONTEUDO, llm=modelo)
+        tarefa = Task(
+            description=descricao_canal(arquivo, insights),
+            expected_output=esperado,
+            agent=agente,
+        )
+        resultado = chamar_openai(
+            Crew(agents=[agente], tasks=[tarefa]).kickoff,
+            tokens=contar_tokens(insights) + TOKENS_RESPOSTA_ESTIMADOS,
+        )
+        return resultado.raw, resultado
+
+    def reparar(modelo, texto, problemas):
+        # One Page com a estrutura certa: refaz só as seções que falharam
+        secoes = secoes_a_reparar(chave, texto)
+        if not secoes:
+            return _chamar_agente(modelo, AGENTE_CONTEUDO, descricao_reparo(texto, problemas), esperado)
+
+        respostas = []
+        for titulo, (corpo, problemas_secao) in secoes.items():
+            novo, resposta = _chamar_agente(
+                modelo, AGENTE_CONTEUDO, descricao_reparo_secao(titulo, corpo, problemas_secao),
+                "Apenas os bullets da seção.",
+            )
+            texto = substituir_secao(texto, titulo, novo)
+            respostas.append(resposta)
+        return texto, somar_uso(respostas)
+
+    return executar_roteado(
+        chave, gerar, validar=lambda texto: validar_saida(chave, texto), reparar=reparar
     )
 
-    tarefas = [
-        Task(
-            description=f"{carregar_prompt('linkedin.txt')}\n\nINSIGHTS:\n{insights}",
-            expected_output=("Texto final para LinkedIn, "
-                             "sem frases introdutórias ou explicativas, "
-                             "pronto para publicação."),
-            agent=agente,
-        ),
-        Task(
-            description=f"{carregar_prompt('blog.txt')}\n\nINSIGHTS:\n{insights}",
-            expected_output=("Artigo completo para Blog, "
-                             "estruturado com título, introdução, subtítulos e conclusão, "
-                             "sem explicações sobre o processo de escrita."),
-            agent=agente,
-        ),
-        Task(
-            description=f"{carregar_prompt('one_page.txt')}\n\nINSIGHTS:\n{insights}",
-            expected_output=("Apenas a ONE PAGE EXECUTIVA final, "
-                             "começando diretamente em '### Dados', "
-                             "sem qualquer frase introdutória, explicativa ou de encerramento."),
-            agent=agente,
-        ),
-        Task(
-            description=f"{carregar_prompt('release.txt')}\n\nINSIGHTS:\n{insights}",
-            expected_output=("Texto completo do RELEASE jornalístico, "
-                             "começando diretamente pelo TÍTULO, "
-                             "seguindo a estrutura exigida, "
-                             "sem qualquer frase explicativa, referencial ou metalinguística."),
-            agent=agente,
-        ),
-    ]
+def _gerar_canal_estruturado(chave: str, arquivo: str, esperado: str, insights: str) -> str:
+    """JSON do canal (response_format com JSON schema); reparos também em JSON."""
+    instrucao = instrucao_estruturada(chave)
+    formato = formato_resposta(chave)
+
+    def gerar(modelo):
+        descricao = f"{descricao_canal(arquivo, insights)}\n\n{instrucao}"
+        return _chamar_agente(
+            modelo, AGENTE_CONTEUDO, descricao, esperado, response_format=formato
+        )
 
-    crew = Crew(agents=[agente], tasks=tarefas)
-    crew.kickoff()
+    def reparar(modelo, texto, problemas):
+        descricao = f"{descricao_reparo(texto, problemas)}\n\n{instrucao}"
+        return _chamar_agente(modelo, AGENTE_CONTEUDO, descricao, esperado, response_format=formato)
 
-    return (
-        "## LinkedIn\n\n" + tarefas[0].output.raw +
-        "\n\n---\n\n## Blog\n\n" + tarefas[1].output.raw +
-        "\n\n---\n\n## One Page Executiva\n\n" + tarefas[2].output.raw +
-        "\n\n---\n\n## Release\n\n" + tarefas[3].output.raw
+    return executar_roteado(
+        chave, gerar, validar=lambda texto: validar_estruturado(chave, texto), reparar=reparar
     )
 
+def _hashes_canais(insights: str, estruturado: bool = False) -> dict:
+    formato = "json" if estruturado else "texto"
+    return {
+        chave: hash_canal(chave, insights, modelo_da_tarefa(chave), formato)
+        for chave, _, _, _ in CANAIS
+    }
+
+def canais_desatualizados(insights: str, canais: dict, estruturado: bool = False) -> list[str]:
+    """Canais gerados com outro prompt (ou outros insights/modelo/formato) que o atual."""
+    hashes = _hashes_canais(insights, estruturado)
+    return [chave for chave, item in canais.items() if item["hash"] != hashes[chave]]
+
+def gerar_conteudos_multicanais(insights, anteriores=None, forcar=(), estruturado=False):
+    """Gera só os canais que faltam em ``anteriores`` ou estão em ``forcar``.
+
+    Cada canal fica em separado: {canal: {"texto", "hash", "pendencias",
+    "dados"}}, com o hash do prompt em que foi gerado e o que seguiu inválido
+    após os reparos. Com ``estruturado`` o modelo responde em JSON schema
+    (``dados``: título, seções, bullets) e o markdown é montado aqui.
+    Devolve o dicionário atualizado.
+    """
+    canais = dict(anteriores or {})
+    hashes = _hashes_canais(insights, estruturado)
+    gerar_canal = _gerar_canal_estruturado if estruturado else _gerar_canal
+    refazer = [
+        (chave, arquivo, esperado)
+        for chave, _, arquivo, esperado in CANAIS
+        if chave in forcar or chave not in canais
+    ]
+    if not refazer:
+        return canais
+
+    # uma chamada por canal (cada uma no modelo da sua rota), em paralelo
+    with ThreadPoolExecutor(max_workers=len(refazer)) as pool:
+        futuros = {
+            chave: pool.submit(
+                contextvars.copy_context().run, gerar_canal, chave, arquivo, esperado, insights
+            )
+            for chave, arquivo, esperado in refazer
+        }
+        for chave, futuro in futuros.items():
+            texto = futuro.result()
+            dados = None
+            if estruturado:
+                dados, _ = ler_estruturado(texto)
+                pendencias = validar_estruturado(chave, texto)
+                texto = renderizar_canal(chave, dados) if dados else texto
+            else:
+                pendencias = validar_saida(chave, texto)
+            canais[chave] = {"texto": texto, "hash": hashes[chave], "pendencias": pendencias, "dados": dados}
+    return canais
+
 # -------------------------------------------------------------------------------------------------------------
 # YOUTUBE → TRANSCRIÇÃO (Legenda → Upload)
 # (No Streamlit Community Cloud, yt-dlp tende a falhar com 403)
 # -------------------------------------------------------------------------------------------------------------
-def _transcrever_por_legenda(url: str) -> str:
+def _transcrever_por_legenda(url: str):
+    """Legendas do vídeo como Segmentos (tempos preservados, linhas repetidas removidas)."""
     video_id = extrair_video_id(url)
     if not video_id:
         raise ValueError("Não foi possível extrair o ID do vídeo a partir da URL.")
 
-    transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=["pt", "pt-BR", "pt-PT", "en"])
-    return " ".join([item.get("text", "") for item in transcript]).strip()
+    transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=[IDIOMA_TRANSCRICAO, "pt-BR", "pt-PT", "en"])
+    return segmentos_de_legenda(transcript)
+
+def _whisper_arquivo(caminho: str) -> list[tuple[float, float, str]]:
+    """Whisper com tempos: lista de (início, duração, texto) por segmento."""
+    with open(caminho, "rb") as audio:
+        transcription = chamar_openai(
+            client.audio.transcriptions.create,
+            file=audio,
+            model="whisper-1",
+            language=IDIOMA_TRANSCRICAO,
+            response_format="verbose_json",
+            timestamp_granularities=["segment"],
+        )
+    return [(seg.start, seg.end - seg.start, seg.text) for seg in (transcription.segments or [])]
+
+def _transcrever_por_whisper(url: str, cancelar: threading.Event | None = None) -> tuple:
+    """Baixa o áudio e transcreve; devolve (texto, segmentos, sha256 do áudio baixado).
+
+    Com ``cancelar`` ligado o download é abortado no próximo bloco recebido
+    e os segmentos ainda não enviados ao Whisper são descartados.
+    """
+    def _checar_download(_progresso):
+        verificar_cancelamento(cancelar)
 
-def _transcrever_por_whisper(url: str) -> str:
     with tempfile.TemporaryDirectory() as tmpdir:
         ydl_opts = {
             "format": "bestaudio/best",
@@ -275,10 +442,10 @@ def _transcrever_por_whisper(url: str) -> str:
             "extractor_args": {"youtube": {"player_client": ["android", "web"]}},
             "retries": 3,
             "fragment_retries": 3,
+            "progress_hooks": [_checar_download],
 
-            "postprocessors": [
-                {"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "192"}
-            ],
+            # sem pós-processamento: o áudio baixado vai direto para o
+            # preparar_audio (mono 16 kHz), numa única passada do FFmpeg
         }
 
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
@@ -286,34 +453,57 @@ def _transcrever_por_whisper(url: str) -> str:
 
         audio_file = None
         for f in os.listdir(tmpdir):
-            if f.lower().endswith(".mp3"):
+            if not f.endswith((".part", ".ytdl")):
                 audio_file = os.path.join(tmpdir, f)
                 break
 
         if not audio_file:
-            raise FileNotFoundError("MP3 não foi gerado pelo yt-dlp.")
+            raise FileNotFoundError("Áudio não foi baixado pelo yt-dlp.")
 
-        with open(audio_file, "rb") as audio:
-            transcription = client.audio.transcriptions.create(
-                file=audio, model="whisper-1", language="pt"
-            )
-    return transcription.text.strip()
+        # mesmo áudio já transcrito (ex.: enviado antes como upload)
+        verificar_cancelamento(cancelar)
+        hash_audio = hash_arquivo(audio_file)
+        salvo = buscar_por_hash_audio(hash_audio, IDIOMA_TRANSCRICAO)
+        if salvo:
+            return salvo["texto"], salvo["segmentos"], hash_audio
+
+        segmentos = transcrever_com_tempos(audio_file, _whisper_arquivo, cancelar=cancelar)
+        return segmentos.texto, segmentos, hash_audio
+
+
+def _transcrever_upload_whisper(uploaded_file, video_id: str | None = None,
+                                cancelar: threading.Event | None = None) -> tuple:
+    """Transcreve o upload, reaproveitando qualquer transcrição salva do mesmo áudio.
 
+    Devolve (texto, segmentos com tempo ou None).
 
-def _transcrever_upload_whisper(uploaded_file) -> str:
+    O sha256 é calculado enquanto o arquivo é copiado. O resultado fica no
+    armazém sob o video_id (se houver) ou sob a chave do próprio áudio.
+    """
     suffix = os.path.splitext(uploaded_file.name)[1].lower() or ".mp3"
     with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(uploaded_file.getbuffer())
+        hash_audio = _salvar_upload(uploaded_file, tmp)
         tmp_path = tmp.name
 
     try:
-        with open(tmp_path, "rb") as audio:
-            transcription = client.audio.transcriptions.create(
-                file=audio,
-                model="whisper-1",
-                language="pt",
+        salvo = buscar_por_hash_audio(hash_audio, IDIOMA_TRANSCRICAO)
+        if salvo:
+            texto, segmentos = salvo["texto"], salvo["segmentos"]
+            if video_id and salvo["video_id"] != video_id:
+                salvar_transcricao(
+                    video_id, texto, "upload", IDIOMA_TRANSCRICAO,
+                    hash_audio=hash_audio, segmentos=segmentos,
+                )
+            return texto, segmentos
+
+        segmentos = transcrever_com_tempos(tmp_path, _whisper_arquivo, cancelar=cancelar)
+        texto = segmentos.texto
+        if texto:
+            salvar_transcricao(
+                video_id or chave_audio(hash_audio), texto, "upload", IDIOMA_TRANSCRICAO,
+                hash_audio=hash_audio, segmentos=segmentos,
             )
-        return transcription.text.strip()
+        return texto, segmentos
     finally:
         try:
             os.remove(tmp_path)
@@ -321,39 +511,236 @@ def _transcrever_upload_whisper(uploaded_file) -> str:
             pass
 
 
-@st.cache_data(show_spinner=False)
-def transcrever_video_youtube_cacheada(url: str, uploaded_name: str | None) -> dict:
-    # 1) Legenda
-    try:
-        texto = _transcrever_por_legenda(url)
-        if texto:
-            return {"texto": texto, "origem": "legenda"}
-    except (TranscriptsDisabled, NoTranscriptFound, ValueError):
-        pass
-    except Exception:
-        pass
+# Intervalo em que a corrida Legenda × Whisper confere o sinal de cancelamento
+INTERVALO_CANCELAMENTO = 0.5
+
+
+def _aguardar(futuro, ao_aguardar=None):
+    """Resultado de ``futuro``, chamando ``ao_aguardar()`` a cada intervalo de espera."""
+    while not wait([futuro], timeout=INTERVALO_CANCELAMENTO).done:
+        if ao_aguardar is not None:
+            ao_aguardar()
+    return futuro.result()
+
+
+def transcrever_video_youtube_cacheada(url: str, uploaded_name: str | None,
+                                       cancelar: threading.Event | None = None,
+                                       ao_aguardar=None) -> dict:
+    # ``ao_aguardar`` é chamado a cada volta da espera; no app ele atualiza um
+    # st.empty(), que é onde o Streamlit consegue interromper o script num rerun
+    # 0) Armazém persistente: mesmo vídeo em qualquer formato de URL, entre reinícios
+    video_id = extrair_video_id(url)
+    if video_id:
+        salvo = buscar_transcricao(video_id, IDIOMA_TRANSCRICAO)
+        if salvo:
+            return {
+                "texto": salvo["texto"],
+                "origem": salvo["origem"],
+                "segmentos": salvo["segmentos"],
+                "armazenada": True,
+            }
+
+    # 1) Legenda e 2) Whisper por URL (yt-dlp hardened) começam juntos: o
+    # download do áudio é o trecho mais lento e não espera a legenda falhar.
+    # Vence o primeiro que devolver texto; o outro caminho é cancelado.
+    parar_audio = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=2)
+    fut_legenda = pool.submit(contextvars.copy_context().run, _transcrever_por_legenda, url)
+    fut_audio = pool.submit(contextvars.copy_context().run, _transcrever_por_whisper, url, parar_audio)
+    pendentes = {fut_legenda, fut_audio}
+    erro_audio = None
 
-    # 2) Whisper por URL (yt-dlp hardened)
     try:
-        texto = _transcrever_por_whisper(url)
-        if texto:
-            return {"texto": texto, "origem": "whisper"}
-    except Exception:
-        # 3) Fallback upload
-        if uploaded_name:
-            return {"texto": "", "origem": "upload_pendente"}
-        raise
+        while pendentes:
+            if cancelar is not None and cancelar.is_set():
+                raise TranscricaoCancelada("Transcrição cancelada: a URL mudou.")
+            prontos, pendentes = wait(pendentes, timeout=INTERVALO_CANCELAMENTO, return_when=FIRST_COMPLETED)
+            if not prontos and ao_aguardar is not None:
+                ao_aguardar()
+
+            if fut_legenda in prontos:
+                try:
+                    segmentos = fut_legenda.result()
+                except (TranscriptsDisabled, NoTranscriptFound, ValueError):
+                    segmentos = None
+                except Exception:
+                    segmentos = None
+                if segmentos is not None and segmentos.texto:
+                    texto = segmentos.texto
+                    salvar_transcricao(video_id, texto, "legenda", IDIOMA_TRANSCRICAO, segmentos=segmentos)
+                    return {"texto": texto, "origem": "legenda", "segmentos": segmentos}
+
+            if fut_audio in prontos:
+                try:
+                    texto, segmentos, hash_audio = fut_audio.result()
+                    if not texto:
+                        raise ValueError("Whisper devolveu uma transcrição vazia.")
+                except Exception as e:
+                    erro_audio = e
+                else:
+                    if video_id:
+                        salvar_transcricao(
+                            video_id, texto, "whisper", IDIOMA_TRANSCRICAO,
+                            hash_audio=hash_audio, segmentos=segmentos,
+                        )
+                    return {"texto": texto, "origem": "whisper", "segmentos": segmentos}
+    finally:
+        parar_audio.set()
+        pool.shutdown(wait=False)
+
+    # 3) Fallback upload
+    if uploaded_name:
+        return {"texto": "", "origem": "upload_pendente", "segmentos": None}
+    raise erro_audio
+
+
+def _iniciar_transcricao(url: str) -> threading.Event:
+    """Registra a transcrição desta URL e devolve o sinal que a cancela."""
+    cancelar = threading.Event()
+    st.session_state["yt_transcricao_ativa"] = (url, cancelar)
+    return cancelar
+
+def _cancelar_transcricao_de_outra_url(url: str) -> None:
+    # com fastReruns o Streamlit inicia a nova execução enquanto a anterior
+    # ainda está bloqueada na transcrição: o sinal é o que a faz parar
+    ativa = st.session_state.get("yt_transcricao_ativa")
+    if ativa and ativa[0] != url:
+        ativa[1].set()
+        st.session_state["yt_transcricao_ativa"] = None
 
 
 # -------------------------------------------------------------------------------------------------------------
 # IA — TRANSCRIÇÃO → BLOG (cache por hash)
 # -------------------------------------------------------------------------------------------------------------
+# Transcrições acima deste tamanho passam pelo modo hierárquico:
+# trechos resumidos em paralelo (rota "resumo_trecho", modelo barato) → blog a partir do roteiro
+LIMITE_TOKENS_BLOG_DIRETO = 12000
+TOKENS_POR_TRECHO = 3000
+MAX_RESUMOS_SIMULTANEOS = 4
+VERSAO_PROMPT_RESUMO = "v2"  # mude ao alterar o prompt para invalidar os resumos salvos
+
 @st.cache_data(show_spinner=False)
-def gerar_blog_a_partir_transcricao_cacheado(transcricao: str) -> str:
+def gerar_blog_a_partir_transcricao_cacheado(transcricao: str, url_video: str = "", _segmentos=None) -> str:
+    """Blog a partir da transcrição.
+
+    Com ``_segmentos`` (mesmo texto, com tempos) os trechos respeitam os
+    limites dos segmentos, a IA recebe marcas [mm:ss] e as citações do post
+    viram links para o momento do vídeo em ``url_video``. O sublinhado tira
+    os segmentos da chave do cache: o texto já os identifica.
+    """
     _ = _hash_text(transcricao)
+    longa = contar_tokens(transcricao) > LIMITE_TOKENS_BLOG_DIRETO
+
+    if _segmentos is None or not len(_segmentos):
+        if longa:
+            return _gerar_blog_hierarquico(dividir_em_trechos(transcricao))
+        return _gerar_blog(transcricao)
+
+    if longa:
+        blog = _gerar_blog_hierarquico(
+            trechos_por_tokens(_segmentos, TOKENS_POR_TRECHO, contar_tokens), com_tempo=True
+        )
+    else:
+        blog = _gerar_blog(texto_com_marcas(_segmentos), com_tempo=True)
+    return vincular_marcas(blog, url_video) if url_video else blog
+
+def contar_tokens(texto: str) -> int:
+    if _CODIFICADOR is not None:
+        return len(_CODIFICADOR.encode(texto, disallowed_special=()))
+    return len(texto) // 4 + 1
+
+def _agrupar_por_tokens(unidades: list[str], max_tokens: int) -> list[str]:
+    grupos, atual, tokens = [], [], 0
+    for unidade in unidades:
+        n = contar_tokens(unidade)
+        if atual and tokens + n > max_tokens:
+            grupos.append(" ".join(atual))
+            atual, tokens = [], 0
+        atual.append(unidade)
+        tokens += n
+    if atual:
+        grupos.append(" ".join(atual))
+    return grupos
+
+def dividir_em_trechos(texto: str, max_tokens: int = TOKENS_POR_TRECHO) -> list[str]:
+    """Corta o texto em trechos de até ``max_tokens``, preferindo fim de frase.
+
+    Legendas automáticas quase não têm pontuação: frases maiores que o
+    limite são cortadas por palavras.
+    """
+    unidades = []
+    for frase in re.split(r"(?<=[.!?])\s+", texto.strip()):
+        if contar_tokens(frase) > max_tokens:
+            unidades += _agrupar_por_tokens(frase.split(), max_tokens)
+        elif frase:
+            unidades.append(frase)
+    return _agrupar_por_tokens(unidades, max_tokens)
+
+def _resumir_trecho(trecho: str, indice: int, total: int) -> str:
+    chave = _hash_text(f"{VERSAO_PROMPT_RESUMO}|{modelo_da_tarefa('resumo_trecho')}|{trecho}")
+    salvo = buscar_resumo_trecho(chave)
+    if salvo is not None:
+        return salvo
+
+    resumo = executar_roteado("resumo_trecho", lambda modelo: _chamar_resumo(modelo, trecho, indice, total))
+    salvar_resumo_trecho(chave, resumo)
+    return resumo
+
+def _chamar_resumo(modelo: str, trecho: str, indice: int, total: int):
+    resposta = chamar_openai(
+        client.chat.completions.create,
+        tokens=contar_tokens(trecho) + TOKENS_RESPOSTA_ESTIMADOS,
+        model=modelo,
+        messages=[
+            {"role": "user",
+             "content": f"""
+Este é o trecho {indice} de {total} da transcrição de um vídeo.
+Resuma em tópicos curtos as ideias, argumentos, dados e exemplos do trecho,
+na ordem em que aparecem. Preserve números, nomes e citações relevantes.
+Se o trecho tiver marcas de tempo [mm:ss], comece cada tópico com a marca
+mais próxima de onde a ideia aparece.
+Não invente nada que não esteja no trecho.
+
+TRECHO:
+{trecho}
+""".strip(),
+            }
+        ],
+        temperature=0.0,
+    )
+    return resposta.choices[0].message.content.strip(), resposta
+
+def _gerar_blog_hierarquico(trechos: list[str], com_tempo: bool = False) -> str:
+    # map: resumos por trecho em paralelo (já resumidos saem do armazém)
+    with ThreadPoolExecutor(max_workers=MAX_RESUMOS_SIMULTANEOS) as pool:
+        futuros = [
+            pool.submit(contextvars.copy_context().run, _resumir_trecho, trecho, i, len(trechos))
+            for i, trecho in enumerate(trechos, start=1)
+        ]
+        resumos = [f.result() for f in futuros]
+
+    # reduce: o blog sai do roteiro consolidado, não da transcrição inteira
+    roteiro = "\n\n".join(f"PARTE {i}:\n{r}" for i, r in enumerate(resumos, start=1))
+    return _gerar_blog(
+        roteiro, rotulo="ROTEIRO DO VÍDEO (resumos das partes, em ordem)", com_tempo=com_tempo
+    )
+
+def _gerar_blog(transcricao: str, rotulo: str = "TRANSCRIÇÃO", com_tempo: bool = False) -> str:
+    regra_citacoes = (
+        "\n- O texto tem marcas de tempo [mm:ss]: não as use no corpo do post"
+        "\n- Ao final, inclua a seção \"Trechos em destaque\" com 2 a 4 citações"
+        " literais curtas, cada uma seguida da marca [mm:ss] de onde aparece"
+        if com_tempo else ""
+    )
+    return executar_roteado(
+        "blog_youtube", lambda modelo: _chamar_blog(modelo, transcricao, rotulo, regra_citacoes)
+    )
 
-    resposta = client.chat.completions.create(
-        model="gpt-4o",
+def _chamar_blog(modelo: str, transcricao: str, rotulo: str, regra_citacoes: str):
+    resposta = chamar_openai(
+        client.chat.completions.create,
+        tokens=contar_tokens(transcricao) + TOKENS_RESPOSTA_ESTIMADOS,
+        model=modelo,
         messages=[
             {"role": "user",
              "content": f"""
@@ -368,9 +755,9 @@ Regras:
     • Introdução
     • Subtítulos
     • Desenvolvimento
-    • Conclusão
+    • Conclusão{regra_citacoes}
 
-TRANSCRIÇÃO:
+{rotulo}:
 {transcricao}
 """.strip(),
             }
@@ -378,20 +765,358 @@ TRANSCRIÇÃO:
         temperature=0.0,
     )
 
-    return resposta.choices[0].message.content
+    return resposta.choices[0].message.content, resposta
+
+# -------------------------------------------------------------------------------------------------------------
+# YOUTUBE — LOTE (PLAYLIST / CANAL / LISTA DE URLs → BLOGS)
+# -------------------------------------------------------------------------------------------------------------
+MAX_VIDEOS_LOTE = 50
+MAX_VIDEOS_SIMULTANEOS = 3
+
+def _expandir_playlist(url: str, limite: int) -> list[str]:
+    """Lista as URLs dos vídeos de uma playlist ou canal, sem baixar nada."""
+    ydl_opts = {
+        "quiet": True,
+        "no_warnings": True,
+        "extract_flat": "in_playlist",
+        "playlistend": limite,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    urls = []
+    pilha = list(info.get("entries") or [])
+    while pilha and len(urls) < limite:
+        item = pilha.pop(0)
+        if not item:
+            continue
+        # canais vêm em abas (Vídeos, Shorts...), cada uma com seus próprios itens
+        if item.get("entries"):
+            pilha = list(item["entries"]) + pilha
+        elif item.get("_type") == "playlist" or "/playlist" in (item.get("url") or ""):
+            urls += _expandir_playlist(item["url"], limite - len(urls))
+        elif item.get("id"):
+            urls.append(f"https://www.youtube.com/watch?v={item['id']}")
+    return urls[:limite]
+
+def listar_videos_lote(texto: str, limite: int = MAX_VIDEOS_LOTE) -> list[str]:
+    """Uma URL por linha (ou separadas por vírgula); playlists e canais são expandidos.
+
+    Vídeos repetidos (mesmo ID em formatos de URL diferentes) entram uma vez.
+    """
+    urls = []
+    for bruto in re.split(r"[\s,]+", texto or ""):
+        bruto = bruto.strip()
+        if not bruto:
+            continue
+        if re.search(r"[?&]list=|/playlist|/@|/channel/|/c/|/user/", bruto):
+            urls += _expandir_playlist(bruto, limite)
+        elif validar_url_youtube(bruto):
+            urls.append(bruto)
+
+    vistos = set()
+    unicos = []
+    for url in urls:
+        video_id = extrair_video_id(url) or url
+        if video_id not in vistos:
+            vistos.add(video_id)
+            unicos.append(url)
+    return unicos[:limite]
+
+def _processar_video_lote(url: str) -> dict:
+    resultado = {
+        "url": url,
+        "video_id": extrair_video_id(url) or "",
+        "status": "ok",
+        "origem": "",
+        "armazenada": False,
+        "tempo_transcricao_s": 0.0,
+        "tempo_blog_s": 0.0,
+        "erro": "",
+        "transcricao": "",
+        "blog": "",
+    }
+
+    inicio = time.perf_counter()
+    try:
+        out = transcrever_video_youtube_cacheada(url, None)
+        resultado["transcricao"] = out["texto"]
+        resultado["origem"] = out["origem"]
+        resultado["armazenada"] = out.get("armazenada", False)
+        segmentos = out.get("segmentos")
+    except Exception as e:
+        resultado["status"] = "falha na transcrição"
+        resultado["erro"] = str(e)
+        return resultado
+    finally:
+        resultado["tempo_transcricao_s"] = round(time.perf_counter() - inicio, 2)
+
+    inicio = time.perf_counter()
+    try:
+        resultado["blog"] = gerar_blog_a_partir_transcricao_cacheado(
+            resultado["transcricao"], url, segmentos
+        )
+    except Exception as e:
+        resultado["status"] = "falha no blog"
+        resultado["erro"] = str(e)
+    finally:
+        resultado["tempo_blog_s"] = round(time.perf_counter() - inicio, 2)
+
+    return resultado
+
+def processar_lote_youtube(urls: list[str], max_simultaneos: int = MAX_VIDEOS_SIMULTANEOS,
+                           ao_concluir=None) -> list[dict]:
+    """Transcreve e gera o blog de cada vídeo com no máximo ``max_simultaneos`` em paralelo.
+
+    Vídeos já presentes no armazém de transcrições não voltam ao Whisper, e
+    blogs de transcrições idênticas saem do cache. ``ao_concluir(feitos,
+    total, resultado)`` é chamado na thread principal a cada vídeo concluído.
+    Os resultados voltam na ordem de ``urls``.
+    """
+    resultados = [None] * len(urls)
+    with ThreadPoolExecutor(max_workers=max_simultaneos) as pool:
+        # chamadas do lote esperam na fila da OpenAI atrás das telas interativas
+        with prioridade(PRIORIDADE_LOTE):
+            futuros = {
+                pool.submit(contextvars.copy_context().run, _processar_video_lote, url): i
+                for i, url in enumerate(urls)
+            }
+        for feitos, fut in enumerate(as_completed(futuros), start=1):
+            resultados[futuros[fut]] = fut.result()
+            if ao_concluir:
+                ao_concluir(feitos, len(urls), resultados[futuros[fut]])
+    return resultados
+
+def resumo_lote(resultados: list[dict]) -> list[dict]:
+    """Status e tempos por vídeo, sem os textos."""
+    return [
+        {k: v for k, v in r.items() if k not in ("transcricao", "blog")}
+        for r in resultados
+    ]
+
+def montar_pacote_lote(resultados: list[dict]) -> bytes:
+    """ZIP com blog (.md) e transcrição (.txt) de cada vídeo + status.json."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, r in enumerate(resultados, start=1):
+            nome = f"{i:03d}_{r['video_id'] or 'video'}"
+            if r["transcricao"]:
+                zf.writestr(f"transcricoes/{nome}.txt", r["transcricao"])
+            if r["blog"]:
+                zf.writestr(f"blogs/{nome}.md", r["blog"])
+        zf.writestr(
+            "status.json",
+            json.dumps(resumo_lote(resultados), ensure_ascii=False, indent=2),
+        )
+    return buffer.getvalue()
 
 def limpar_modulo_youtube():
+    _cancelar_transcricao_de_outra_url("")
+
     keys_youtube = [
         "yt_url",
         "yt_transcricao",
         "yt_blog",
         "yt_origem_transcricao",
+        "yt_segmentos",
+        "yt_lote",
+        "yt_lote_resultados",
     ]
 
     for k in keys_youtube:
         if k in st.session_state:
             del st.session_state[k]
 
+# -------------------------------------------------------------------------------------------------------------
+# ETL — RESULTADOS COMPARTILHADOS ENTRE SESSÕES (LRU POR HASH DO ARQUIVO)
+# -------------------------------------------------------------------------------------------------------------
+# Tabelas, JSON e logs ficam uma vez por processo; a sessão guarda só a chave
+MAX_RESULTADOS_ETL = 8
+
+@st.cache_resource
+def _cache_resultados_etl() -> dict:
+    return {
+        "itens": OrderedDict(),
+        "trava": threading.Lock(),
+        # chave → Future do ETL em execução: só uploads idênticos esperam um pelo outro
+        "em_andamento": {},
+    }
+
+def _hash_upload(uploaded_file) -> str:
+    uploaded_file.seek(0)
+    sha = hashlib.sha256()
+    for bloco in iter(lambda: uploaded_file.read(TAMANHO_BLOCO_UPLOAD), b""):
+        sha.update(bloco)
+    uploaded_file.seek(0)
+    return sha.hexdigest()
+
+def resultado_etl(chave: str) -> dict | None:
+    """Resultado guardado sob ``chave`` (e marca como recém-usado) ou None se saiu do cache."""
+    cache = _cache_resultados_etl()
+    with cache["trava"]:
+        resultado = cache["itens"].get(chave)
+        if resultado is not None:
+            cache["itens"].move_to_end(chave)
+        return resultado
+
+def _rodar_etl(arquivo, arquivo_metas) -> dict:
+    """Resultado do ETL do upload; só com "logs" se o arquivo não carregar."""
+    alvos = json.loads(arquivo_metas.getvalue().decode("utf-8")) if arquivo_metas else None
+
+    # o upload já é um buffer em memória: o pandas lê direto dele
+    arquivo.seek(0)
+    # o JSON volta em memória: um arquivo fixo no diretório seria lido/escrito por outras sessões
+    df, t_simples, t_multi, t_matriz, t_nota, logs = executar_etl(
+        arquivo,
+        categorizar=True,
+        modo_texto="pyarrow",
+        cruzamentos=True,
+        alvos_ponderacao=alvos,
+        caminho_json=None,
+    )
+    if t_simples is None:
+        return {"logs": logs}
+    return {
+        "t_simples": t_simples,
+        "t_multi": t_multi,
+        "t_matriz": t_matriz,
+        "t_nota": t_nota,
+        "json": df.attrs["json"],
+        "logs": logs,
+    }
+
+def executar_etl_compartilhado(arquivo, arquivo_metas) -> tuple[str, dict]:
+    """Roda o ETL só se este arquivo + metas ainda não estiver no cache do processo.
+
+    Devolve (chave, resultado); ``resultado`` tem t_simples, t_multi,
+    t_matriz, t_nota, json e logs. Se o arquivo não carregar, devolve
+    (None, {"logs": logs}) e nada vai para o cache. Uploads diferentes rodam
+    em paralelo; o mesmo upload em outra sessão espera a execução em curso.
+    """
+    chave = _hash_upload(arquivo)
+    if arquivo_metas:
+        chave = hashlib.sha256((chave + _hash_upload(arquivo_metas)).encode()).hexdigest()
+
+    cache = _cache_resultados_etl()
+    with cache["trava"]:
+        resultado = cache["itens"].get(chave)
+        if resultado is not None:
+            cache["itens"].move_to_end(chave)
+            return chave, resultado
+        futuro = cache["em_andamento"].get(chave)
+        executa = futuro is None
+        if executa:
+            futuro = cache["em_andamento"][chave] = Future()
+
+    if not executa:
+        resultado = futuro.result()
+        return (chave if "json" in resultado else None), resultado
+
+    try:
+        resultado = _rodar_etl(arquivo, arquivo_metas)
+    except BaseException as e:
+        with cache["trava"]:
+            del cache["em_andamento"][chave]
+        futuro.set_exception(e)
+        raise
+
+    with cache["trava"]:
+        del cache["em_andamento"][chave]
+        if "json" in resultado:
+            cache["itens"][chave] = resultado
+            while len(cache["itens"]) > MAX_RESULTADOS_ETL:
+                cache["itens"].popitem(last=False)
+    futuro.set_result(resultado)
+    return (chave if "json" in resultado else None), resultado
+
+# -------------------------------------------------------------------------------------------------------------
+# TABELAS DE FREQUÊNCIA — NAVEGADOR (BUSCA + PAGINAÇÃO)
+# -------------------------------------------------------------------------------------------------------------
+TIPOS_TABELA = {
+    "🟦 Perguntas Simples": "t_simples",
+    "🟧 Multirresposta": "t_multi",
+    "🟩 Matriz (Texto)": "t_matriz",
+    "🟪 Matriz (Nota)": "t_nota",
+}
+PERGUNTAS_POR_PAGINA = [5, 10, 20]
+
+# Com st.fragment, mexer no navegador reexecuta só ele, não a página inteira
+_fragmento = getattr(st, "fragment", lambda f: f)
+
+def _sem_acento(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in texto if not unicodedata.combining(c)).lower()
+
+def filtrar_perguntas(perguntas, busca: str) -> list:
+    """Perguntas cujo texto contém todas as palavras da busca (sem acento/caixa)."""
+    termos = _sem_acento(busca).split()
+    if not termos:
+        return list(perguntas)
+    return [p for p in perguntas if all(t in _sem_acento(p) for t in termos)]
+
+@_fragmento
+def navegador_tabelas():
+    """Mostra só as perguntas da página atual: o custo não cresce com o nº de perguntas."""
+    col_tipo, col_busca = st.columns([1, 2])
+    with col_tipo:
+        rotulo = st.selectbox("Tipo de pergunta", list(TIPOS_TABELA), key="nav_tipo")
+    with col_busca:
+        busca = st.text_input("Buscar pergunta", key="nav_busca", placeholder="Ex: #gen, marca, satisfação")
+
+    # as tabelas vêm do cache compartilhado a cada renderização, só a página visível
+    resultado = resultado_etl(st.session_state["etl_chave"])
+    if resultado is None:
+        st.caption("Resultado do ETL expirou do cache; reenvie o arquivo.")
+        return
+    tabelas = resultado[TIPOS_TABELA[rotulo]]
+    perguntas = filtrar_perguntas(tabelas.keys(), busca)
+    if not perguntas:
+        st.caption(f"Nenhuma pergunta encontrada ({len(tabelas)} no total).")
+        return
+
+    col_sel, col_qtd, col_pag = st.columns([3, 1, 1])
+    with col_qtd:
+        por_pagina = st.selectbox("Por página", PERGUNTAS_POR_PAGINA, key="nav_por_pagina")
+    total_paginas = (len(perguntas) - 1) // por_pagina + 1
+
+    # a busca/tipo mudou: descarta página e seleção que não existem mais
+    st.session_state.setdefault("nav_pagina", 1)
+    if st.session_state["nav_pagina"] > total_paginas:
+        st.session_state["nav_pagina"] = 1
+    validas = set(perguntas)
+    st.session_state["nav_escolhidas"] = [
+        p for p in st.session_state.get("nav_escolhidas", []) if p in validas
+    ]
+
+    with col_pag:
+        pagina = st.number_input("Página", min_value=1, max_value=total_paginas, key="nav_pagina")
+    with col_sel:
+        escolhidas = st.multiselect(
+            "Perguntas específicas (opcional)", perguntas, key="nav_escolhidas",
+            placeholder=f"{len(perguntas)} perguntas — vazio mostra a página atual",
+        )
+
+    if escolhidas:
+        visiveis = escolhidas
+    else:
+        inicio = (int(pagina) - 1) * por_pagina
+        visiveis = perguntas[inicio:inicio + por_pagina]
+        st.caption(
+            f"Perguntas {inicio + 1}–{inicio + len(visiveis)} de {len(perguntas)} "
+            f"(página {int(pagina)} de {total_paginas})"
+        )
+
+    for pergunta in visiveis:
+        conteudo = tabelas[pergunta]
+        if isinstance(conteudo, dict):
+            st.markdown(f"## {pergunta}")
+            for item, tabela in conteudo.items():
+                st.markdown(f"**{item}**")
+                st.dataframe(tabela)
+        else:
+            st.markdown(f"### {pergunta}")
+            st.dataframe(conteudo)
+
 # -------------------------------------------------------------------------------------------------------------
 # SIDEBAR
 # -------------------------------------------------------------------------------------------------------------
@@ -400,6 +1125,12 @@ def sidebar():
 
     st.markdown("### 📂 Enviar arquivo Excel")
     arquivo = st.file_uploader("Upload", type=["xlsx"])
+    arquivo_metas = st.file_uploader(
+        "Metas de ponderação (opcional, JSON)",
+        type=["json"],
+        key="metas_ponderacao",
+        help='Ex.: {"#gen": {"Feminino": 0.52, "Masculino": 0.48}}',
+    )
 
     st.markdown("---")
     st.markdown("### 🎥 YouTube → Blog")
@@ -417,14 +1148,36 @@ def sidebar():
         key="yt_upload_file",
     )
 
-    return arquivo, yt_file
+    st.session_state["yt_lote"] = st.text_area(
+        "Lote: playlist, canal ou uma URL por linha",
+        value=st.session_state["yt_lote"],
+        placeholder="Ex: https://www.youtube.com/playlist?list=XXXX",
+        height=100,
+    )
+
+    st.markdown("---")
+    with st.expander("📈 Fila da OpenAI (tempo de espera, novas tentativas)"):
+        st.json(metricas_openai())
+
+    with st.expander("🧭 Modelos por tarefa (tempo, tokens e custo)"):
+        linhas = relatorio_modelos()
+        if linhas:
+            st.dataframe(linhas, hide_index=True, use_container_width=True)
+        else:
+            st.caption("Nenhuma chamada de IA nesta instância ainda.")
+
+    return arquivo, yt_file, arquivo_metas
+
+def _pedir_canais(chaves):
+    # callback dos botões: a regeneração roda antes dos textos serem exibidos
+    st.session_state["canais_pedidos"] = list(chaves)
 
 # -------------------------------------------------------------------------------------------------------------
 # TELA PRINCIPAL — FLUXO ORIGINAL + MÓDULO ADICIONAL
 # -------------------------------------------------------------------------------------------------------------
 def main():
     with st.sidebar:
-        arquivo, yt_file = sidebar()
+        arquivo, yt_file, arquivo_metas = sidebar()
 
     st.title("ILUMEO — AI Marketing & Intelligence Platform")
     st.markdown("Aqui, a Inteligência Artificial transforma seus dados em **Insights**.\n")
@@ -437,6 +1190,7 @@ def main():
         st.subheader("Conteúdo Gerado a partir de Vídeo do YouTube")
 
         url = st.session_state["yt_url"].strip()
+        _cancelar_transcricao_de_outra_url(url)
 
         if not validar_url_youtube(url):
             st.error("URL inválida. Cole uma URL válida do YouTube (youtube.com/watch?v=... ou youtu.be/...).")
@@ -454,8 +1208,19 @@ def main():
 
             if transcrever_apenas or gerar_tudo:
                 with st.spinner("Transcrevendo (Legenda → Whisper → Upload)..."):
+                    cancelar = _iniciar_transcricao(url)
+                    status = st.empty()
+                    inicio = time.monotonic()
+
+                    def ao_aguardar():
+                        status.caption(f"⏳ {time.monotonic() - inicio:.0f}s")
+
                     try:
-                        out = transcrever_video_youtube_cacheada(url, yt_file.name if yt_file else None)
+                        out = transcrever_video_youtube_cacheada(
+                            url, yt_file.name if yt_file else None, cancelar, ao_aguardar
+                        )
+
+                        st.session_state["yt_segmentos"] = out.get("segmentos")
 
                         if out["origem"] == "legenda":
                             st.session_state["yt_transcricao"] = out["texto"]
@@ -465,14 +1230,29 @@ def main():
                              st.session_state["yt_transcricao"] = out["texto"]
                              st.session_state["yt_origem_transcricao"] = "whisper"
 
+                        elif out["origem"] == "upload":
+                            st.session_state["yt_transcricao"] = out["texto"]
+                            st.session_state["yt_origem_transcricao"] = "upload"
+
                         elif out["origem"] == "upload_pendente":
                             if not yt_file:
                                 st.warning("Sem legenda e o YouTube pode bloquear no Community Cloud. Envie um arquivo para Whisper.")
                             else:
-                                texto = _transcrever_upload_whisper(yt_file)
+                                pool = ThreadPoolExecutor(max_workers=1)
+                                try:
+                                    texto, segmentos = _aguardar(pool.submit(
+                                        contextvars.copy_context().run, _transcrever_upload_whisper,
+                                        yt_file, extrair_video_id(url), cancelar,
+                                    ), ao_aguardar)
+                                finally:
+                                    pool.shutdown(wait=False)
+                                st.session_state["yt_segmentos"] = segmentos
                                 st.session_state["yt_transcricao"] = texto
                                 st.session_state["yt_origem_transcricao"] = "upload"
 
+                    except TranscricaoCancelada:
+                        pass
+
                     except Exception as e:
                         st.error(
                                   "Não foi possível transcrever automaticamente pela URL (o YouTube pode bloquear no Community Cloud). "
@@ -480,11 +1260,17 @@ def main():
                                 )
                         st.caption(str(e))
 
+                    finally:
+                        # fim normal, erro ou rerun (RerunException): nada desta
+                        # transcrição segue rodando em segundo plano
+                        cancelar.set()
+                    status.empty()
+
             if gerar_tudo and st.session_state["yt_transcricao"]:
                 with st.spinner("Gerando blog post automaticamente..."):
                     try:
                         st.session_state["yt_blog"] = gerar_blog_a_partir_transcricao_cacheado(
-                            st.session_state["yt_transcricao"]
+                            st.session_state["yt_transcricao"], url, st.session_state["yt_segmentos"]
                         )
                     except Exception as e:
                         st.error(f"Erro ao gerar o blog post: {e}")
@@ -494,7 +1280,7 @@ def main():
                     try:
                         st.cache_data.clear()
                         st.session_state["yt_blog"] = gerar_blog_a_partir_transcricao_cacheado(
-                            st.session_state["yt_transcricao"]
+                            st.session_state["yt_transcricao"], url, st.session_state["yt_segmentos"]
                         )
                     except Exception as e:
                         st.error(f"Erro ao gerar o blog post: {e}")
@@ -514,28 +1300,57 @@ def main():
                 st.subheader("Blog Post Gerado")
                 st.markdown(st.session_state["yt_blog"])
 
+    # ---------------------------------------------------------------------
+    # MÓDULO YOUTUBE — LOTE
+    # ---------------------------------------------------------------------
+    if st.session_state["yt_lote"].strip():
+        st.markdown("---")
+        st.subheader("Lote de Vídeos do YouTube → Blogs")
+
+        if st.button("Processar lote", use_container_width=True):
+            try:
+                with st.spinner("Listando vídeos do lote..."):
+                    urls = listar_videos_lote(st.session_state["yt_lote"])
+            except Exception as e:
+                urls = None
+                st.error(f"Não foi possível listar os vídeos do lote: {e}")
+
+            if urls:
+                barra = st.progress(0.0, text=f"0 de {len(urls)} vídeos")
+
+                def _progresso(feitos, total, resultado):
+                    barra.progress(feitos / total, text=f"{feitos} de {total} vídeos — {resultado['status']}")
+
+                inicio = time.perf_counter()
+                st.session_state["yt_lote_resultados"] = processar_lote_youtube(urls, ao_concluir=_progresso)
+                st.caption(f"Lote concluído em {time.perf_counter() - inicio:.1f}s.")
+            elif urls is not None:
+                st.warning("Nenhum vídeo válido encontrado no lote.")
+
+        if st.session_state["yt_lote_resultados"]:
+            resultados = st.session_state["yt_lote_resultados"]
+            st.dataframe(resumo_lote(resultados), use_container_width=True)
+            st.download_button(
+                "Baixar pacote (blogs + transcrições + status)",
+                data=montar_pacote_lote(resultados),
+                file_name="lote_youtube_blogs.zip",
+                mime="application/zip",
+                use_container_width=True,
+            )
+
     # ---------------------------------------------------------------------
     # UPLOAD → ETL → JSON 
     # ---------------------------------------------------------------------
     if arquivo:
         with st.spinner("🔄 Rodando ETL ILUMEO..."):
-            os.makedirs("temp", exist_ok=True)
-            caminho = os.path.join("temp", arquivo.name)
-
-            with open(caminho, "wb") as f:
-                f.write(arquivo.getbuffer())
-
             try:
-                df, t_simples, t_multi, t_matriz, t_nota, logs = executar_etl(caminho)
-
-                st.session_state["etl_logs"] = logs
-                st.session_state["t_simples"] = t_simples
-                st.session_state["t_multi"] = t_multi
-                st.session_state["t_matriz"] = t_matriz
-                st.session_state["t_nota"] = t_nota
-
-                with open("resultado_pesquisa.json", "r", encoding="utf-8") as f:
-                    st.session_state["json_etl"] = f.read()
+                chave, resultado = executar_etl_compartilhado(arquivo, arquivo_metas)
+                if chave is None:
+                    st.error("Não foi possível carregar o arquivo Excel.")
+                    for linha in resultado["logs"]:
+                        st.markdown(f"- {linha}")
+                    return
+                st.session_state["etl_chave"] = chave
 
                 st.success("ETL concluído! JSON carregado com sucesso.")
 
@@ -546,35 +1361,12 @@ def main():
         # ------------------- LOGS -------------------
         st.subheader("📄 Log da Execução do ETL")
         with st.expander("Ver detalhes"):
-            for linha in st.session_state["etl_logs"]:
+            for linha in resultado["logs"]:
                 st.markdown(f"- {linha}")
 
         # ------------------- TABELAS -------------------
         st.subheader("📊 Tabelas de Frequência")
-
-        with st.expander("🟦 Perguntas Simples"):
-            for pergunta, tabela in st.session_state["t_simples"].items():
-                st.markdown(f"### {pergunta}")
-                st.dataframe(tabela)
-
-        with st.expander("🟧 Multirresposta"):
-            for pergunta, tabela in st.session_state["t_multi"].items():
-                st.markdown(f"### {pergunta}")
-                st.dataframe(tabela)
-
-        with st.expander("🟩 Matriz (Texto)"):
-            for pergunta, meios in st.session_state["t_matriz"].items():
-                st.markdown(f"## {pergunta}")
-                for meio, tabela in meios.items():
-                    st.markdown(f"**{meio}**")
-                    st.dataframe(tabela)
-
-        with st.expander("🟪 Matriz (Nota)"):
-            for pergunta, marcas in st.session_state["t_nota"].items():
-                st.markdown(f"## {pergunta}")
-                for marca, tabela in marcas.items():
-                    st.markdown(f"**{marca}**")
-                    st.dataframe(tabela)
+        navegador_tabelas()
 
         # ---------------------------------------------------------------------
         # IA — INSIGHTS
@@ -590,17 +1382,10 @@ def main():
         if st.session_state["autorizar_insights"] and not st.session_state["insights_gerados"]:
             with st.spinner("Analisando dados profundamente e cruzando informações..."):
                 try:
-                    insights_raw = gerar_insights(st.session_state["json_etl"])
-
-                    # -------- FILTRO DEFINITIVO ANTI-PLACEHOLDER --------
-                    texto = (insights_raw or "").strip()
-                    lixo = {
-                        "[conteúdo detalhado acima]",
-                        "[conteúdo acima]",
-                        "[conteúdo detalhado]",
-                        "[conteúdo]",
-                    }
-                    if texto.lower() in {x.lower() for x in lixo}:
+                    # validação, reparos e escalonamento já acontecem dentro de gerar_insights;
+                    # aqui só se descarta o que seguiu sem conteúdo aproveitável
+                    texto = (gerar_insights(resultado["json"]) or "").strip()
+                    if problemas_basicos(texto):
                         texto = ""
 
                     st.session_state["insights"] = texto
@@ -637,20 +1422,81 @@ def main():
 
         # <<< GOVERNANÇA DE IA: só habilita o botão de conteúdo após insights
         if st.session_state["insights_gerados"]:
+            st.checkbox(
+                "Saída estruturada (JSON por canal: título, seções, bullets)",
+                key="conteudos_estruturados",
+            )
+            estruturado = st.session_state["conteudos_estruturados"]
+
             if st.button("Gerar Conteúdos Multicanais", use_container_width=True):
                 st.session_state["autorizar_conteudos"] = True
 
             # Executa sob demanda (sem rerun forçado)
-            if st.session_state["autorizar_conteudos"] and not st.session_state["conteudos_multicanais"]:
+            if st.session_state["autorizar_conteudos"] and not st.session_state["conteudos_canais"]:
                 with st.spinner("Criando textos completos para todos os canais..."):
-                    st.session_state["conteudos_multicanais"] = gerar_conteudos_multicanais(
-                        st.session_state["insights"]
+                    st.session_state["conteudos_canais"] = gerar_conteudos_multicanais(
+                        st.session_state["insights"], estruturado=estruturado
+                    )
+
+            # Regeneração por canal (pedida pelos botões abaixo): só esses canais
+            if st.session_state["canais_pedidos"] and st.session_state["conteudos_canais"]:
+                pedidos = st.session_state["canais_pedidos"]
+                st.session_state["canais_pedidos"] = []
+                with st.spinner(f"Regenerando {len(pedidos)} canal(is)..."):
+                    st.session_state["conteudos_canais"] = gerar_conteudos_multicanais(
+                        st.session_state["insights"], st.session_state["conteudos_canais"],
+                        forcar=pedidos, estruturado=estruturado,
                     )
         else:
             st.caption("Gere os **Insights Profundos** primeiro para liberar a geração multicanal.")
 
-        if st.session_state["conteudos_multicanais"]:
-            st.markdown(st.session_state["conteudos_multicanais"])
+        canais = st.session_state["conteudos_canais"]
+        if canais:
+            titulos = {chave: titulo for chave, titulo, _, _ in CANAIS}
+
+            desatualizados = canais_desatualizados(
+                st.session_state["insights"], canais, st.session_state["conteudos_estruturados"]
+            )
+            if desatualizados:
+                st.info(
+                    "Prompt, modelo, formato ou insights mudaram desde a geração de: "
+                    + ", ".join(titulos[c] for c in desatualizados) + "."
+                )
+                st.button(
+                    "Atualizar só os canais desatualizados",
+                    on_click=_pedir_canais, args=(desatualizados,), use_container_width=True,
+                )
+
+            pendencias = {c: item["pendencias"] for c, item in canais.items() if item["pendencias"]}
+            if pendencias:
+                st.warning(
+                    "Alguns canais seguiram fora das regras após as correções automáticas:\n\n"
+                    + "\n".join(
+                        f"- **{titulos[chave]}**: {'; '.join(problemas)}"
+                        for chave, problemas in pendencias.items()
+                    )
+                )
+
+            for i, (chave, titulo, _, _) in enumerate(CANAIS):
+                if chave not in canais:
+                    continue
+                if i:
+                    st.markdown("---")
+                st.markdown(f"## {titulo}\n\n{canais[chave]['texto']}")
+                st.button(
+                    f"🔄 Regenerar {titulo}", key=f"regenerar_{chave}",
+                    on_click=_pedir_canais, args=([chave],),
+                )
+
+            estruturados = {c: item["dados"] for c, item in canais.items() if item.get("dados")}
+            if estruturados:
+                st.download_button(
+                    "Baixar canais em JSON (título, seções, bullets)",
+                    data=json.dumps(estruturados, ensure_ascii=False, indent=2),
+                    file_name="conteudos_canais.json",
+                    mime="application/json",
+                    use_container_width=True,
+                )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,247 @@
+# ============================================================
+#  ILUMEO - ÁUDIO PARA TRANSCRIÇÃO (WHISPER)
+#  Divisão em segmentos por silêncio + transcrição paralela
+#  Franciane Rodrigues
+# ============================================================
+
+import contextvars
+import os
+import re
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from segmentos_ilumeo import criar_segmentos
+
+# Mesmo FFmpeg configurado no .env para o yt-dlp
+FFMPEG = os.getenv("FFMPEG_PATH") or "ffmpeg"
+
+# Limite de upload da API de transcrição
+LIMITE_WHISPER_BYTES = 25 * 1024 * 1024
+
+# Formato enviado ao Whisper: voz mono 16 kHz em Opus (MP3 se o FFmpeg não tiver libopus)
+TAXA_AMOSTRAGEM = 16000
+BITRATE_OPUS = "24k"
+BITRATE_MP3 = "32k"
+
+SEGUNDOS_POR_SEGMENTO = 300
+SOBREPOSICAO_SEGUNDOS = 2.0
+MAX_TRANSCRICOES_SIMULTANEAS = 4
+
+
+class TranscricaoCancelada(Exception):
+    """Transcrição interrompida por um sinal de cancelamento (threading.Event)."""
+
+
+def verificar_cancelamento(cancelar):
+    if cancelar is not None and cancelar.is_set():
+        raise TranscricaoCancelada("Transcrição cancelada.")
+
+
+# ------------------------------------------------------------
+# 1. FFMPEG
+# ------------------------------------------------------------
+
+def _rodar_ffmpeg(args):
+    comando = [FFMPEG, "-hide_banner", "-nostdin", *args]
+    try:
+        resultado = subprocess.run(comando, capture_output=True, text=True, errors="replace")
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            "FFmpeg não encontrado. Instale o FFmpeg ou configure FFMPEG_PATH no .env."
+        )
+    return resultado
+
+
+def duracao_audio(caminho):
+    """Duração em segundos, lida do cabeçalho que o FFmpeg imprime."""
+    resultado = _rodar_ffmpeg(["-i", caminho])
+    m = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", resultado.stderr)
+    if not m:
+        raise ValueError(f"Não foi possível ler a duração do áudio: {os.path.basename(caminho)}")
+    horas, minutos, segundos = m.groups()
+    return int(horas) * 3600 + int(minutos) * 60 + float(segundos)
+
+
+def detectar_silencios(caminho, ruido_db=-30, duracao_min=0.5):
+    """Lista de (início, fim) dos trechos de silêncio, via filtro silencedetect."""
+    resultado = _rodar_ffmpeg([
+        "-i", caminho,
+        "-af", f"silencedetect=noise={ruido_db}dB:d={duracao_min}",
+        "-f", "null", "-",
+    ])
+    inicios = [float(x) for x in re.findall(r"silence_start:\s*(-?[\d.]+)", resultado.stderr)]
+    fins = [float(x) for x in re.findall(r"silence_end:\s*([\d.]+)", resultado.stderr)]
+    return list(zip(inicios, fins))
+
+
+def preparar_audio(caminho, pasta_destino):
+    """Converte áudio ou vídeo para voz mono 16 kHz em baixo bitrate.
+
+    Só a primeira trilha de áudio é lida (vídeo é descartado). Reduz o
+    upload em 5–20x e mantém mais arquivos abaixo do limite da API.
+    """
+    base = os.path.splitext(os.path.basename(caminho))[0]
+    formatos = [
+        (".ogg", ["-c:a", "libopus", "-b:a", BITRATE_OPUS, "-application", "voip"]),
+        (".mp3", ["-c:a", "libmp3lame", "-b:a", BITRATE_MP3]),
+    ]
+
+    erro = ""
+    for extensao, codec in formatos:
+        destino = os.path.join(pasta_destino, f"{base}_16k{extensao}")
+        resultado = _rodar_ffmpeg([
+            "-y", "-i", caminho,
+            "-map", "0:a:0", "-vn",
+            "-ac", "1", "-ar", str(TAXA_AMOSTRAGEM),
+            *codec,
+            destino,
+        ])
+        if resultado.returncode == 0 and os.path.exists(destino):
+            return destino
+        erro = resultado.stderr[-500:]
+
+    raise RuntimeError(f"FFmpeg falhou ao preparar o áudio: {erro}")
+
+
+def extrair_segmento(caminho, inicio, fim, destino):
+    # o áudio já vem preparado: corte sem recodificar
+    resultado = _rodar_ffmpeg([
+        "-y",
+        "-ss", f"{inicio:.3f}",
+        "-t", f"{fim - inicio:.3f}",
+        "-i", caminho,
+        "-vn",
+        "-c:a", "copy",
+        destino,
+    ])
+    if resultado.returncode != 0 or not os.path.exists(destino):
+        raise RuntimeError(f"FFmpeg falhou ao cortar o áudio: {resultado.stderr[-500:]}")
+    return destino
+
+
+# ------------------------------------------------------------
+# 2. PLANEJAMENTO DOS SEGMENTOS
+# ------------------------------------------------------------
+
+def alvo_por_tamanho(tamanho, duracao, sobreposicao=SOBREPOSICAO_SEGUNDOS, janela=0.2,
+                     margem=0.9):
+    """Maior ``alvo`` (segundos) com o qual todo segmento fica abaixo de LIMITE_WHISPER_BYTES.
+
+    O corte é feito sem recodificar, então cada segmento tem os bytes por
+    segundo do arquivo. O maior segmento de planejar_segmentos dura
+    alvo × (1 + janela) + 2 × sobreposição; ``margem`` cobre a variação
+    de bitrate e o cabeçalho do arquivo.
+    """
+    segundos = LIMITE_WHISPER_BYTES * margem / (tamanho / duracao)
+    return max(1.0, (segundos - 2 * sobreposicao) / (1 + janela))
+
+
+def planejar_segmentos(duracao, silencios, alvo=SEGUNDOS_POR_SEGMENTO,
+                       sobreposicao=SOBREPOSICAO_SEGUNDOS, janela=0.2):
+    """Define os cortes perto de cada múltiplo de ``alvo``, no meio de um silêncio.
+
+    Sem silêncio dentro da janela (±20% do alvo) o corte é feito no ponto
+    ideal. Cada segmento ganha ``sobreposicao`` segundos de cada lado para
+    não perder palavras no corte.
+    """
+    if duracao <= alvo:
+        return [(0.0, duracao)]
+
+    meios = [(ini + fim) / 2 for ini, fim in silencios]
+    cortes = []
+    ultimo = 0.0
+    ideal = alvo
+    while ideal < duracao - alvo * janela:
+        candidatos = [m for m in meios if abs(m - ideal) <= alvo * janela and m > ultimo]
+        corte = min(candidatos, key=lambda m: abs(m - ideal)) if candidatos else ideal
+        cortes.append(corte)
+        ultimo = corte
+        ideal = corte + alvo
+
+    limites = [0.0] + cortes + [duracao]
+    return [
+        (max(0.0, ini - sobreposicao), min(duracao, fim + sobreposicao))
+        for ini, fim in zip(limites[:-1], limites[1:])
+    ]
+
+
+# ------------------------------------------------------------
+# 3. TRANSCRIÇÃO EM SEGMENTOS
+# ------------------------------------------------------------
+
+def _transcrever_partes(caminho, transcrever, alvo, max_simultaneas, preparar, cancelar):
+    """Lista de ((início, fim), resultado de ``transcrever``) por parte do áudio."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        verificar_cancelamento(cancelar)
+        if preparar:
+            caminho = preparar_audio(caminho, tmpdir)
+
+        verificar_cancelamento(cancelar)
+        duracao = duracao_audio(caminho)
+        tamanho = os.path.getsize(caminho)
+        if duracao <= alvo and tamanho <= LIMITE_WHISPER_BYTES:
+            return [((0.0, duracao), transcrever(caminho))]
+
+        # sem preparar_audio o arquivo pode ter bitrate alto: o alvo também
+        # respeita o limite de bytes, não só a duração
+        if duracao:
+            alvo = min(alvo, alvo_por_tamanho(tamanho, duracao))
+        segmentos = planejar_segmentos(duracao, detectar_silencios(caminho), alvo=alvo)
+        extensao = os.path.splitext(caminho)[1]
+
+        def processar(indice):
+            verificar_cancelamento(cancelar)
+            ini, fim = segmentos[indice]
+            destino = os.path.join(tmpdir, f"segmento_{indice:03d}{extensao}")
+            return transcrever(extrair_segmento(caminho, ini, fim, destino))
+
+        # corte e transcrição de cada segmento rodam juntos no mesmo worker; cada
+        # tarefa leva uma cópia do contexto (ex.: prioridade da chamada à API)
+        with ThreadPoolExecutor(max_workers=max_simultaneas) as pool:
+            futuros = [
+                pool.submit(contextvars.copy_context().run, processar, i)
+                for i in range(len(segmentos))
+            ]
+            resultados = [f.result() for f in futuros]
+
+    verificar_cancelamento(cancelar)
+    return list(zip(segmentos, resultados))
+
+
+def transcrever_com_tempos(caminho, transcrever, alvo=SEGUNDOS_POR_SEGMENTO,
+                           max_simultaneas=MAX_TRANSCRICOES_SIMULTANEAS, preparar=True,
+                           cancelar=None):
+    """Transcreve ``caminho`` em segmentos paralelos e devolve Segmentos com tempo.
+
+    ``transcrever`` recebe o caminho de um arquivo de áudio e devolve uma
+    lista de (início, duração, texto) relativa a ele (ex.: uma chamada ao
+    Whisper). Com ``preparar`` o arquivo é antes convertido por
+    preparar_audio. Áudios curtos e abaixo do limite da API vão inteiros
+    numa única chamada.
+
+    Os tempos são deslocados para o áudio inteiro. Na sobreposição entre
+    partes, cada trecho fica com a parte em que começa em relação ao corte
+    (meio da sobreposição). Um trecho que atravessa o corte chega truncado
+    nas duas partes; decidir pelo início evita que as duas cópias fiquem,
+    ou que nenhuma fique.
+
+    ``cancelar`` (threading.Event) interrompe a transcrição: segmentos que
+    ainda não começaram não são enviados e TranscricaoCancelada é lançada.
+    """
+    partes = _transcrever_partes(caminho, transcrever, alvo, max_simultaneas, preparar, cancelar)
+
+    cortes = [
+        (fim_anterior + ini_seguinte) / 2
+        for ((_, fim_anterior), _), ((ini_seguinte, _), _) in zip(partes[:-1], partes[1:])
+    ]
+    limites = [float("-inf")] + cortes + [float("inf")]
+
+    itens = []
+    for k, ((ini_parte, _), trechos) in enumerate(partes):
+        for inicio, duracao, texto in trechos:
+            inicio += ini_parte
+            if limites[k] <= inicio < limites[k + 1]:
+                itens.append((inicio, duracao, texto))
+
+    return criar_segmentos(itens)
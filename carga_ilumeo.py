@@ -0,0 +1,167 @@
+# ============================================================
+#  ILUMEO - GERADOR DE CARGA (VÁRIAS SESSÕES SIMULTÂNEAS)
+#  Roda roteiros de chamadas de IA pelo mesmo cliente/agendador do
+#  app contra o simulador local e mede vazão e latência
+#  Franciane Rodrigues
+# ============================================================
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from openai_ilumeo import chamar_openai, cliente_openai, metricas
+
+ROTEIRO_PADRAO = "padrao"
+
+
+# ------------------------------------------------------------
+# 1. ROTEIROS
+# ------------------------------------------------------------
+
+def roteiro_padrao():
+    """Sessão típica do app: resumos de trechos, blog, insights e 4 canais."""
+    trecho = " ".join(["conteúdo da transcrição"] * 600)
+    json_pesquisa = json.dumps({"perguntas_simples": [{"pergunta": "#gen", "tabela": []}] * 200})
+    passos = [
+        {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": f"Resuma o trecho:\n{trecho}"}]}
+        for _ in range(4)
+    ]
+    passos.append({"model": "gpt-4o", "messages": [{"role": "user", "content": f"Gere um blog:\n{trecho}"}]})
+    passos.append({"model": "gpt-4o", "messages": [{"role": "user", "content": f"Insights:\n{json_pesquisa}"}]})
+    passos += [
+        {"model": "gpt-4o", "messages": [{"role": "user", "content": f"Canal {canal}: INSIGHTS..."}]}
+        for canal in ("linkedin", "blog", "one_page", "release")
+    ]
+    return passos
+
+
+def roteiro_de_gravacoes(caminho):
+    """Chamadas de chat gravadas (ILUMEO_GRAVAR_LLM), na ordem em que aconteceram."""
+    passos = []
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            if not linha.strip():
+                continue
+            registro = json.loads(linha)
+            if registro["caminho"].endswith("/chat/completions") and registro["requisicao"]:
+                corpo = json.loads(registro["requisicao"])
+                corpo.pop("stream", None)
+                corpo.pop("stream_options", None)
+                passos.append(corpo)
+    return passos
+
+
+# ------------------------------------------------------------
+# 2. EXECUÇÃO
+# ------------------------------------------------------------
+
+def _percentil(valores, p):
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return round(valores[min(len(valores) - 1, int(len(valores) * p))], 3)
+
+
+def _chamar(cliente, corpo, stream):
+    inicio = time.perf_counter()
+    tokens = sum(len(str(m.get("content", ""))) for m in corpo["messages"]) // 4 + 500
+    if not stream:
+        chamar_openai(cliente.chat.completions.create, tokens=tokens, **corpo)
+        return time.perf_counter() - inicio, None
+
+    primeiro = None
+    resposta = chamar_openai(cliente.chat.completions.create, tokens=tokens, stream=True, **corpo)
+    for bloco in resposta:
+        if primeiro is None and bloco.choices and bloco.choices[0].delta.content:
+            primeiro = time.perf_counter() - inicio
+    return time.perf_counter() - inicio, primeiro
+
+
+def rodar_carga(passos, sessoes=10, repeticoes=1, rampa_segundos=0.0, stream=False, cliente=None):
+    """``sessoes`` threads, cada uma percorre ``passos`` ``repeticoes`` vezes.
+
+    Devolve vazão, latências (p50/p95/p99), tempo até o primeiro bloco
+    (com ``stream``), erros e as métricas do agendador.
+    """
+    cliente = cliente or cliente_openai()
+    latencias, primeiros, erros = [], [], []
+    trava = threading.Lock()
+
+    def sessao(indice):
+        if sessoes > 1 and rampa_segundos:
+            time.sleep(rampa_segundos * indice / (sessoes - 1))
+        for _ in range(repeticoes):
+            for corpo in passos:
+                try:
+                    duracao, primeiro = _chamar(cliente, corpo, stream)
+                except Exception as e:
+                    with trava:
+                        erros.append(f"{type(e).__name__}: {e}")
+                    continue
+                with trava:
+                    latencias.append(duracao)
+                    if primeiro is not None:
+                        primeiros.append(primeiro)
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=sessao, args=(i,)) for i in range(sessoes)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "sessoes": sessoes,
+        "requisicoes": len(latencias),
+        "erros": len(erros),
+        "exemplos_erro": erros[:5],
+        "duracao_s": round(duracao, 2),
+        "requisicoes_por_s": round(len(latencias) / duracao, 2) if duracao else None,
+        "sessoes_por_min": round(sessoes * repeticoes / duracao * 60, 2) if duracao else None,
+        "latencia_s": {p: _percentil(latencias, q) for p, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "primeiro_bloco_s": {p: _percentil(primeiros, q) for p, q in (("p50", 0.5), ("p95", 0.95))} if stream else None,
+        "agendador": metricas(),
+    }
+
+
+# ------------------------------------------------------------
+# 3. LINHA DE COMANDO
+# ------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Carga com várias sessões simultâneas contra o simulador (simulador_ilumeo.py)."
+    )
+    parser.add_argument("--base-url", default="http://127.0.0.1:8090/v1")
+    parser.add_argument("--roteiro", default=ROTEIRO_PADRAO,
+                        help=f"'{ROTEIRO_PADRAO}' ou um JSONL gravado com ILUMEO_GRAVAR_LLM")
+    parser.add_argument("--sessoes", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--rampa-segundos", type=float, default=0.0)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--saida", help="grava o resumo em JSON")
+    args = parser.parse_args()
+
+    passos = roteiro_padrao() if args.roteiro == ROTEIRO_PADRAO else roteiro_de_gravacoes(args.roteiro)
+    cliente = cliente_openai(os.getenv("OPENAI_API_KEY") or "sk-simulado", args.base_url)
+
+    resumo = rodar_carga(
+        passos,
+        sessoes=args.sessoes,
+        repeticoes=args.repeticoes,
+        rampa_segundos=args.rampa_segundos,
+        stream=args.stream,
+        cliente=cliente,
+    )
+    texto = json.dumps(resumo, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,592 @@
+# ============================================================
+#  ILUMEO - PROMPTS DE INSIGHTS E CONTEÚDOS MULTICANAIS
+#  Usados pelo CrewAI (app) e pelo modo em lote (Batch API)
+#  Franciane Rodrigues
+# ============================================================
+
+import argparse
+import hashlib
+import json
+import os
+import re
+
+from modelos_ilumeo import problemas_basicos
+
+# ------------------------------------------------------------
+# 1. PROMPTS
+# ------------------------------------------------------------
+
+AGENTE_INSIGHTS = {
+    "role": "Analista de Mercado e Inteligência Competitiva Sênior",
+    "goal": ("Realizar análise profunda, cruzada e estratégica do JSON,"
+             "identificando padrões, clusters, motivações, barreiras e oportunidades."
+            ),
+    "backstory": ("Especialista em comportamento do consumidor, marketing estratégico, "
+                  "estatística de pesquisa e análise de frequência."
+                 ),
+}
+
+SAIDA_INSIGHTS = "Insight completo, estratégico, profundo e humanizado."
+
+AGENTE_CONTEUDO = {
+    "role": "Especialista em Conteúdo Multicanal baseado em Insights de Dados",
+    "goal": "Gerar conteúdos editoriais por canal a partir de insights de pesquisa.",
+    "backstory": "Especialista em branding, marketing, jornalismo e escrita executiva.",
+}
+
+# (chave, título da seção, arquivo de prompt, saída esperada)
+CANAIS = [
+    ("linkedin", "LinkedIn", "linkedin.txt",
+     ("Texto final para LinkedIn, "
+      "sem frases introdutórias ou explicativas, "
+      "pronto para publicação.")),
+    ("blog", "Blog", "blog.txt",
+     ("Artigo completo para Blog, "
+      "estruturado com título, introdução, subtítulos e conclusão, "
+      "sem explicações sobre o processo de escrita.")),
+    ("one_page", "One Page Executiva", "one_page.txt",
+     ("Apenas a ONE PAGE EXECUTIVA final, "
+      "começando diretamente em '### Dados', "
+      "sem qualquer frase introdutória, explicativa ou de encerramento.")),
+    ("release", "Release", "release.txt",
+     ("Texto completo do RELEASE jornalístico, "
+      "começando diretamente pelo TÍTULO, "
+      "seguindo a estrutura exigida, "
+      "sem qualquer frase explicativa, referencial ou metalinguística.")),
+]
+
+CANAL_POR_CHAVE = {canal[0]: canal for canal in CANAIS}
+
+
+def carregar_prompt(nome_arquivo: str) -> str:
+    caminho = os.path.join("prompts", nome_arquivo)
+    with open(caminho, "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def descricao_insights(json_text: str) -> str:
+    return (
+                "Seu objetivo é gerar INSIGHTS PROFUNDOS e estratégicos a partir dos dados da pesquisa. "
+                "Não use expressões referenciais como:\n"
+                "“conforme acima”, “como visto”, “analisado anteriormente”, "
+                "“segue abaixo”, “resultado da análise”.\n\n"
+
+        "Você receberá o JSON completo contendo tabelas de frequências, múltiplas respostas, "
+        "matriz de texto e matriz de notas. Quando existir a chave 'cruzamentos', ela traz "
+        "as células de cruzamento já calculadas entre as perguntas de perfil (gênero, cidade, renda, idade) "
+        "e as de comportamento em que a categoria mais se afasta do total (lift = % na categoria ÷ % no total); "
+        "as demais foram omitidas: use esses números nas análises cruzadas. Realize uma ANÁLISE PROFUNDA REAL, com cruzamento de dados "
+        "entre perguntas, comparações entre categorias, interpretação de padrões e hipóteses de comportamento.\n\n"
+        "Identifique:\n"
+        "- Tendências e padrões fortes\n"
+        "- Contradições e comportamentos divergentes\n"
+        "- Barreiras, gatilhos e drivers de decisão\n"
+        "- Oportunidades estratégicas para marketing\n"
+        "- Relações ocultas entre respostas\n"
+        "- Segmentações implícitas ou grupos naturais\n\n"
+        "- Detalhe clusterizações específicas\n\n"
+        "- Faça análises cruzadas entre perfil socioeconômico e comportamento de consumo\n\n"
+        "Use linguagem clara, humana, estratégica e orientada a marketing.\n\n"
+        "JSON:\n"
+        f"{json_text}"
+    )
+
+
+def descricao_canal(arquivo_prompt: str, insights: str) -> str:
+    return f"{carregar_prompt(arquivo_prompt)}\n\nINSIGHTS:\n{insights}"
+
+
+def hash_canal(chave: str, insights: str, modelo: str = "", formato: str = "texto") -> str:
+    """Identifica a saída de um canal: prompt do arquivo, saída esperada, modelo,
+    formato e insights. Editar prompts/blog.txt muda só o hash do blog."""
+    _, _, arquivo, esperado = CANAL_POR_CHAVE[chave]
+    partes = [chave, carregar_prompt(arquivo), esperado, modelo, formato, insights]
+    return hashlib.sha256("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+def montar_conteudos(textos: dict) -> str:
+    """Markdown final com uma seção por canal, na ordem de CANAIS."""
+    return "\n\n---\n\n".join(
+        f"## {titulo}\n\n{textos[chave]}" for chave, titulo, _, _ in CANAIS
+    )
+
+
+def mensagens_equivalentes(agente: dict, descricao: str, saida_esperada: str) -> list[dict]:
+    """Mensagens de chat equivalentes a um Agent + Task do CrewAI (um único passo)."""
+    return [
+        {"role": "system",
+         "content": (f"Você é {agente['role']}. {agente['backstory']}\n"
+                     f"Seu objetivo pessoal é: {agente['goal']}")},
+        {"role": "user",
+         "content": (f"{descricao}\n\nEste é o critério esperado para sua resposta final: "
+                     f"{saida_esperada}\nResponda apenas com a resposta final.")},
+    ]
+
+
+# ------------------------------------------------------------
+# 2. VALIDAÇÃO E REPARO
+# ------------------------------------------------------------
+
+# Frases que os prompts proíbem (metalinguagem, referência a entregas anteriores)
+# Por saída, as mesmas expressões que o seu prompt manda não usar
+# (descricao_insights e prompts/release.txt); os outros canais não têm lista
+EXPRESSOES_PROIBIDAS = {
+    "insights": (
+        "conforme acima", "como visto", "analisado anteriormente", "segue abaixo",
+        "resultado da análise",
+    ),
+    "release": (
+        "entregue acima", "conforme solicitado", "segue o release", "texto acima",
+        "resultado final",
+    ),
+}
+
+SECOES_ONE_PAGE = ["Dados", "Achados", "Oportunidades", "Implicações", "Próximos Passos"]
+MAX_PALAVRAS_BULLET = 12
+LINHAS_LINKEDIN = (6, 12)
+MAX_EMOJIS_LINKEDIN = 2
+H2_BLOG = (2, 4)
+MAX_CARACTERES_TITULO_BLOG = 65
+PARAGRAFOS_RELEASE = (5, 10)
+
+_EMOJI = re.compile("[\U0001F300-\U0001FAFF☀-➿]")
+
+
+def _linhas(texto):
+    return [l.strip() for l in (texto or "").strip().splitlines() if l.strip()]
+
+
+def _paragrafos(texto):
+    return [p.strip() for p in re.split(r"\n\s*\n", (texto or "").strip()) if p.strip()]
+
+
+def _expressoes_proibidas(chave, texto):
+    minusculo = texto.lower()
+    return [f"expressão proibida: “{e}”" for e in EXPRESSOES_PROIBIDAS.get(chave, ()) if e in minusculo]
+
+
+def dividir_secoes(texto, prefixo="### "):
+    """[(título, corpo)] das seções ``prefixo`` + título; o texto antes da 1ª fica com título None."""
+    secoes, titulo, corpo = [], None, []
+    for linha in (texto or "").strip().splitlines():
+        if linha.startswith(prefixo):
+            if titulo is not None or any(l.strip() for l in corpo):
+                secoes.append((titulo, "\n".join(corpo).strip()))
+            titulo, corpo = linha[len(prefixo):].strip(), []
+        else:
+            corpo.append(linha)
+    if titulo is not None or any(l.strip() for l in corpo):
+        secoes.append((titulo, "\n".join(corpo).strip()))
+    return secoes
+
+
+def substituir_secao(texto, titulo, corpo, prefixo="### "):
+    # o modelo às vezes devolve o título da seção junto com os bullets
+    corpo = "\n".join(l for l in corpo.strip().splitlines() if not l.startswith(prefixo))
+    return "\n\n".join(
+        f"{prefixo}{t}\n{corpo if t == titulo else c}" if t is not None else c
+        for t, c in dividir_secoes(texto, prefixo)
+    )
+
+
+def _problemas_secao_one_page(corpo):
+    problemas = []
+    for linha in _linhas(corpo):
+        if not linha.startswith(("- ", "* ", "• ")):
+            problemas.append(f"linha fora de bullet: “{linha[:60]}”")
+        elif len(linha[2:].split()) > MAX_PALAVRAS_BULLET:
+            problemas.append(f"bullet com mais de {MAX_PALAVRAS_BULLET} palavras: “{linha[2:]}”")
+    if not _linhas(corpo):
+        problemas.append("seção sem bullets")
+    return problemas
+
+
+def _estrutura_one_page(texto):
+    secoes = dividir_secoes(texto)
+    titulos = [t for t, _ in secoes]
+    if not (texto or "").strip().startswith("### Dados"):
+        return ["deve começar diretamente em “### Dados”"]
+    if titulos != SECOES_ONE_PAGE:
+        return [f"seções devem ser exatamente {', '.join(SECOES_ONE_PAGE)}, nesta ordem"]
+    return []
+
+
+def _validar_one_page(texto):
+    problemas = _estrutura_one_page(texto)
+    if problemas:
+        return problemas
+    return [
+        f"{titulo}: {p}"
+        for titulo, corpo in dividir_secoes(texto)
+        for p in _problemas_secao_one_page(corpo)
+    ]
+
+
+def _validar_linkedin(texto):
+    problemas = []
+    minimo, maximo = LINHAS_LINKEDIN
+    n = len(_linhas(texto))
+    if not minimo <= n <= maximo:
+        problemas.append(f"{n} linhas de texto (esperado entre {minimo} e {maximo})")
+    emojis = len(_EMOJI.findall(texto))
+    if emojis > MAX_EMOJIS_LINKEDIN:
+        problemas.append(f"{emojis} emojis (máximo {MAX_EMOJIS_LINKEDIN})")
+    return problemas
+
+
+def _validar_blog(texto):
+    problemas = []
+    linhas = _linhas(texto)
+    titulo = linhas[0].lstrip("#").strip() if linhas else ""
+    if not linhas[0].startswith("# "):
+        problemas.append("deve começar pelo título em H1 (“# ”)")
+    if len(titulo) > MAX_CARACTERES_TITULO_BLOG:
+        problemas.append(f"título com {len(titulo)} caracteres (máximo {MAX_CARACTERES_TITULO_BLOG})")
+    minimo, maximo = H2_BLOG
+    capitulos = sum(l.startswith("## ") for l in linhas)
+    if capitulos < minimo:
+        problemas.append(f"{capitulos} subtítulos H2 (mínimo {minimo})")
+    # o prompt pede travessão só na assinatura da citação e no bloco final
+    if any(("—" in l or " – " in l) and "Diego Senise" not in l and "ILUMEO —" not in l for l in linhas):
+        problemas.append("usa travessões")
+    if not re.search(r"meta[- ]?descri", texto, re.IGNORECASE):
+        problemas.append("sem meta-description ao final")
+    return problemas
+
+
+def _validar_release(texto):
+    problemas = []
+    paragrafos = _paragrafos(texto)
+    if "%" not in paragrafos[0]:
+        problemas.append("título sem valor percentual")
+    minimo, maximo = PARAGRAFOS_RELEASE
+    # título, subtítulo opcional, corpo, citação e parágrafo institucional
+    corpo = len(paragrafos) - 1
+    if not minimo <= corpo <= maximo + 3:
+        problemas.append(f"{corpo} parágrafos após o título (esperado {minimo} a {maximo} + citação e institucional)")
+    if "Diego Senise" not in texto:
+        problemas.append("sem a citação de Diego Senise")
+    if "ILUMEO" not in paragrafos[-1].upper():
+        problemas.append("último parágrafo deve ser o institucional da ILUMEO")
+    return problemas
+
+
+VALIDADORES = {
+    "linkedin": _validar_linkedin,
+    "blog": _validar_blog,
+    "one_page": _validar_one_page,
+    "release": _validar_release,
+}
+
+
+def validar_saida(chave, texto):
+    """Lista de problemas da saída de ``chave`` (um canal ou "insights"); vazia se válida."""
+    problemas = problemas_basicos(texto)
+    if problemas:
+        return problemas
+    validador = VALIDADORES.get(chave)
+    return _expressoes_proibidas(chave, texto) + (validador(texto) if validador else [])
+
+
+def secoes_a_reparar(chave, texto):
+    """{título: (corpo, problemas)} quando só algumas seções falham e a estrutura
+    está certa (One Page); vazio quando o canal inteiro precisa ser refeito."""
+    if chave != "one_page" or problemas_basicos(texto) or _estrutura_one_page(texto) \
+            or _expressoes_proibidas(chave, texto):
+        return {}
+    return {
+        titulo: (corpo, problemas)
+        for titulo, corpo in dividir_secoes(texto)
+        if (problemas := _problemas_secao_one_page(corpo))
+    }
+
+
+def descricao_reparo(texto, problemas):
+    """Pede a correção pontual da saída anterior, sem refazer a análise."""
+    lista = "\n".join(f"- {p}" for p in problemas)
+    return (
+        "O texto abaixo não atende a estas regras:\n"
+        f"{lista}\n\n"
+        "Reescreva-o corrigindo apenas esses pontos. Mantenha os dados, a ordem e o tom; "
+        "não acrescente informações nem comentários sobre a correção.\n\n"
+        f"TEXTO:\n{texto}"
+    )
+
+
+def descricao_reparo_secao(titulo, corpo, problemas):
+    lista = "\n".join(f"- {p}" for p in problemas)
+    return (
+        f"Reescreva somente os bullets da seção “{titulo}” de uma One Page executiva.\n"
+        f"Regras: apenas bullets iniciados por “- ”, no máximo {MAX_PALAVRAS_BULLET} palavras cada, "
+        "mesmos dados e sentido, sem o título da seção e sem comentários.\n"
+        f"Problemas encontrados:\n{lista}\n\n"
+        f"BULLETS:\n{corpo}"
+    )
+
+
+# ------------------------------------------------------------
+# 3. SAÍDA ESTRUTURADA (JSON SCHEMA)
+# ------------------------------------------------------------
+
+# Um schema para todos os canais; cada canal usa os campos do seu jeito (GUIA_ESTRUTURA)
+SCHEMA_CANAL = {
+    "type": "object",
+    "properties": {
+        "titulo": {"type": "string"},
+        "subtitulo": {"type": "string"},
+        "secoes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "titulo": {"type": "string"},
+                    "paragrafos": {"type": "array", "items": {"type": "string"}},
+                    "bullets": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["titulo", "paragrafos", "bullets"],
+                "additionalProperties": False,
+            },
+        },
+        "fechamento": {"type": "string"},
+    },
+    "required": ["titulo", "subtitulo", "secoes", "fechamento"],
+    "additionalProperties": False,
+}
+
+GUIA_ESTRUTURA = {
+    "linkedin": ("“titulo” e “subtitulo” vazios; cada linha do post é um item de “paragrafos” "
+                 "(seções com “titulo” vazio); “fechamento” é a chamada para o estudo."),
+    "blog": ("“titulo” é o H1; cada capítulo é uma seção com “titulo” (H2), “paragrafos” e, se "
+             "houver, “bullets”; “fechamento” traz o bloco final e a linha “Meta-description: ...”."),
+    "one_page": ("“titulo”, “subtitulo” e “fechamento” vazios; exatamente as seções Dados, Achados, "
+                 "Oportunidades, Implicações e Próximos Passos, só com “bullets” (“paragrafos” vazio)."),
+    "release": ("“titulo” com o valor percentual; “subtitulo” opcional (vazio se não houver); o corpo "
+                "em “paragrafos” de seções com “titulo” vazio, incluindo a citação; “fechamento” é o "
+                "parágrafo institucional da ILUMEO."),
+}
+
+# (prefixo do título principal, prefixo dos títulos de seção); None omite o título
+PREFIXOS_RENDER = {
+    "linkedin": ("", None),
+    "blog": ("# ", "## "),
+    "one_page": (None, "### "),
+    "release": ("", None),
+}
+
+
+def formato_resposta(chave):
+    """``response_format`` de JSON schema estrito para o canal."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": f"canal_{chave}", "strict": True, "schema": SCHEMA_CANAL},
+    }
+
+
+def instrucao_estruturada(chave):
+    return f"Responda no formato JSON pedido. {GUIA_ESTRUTURA[chave]}"
+
+
+_TIPOS_JSON = {"object": dict, "array": list, "string": str}
+
+
+def checar_schema(valor, schema, caminho="$"):
+    """Checagem rápida do subconjunto de JSON schema usado aqui (tipos,
+    required, additionalProperties, items). Devolve a lista de problemas."""
+    tipo = _TIPOS_JSON[schema["type"]]
+    if not isinstance(valor, tipo):
+        return [f"{caminho}: esperado {schema['type']}"]
+
+    problemas = []
+    if tipo is dict:
+        propriedades = schema.get("properties", {})
+        problemas += [f"{caminho}.{c}: obrigatório" for c in schema.get("required", []) if c not in valor]
+        if schema.get("additionalProperties") is False:
+            problemas += [f"{caminho}.{c}: campo não previsto" for c in valor if c not in propriedades]
+        for campo, sub in propriedades.items():
+            if campo in valor:
+                problemas += checar_schema(valor[campo], sub, f"{caminho}.{campo}")
+    elif tipo is list:
+        for i, item in enumerate(valor):
+            problemas += checar_schema(item, schema["items"], f"{caminho}[{i}]")
+    return problemas
+
+
+def ler_estruturado(texto):
+    """(dados, problemas) de uma resposta JSON do canal."""
+    try:
+        dados = json.loads(texto or "")
+    except ValueError as e:
+        return None, [f"JSON inválido: {e}"]
+    problemas = checar_schema(dados, SCHEMA_CANAL)
+    return (None if problemas else dados), problemas
+
+
+def renderizar_canal(chave, dados):
+    """Markdown do canal a partir dos dados estruturados (mesmo formato do modo texto)."""
+    prefixo_titulo, prefixo_secao = PREFIXOS_RENDER[chave]
+    blocos = []
+    if prefixo_titulo is not None and dados["titulo"].strip():
+        blocos.append(prefixo_titulo + dados["titulo"].strip())
+    if dados["subtitulo"].strip():
+        blocos.append(dados["subtitulo"].strip())
+
+    for secao in dados["secoes"]:
+        linhas = []
+        if prefixo_secao is not None and secao["titulo"].strip():
+            linhas.append(prefixo_secao + secao["titulo"].strip())
+        corpo = [p.strip() for p in secao["paragrafos"] if p.strip()]
+        bullets = [f"- {b.strip()}" for b in secao["bullets"] if b.strip()]
+        if bullets:
+            corpo.append("\n".join(bullets))
+        if linhas and corpo:
+            linhas[0] += "\n" + corpo.pop(0)
+        blocos += linhas + corpo
+
+    if dados["fechamento"].strip():
+        blocos.append(dados["fechamento"].strip())
+    return "\n\n".join(blocos)
+
+
+def validar_estruturado(chave, texto):
+    """Schema primeiro; se ok, as mesmas regras do canal sobre o markdown renderizado."""
+    dados, problemas = ler_estruturado(texto)
+    if problemas:
+        return problemas
+    return validar_saida(chave, renderizar_canal(chave, dados))
+
+
+# ------------------------------------------------------------
+# 4. MODO EM LOTE (BATCH API)
+# ------------------------------------------------------------
+
+# Sem ILUMEO_MODELO_LOTE cada tarefa usa o modelo da sua rota (modelos_ilumeo)
+MODELO_LOTE = os.getenv("ILUMEO_MODELO_LOTE")
+
+
+def gerar_em_lote(pesquisas: dict, cliente, modelo=MODELO_LOTE, estruturado=False, **kwargs_aguardar) -> dict:
+    """Insights e conteúdos multicanais de várias pesquisas pela Batch API.
+
+    ``pesquisas`` mapeia nome → JSON do ETL. São dois lotes: primeiro os
+    insights de todas as pesquisas, depois os 4 canais de cada uma a partir
+    dos insights. Devolve nome → {"insights", "conteudos", "canais", "erros",
+    "pendencias"}; ``canais`` tem o texto de cada canal em separado e
+    ``pendencias`` traz, por saída, o que não passou na validação. Com
+    ``estruturado`` os canais vêm em JSON schema (também em "estruturados").
+    """
+    from modelos_ilumeo import modelo_da_tarefa
+    from openai_ilumeo import executar_lote, requisicao_chat
+
+    saida = {
+        nome: {"insights": "", "conteudos": "", "canais": {}, "estruturados": {}, "erros": [], "pendencias": {}}
+        for nome in pesquisas
+    }
+
+    # lote 1: insights
+    requisicoes = [
+        requisicao_chat(
+            f"insights|{nome}",
+            mensagens_equivalentes(AGENTE_INSIGHTS, descricao_insights(json_text), SAIDA_INSIGHTS),
+            modelo or modelo_da_tarefa("insights"),
+        )
+        for nome, json_text in pesquisas.items()
+    ]
+    for custom_id, r in executar_lote(cliente, requisicoes, {"etapa": "insights"}, **kwargs_aguardar).items():
+        nome = custom_id.split("|", 1)[1]
+        if r["erro"]:
+            saida[nome]["erros"].append(f"insights: {r['erro']}")
+        else:
+            saida[nome]["insights"] = r["texto"]
+            if problemas := validar_saida("insights", r["texto"]):
+                saida[nome]["pendencias"]["insights"] = problemas
+
+    # lote 2: canais, só para quem teve insight
+    def requisicao_canal(nome, insights, chave, arquivo, esperado):
+        descricao = descricao_canal(arquivo, insights)
+        parametros = {}
+        if estruturado:
+            descricao = f"{descricao}\n\n{instrucao_estruturada(chave)}"
+            parametros["response_format"] = formato_resposta(chave)
+        return requisicao_chat(
+            f"{chave}|{nome}",
+            mensagens_equivalentes(AGENTE_CONTEUDO, descricao, esperado),
+            modelo or modelo_da_tarefa(chave),
+            **parametros,
+        )
+
+    requisicoes = [
+        requisicao_canal(nome, item["insights"], chave, arquivo, esperado)
+        for nome, item in saida.items() if item["insights"]
+        for chave, _, arquivo, esperado in CANAIS
+    ]
+    if not requisicoes:
+        return saida
+
+    textos = {nome: {} for nome in saida}
+    for custom_id, r in executar_lote(cliente, requisicoes, {"etapa": "conteudos"}, **kwargs_aguardar).items():
+        chave, nome = custom_id.split("|", 1)
+        if r["erro"]:
+            saida[nome]["erros"].append(f"{chave}: {r['erro']}")
+        elif estruturado:
+            dados, _ = ler_estruturado(r["texto"])
+            textos[nome][chave] = renderizar_canal(chave, dados) if dados else r["texto"]
+            saida[nome]["estruturados"][chave] = dados
+            if problemas := validar_estruturado(chave, r["texto"]):
+                saida[nome]["pendencias"][chave] = problemas
+        else:
+            textos[nome][chave] = r["texto"]
+            if problemas := validar_saida(chave, r["texto"]):
+                saida[nome]["pendencias"][chave] = problemas
+
+    for nome, por_canal in textos.items():
+        saida[nome]["canais"] = por_canal
+        if len(por_canal) == len(CANAIS):
+            saida[nome]["conteudos"] = montar_conteudos(por_canal)
+    return saida
+
+
+# ------------------------------------------------------------
+# 5. LINHA DE COMANDO
+# ------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gera insights e conteúdos de várias pesquisas (Excel) pela Batch API."
+    )
+    parser.add_argument("planilhas", nargs="+", help="arquivos .xlsx das pesquisas")
+    parser.add_argument("--saida", default="resultado_lote.json")
+    parser.add_argument("--local", action="store_true",
+                        help="usa o substituto local da Batch API (não chama a OpenAI)")
+    parser.add_argument("--estruturado", action="store_true",
+                        help="canais em JSON schema (título, seções, bullets), renderizados localmente")
+    args = parser.parse_args()
+
+    from etl_ilumeo2 import executar_etl
+    from openai_ilumeo import ClienteLoteLocal, cliente_openai
+
+    pesquisas = {}
+    for caminho in args.planilhas:
+        df, *_, logs = executar_etl(
+            caminho, categorizar=True, modo_texto="pyarrow", cruzamentos=True, caminho_json=None
+        )
+        if df is None:
+            print(f"{caminho}: ETL falhou, pesquisa ignorada ({logs[-2] if len(logs) > 1 else logs[-1]})")
+            continue
+        pesquisas[os.path.basename(caminho)] = df.attrs["json"]
+
+    if not pesquisas:
+        raise SystemExit("Nenhuma pesquisa carregada.")
+
+    cliente = ClienteLoteLocal() if args.local else cliente_openai()
+    resultado = gerar_em_lote(
+        pesquisas, cliente,
+        estruturado=args.estruturado,
+        ao_consultar=lambda lote: print(f"lote {lote.id}: {lote.status}", flush=True),
+    )
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados salvos em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,13 +8,34 @@ import pandas as pd
 import numpy as np
 import json
 import re
+import time
 from collections import defaultdict
 
+# dtype usado no modo de texto Arrow (ver converter_texto_arrow)
+DTYPE_TEXTO_ARROW = "string[pyarrow]"
+
+COLUNA_PROPORCIONALIZACAO = "RESPOSTA ESTÁ DENTRO DA PROPORCIONALIZAÇÃO? - imported_in_delfos"
+
+# Coluna com o peso de cada respondente quando há ponderação
+COLUNA_PESO = "peso_raking"
+
+# Tags das perguntas de perfil usadas no cubo de cruzamentos
+TAGS_PERFIL = ["#gen", "#cid", "#ren", "#ida"]
+
+# (coluna principal, coluna "Outro") unificadas em ajustar_cidade_genero
+PARES_CIDADE_GENERO = [
+    ("Em qual cidade você mora? #cid - Response",
+     "Em qual cidade você mora? #cid - Outro (especifique)"),
+    ("Qual é o seu gênero ? #gen - Response",
+     "Qual é o seu gênero ? #gen - Outro (especifique)"),
+]
+
 # ------------------------------------------------------------
 # 1. CARREGAMENTO E PADRONIZAÇÃO DE CABEÇALHOS
 # ------------------------------------------------------------
 
 def carregar_e_padronizar_dados(path, log):
+    # path pode ser um caminho ou um buffer em memória (ex.: upload do Streamlit)
 
     try:
         df = pd.read_excel(path, header=[0, 1])
@@ -40,17 +61,50 @@ def carregar_e_padronizar_dados(path, log):
         return None
 
 
+# ------------------------------------------------------------
+# 1.1 MODO DE TEXTO ARROW (OPCIONAL)
+# ------------------------------------------------------------
+
+def _pyarrow_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _eh_texto_arrow(serie):
+    return isinstance(serie.dtype, pd.StringDtype)
+
+
+def converter_texto_arrow(df, log):
+    """Passa as colunas de texto (object) para string[pyarrow].
+
+    Sem pyarrow instalado o ETL segue no dtype object padrão.
+    """
+    if not _pyarrow_disponivel():
+        log("⚠️ pyarrow não instalado. Seguindo com colunas de texto em object.")
+        return df
+
+    colunas_texto = [c for c in df.columns if df[c].dtype == "object"]
+    df[colunas_texto] = df[colunas_texto].astype(DTYPE_TEXTO_ARROW)
+
+    log(f"🏹 {len(colunas_texto)} colunas de texto convertidas para {DTYPE_TEXTO_ARROW}.")
+    return df
+
+
 # ------------------------------------------------------------
 # 2. FILTRO DE RESPONDENTES
 # ------------------------------------------------------------
 
 def filtrar_respondentes_validos(df, log):
 
-    coluna_filtro = "RESPOSTA ESTÁ DENTRO DA PROPORCIONALIZAÇÃO? - imported_in_delfos"
+    coluna_filtro = COLUNA_PROPORCIONALIZACAO
 
     if coluna_filtro in df.columns:
         linhas_iniciais = df.shape[0]
-        df = df[df[coluna_filtro] != "NÃO"]
+        # fillna: em string[pyarrow] a comparação com vazio vira <NA>
+        df = df[(df[coluna_filtro] != "NÃO").fillna(True).astype(bool)]
         removidos = linhas_iniciais - df.shape[0]
         log(f"✅ Filtragem aplicada: {removidos} removidos. Total final: {df.shape[0]}")
     else:
@@ -63,7 +117,7 @@ def filtrar_respondentes_validos(df, log):
 # 3. REMOVER COLUNAS INDESEJADAS (COM PROTEÇÃO TOM)
 # ------------------------------------------------------------
 
-def limpar_colunas_indesejadas(df, log):
+def identificar_colunas_indesejadas(colunas):
 
     termos_proibidos = [
         "RESPOSTA ESTÁ DENTRO DA PROPORCIONALIZAÇÃO? - imported_in_delfos",
@@ -88,7 +142,7 @@ def limpar_colunas_indesejadas(df, log):
 
     colunas_para_remover = []
 
-    for col in df.columns:
+    for col in colunas:
 
         # Se for Top of Mind / Aberta EN → NÃO REMOVE
         if any(tp in col for tp in termos_protegidos):
@@ -98,6 +152,13 @@ def limpar_colunas_indesejadas(df, log):
         if any(termo in col for termo in termos_proibidos):
             colunas_para_remover.append(col)
 
+    return colunas_para_remover
+
+
+def limpar_colunas_indesejadas(df, log):
+
+    colunas_para_remover = identificar_colunas_indesejadas(df.columns)
+
     n_antes = df.shape[1]
     df = df.drop(columns=colunas_para_remover, errors="ignore")
     n_depois = df.shape[1]
@@ -113,19 +174,10 @@ def limpar_colunas_indesejadas(df, log):
 
 def ajustar_cidade_genero(df, log):
 
-    col1 = "Em qual cidade você mora? #cid - Response"
-    col2 = "Em qual cidade você mora? #cid - Outro (especifique)"
-
-    if col1 in df.columns and col2 in df.columns:
-        df[col1] = df[col1].replace("", np.nan).fillna(df[col2])
-        df = df.drop(columns=[col2], errors="ignore")
-
-    col3 = "Qual é o seu gênero ? #gen - Response"
-    col4 = "Qual é o seu gênero ? #gen - Outro (especifique)"
-
-    if col3 in df.columns and col4 in df.columns:
-        df[col3] = df[col3].replace("", np.nan).fillna(df[col4])
-        df = df.drop(columns=[col4], errors="ignore")
+    for col1, col2 in PARES_CIDADE_GENERO:
+        if col1 in df.columns and col2 in df.columns:
+            df[col1] = df[col1].replace("", np.nan).fillna(df[col2])
+            df = df.drop(columns=[col2], errors="ignore")
 
     log("👤 Ajuste de cidade e gênero concluído.")
     return df
@@ -141,12 +193,46 @@ def remove_html(text):
     return re.sub(r"<.*?>", "", str(text)).strip()
 
 
+def _limpar_html_col(col):
+    if col.dtype == "object":
+        return col.map(remove_html)
+    if _eh_texto_arrow(col):
+        return col.str.replace(r"<.*?>", "", regex=True).str.strip()
+    return col
+
+
 def limpar_html_df(df, log):
-    df = df.apply(lambda col: col.map(remove_html) if col.dtype == "object" else col)
+    df = df.apply(_limpar_html_col)
     log("🧽 Remoção de HTML aplicada às colunas de texto.")
     return df
 
 
+# ------------------------------------------------------------
+# 5.1 CONVERSÃO PARA CATEGÓRICAS (OPCIONAL)
+# ------------------------------------------------------------
+
+def converter_categoricas(df, log, max_categorias=200, proporcao_max=0.5):
+    """Converte colunas de resposta com poucas respostas distintas para Categorical.
+
+    As colunas de escala ficam de fora porque viram numéricas logo em seguida.
+    """
+    colunas_escala = set(identificar_colunas_escala(df.columns))
+    limite = min(max_categorias, max(1, int(len(df) * proporcao_max)))
+
+    convertidas = 0
+    for col in df.columns:
+        if col in colunas_escala:
+            continue
+        if df[col].dtype != "object" and not _eh_texto_arrow(df[col]):
+            continue
+        if df[col].nunique(dropna=True) <= limite:
+            df[col] = df[col].astype("category")
+            convertidas += 1
+
+    log(f"🗂️ {convertidas} colunas convertidas para categóricas.")
+    return df
+
+
 # ------------------------------------------------------------
 # 6. LIMPEZA ESCALA LIKERT
 # ------------------------------------------------------------
@@ -161,18 +247,41 @@ def limpar_likert(valor):
     return np.nan
 
 
-def limpar_escalas(df, log):
+def _limpar_likert_arrow(serie):
+    """Versão vetorizada de limpar_likert para colunas string[pyarrow]."""
+    texto = serie.str.strip()
+    valores = pd.Series(np.nan, index=serie.index)
+
+    digitos = texto.str.fullmatch(r"\d+").fillna(False).astype(bool)
+    valores[digitos] = texto[digitos].astype("int64")
+    valores[texto.str.startswith("10").fillna(False).astype(bool)] = 10
+    valores[texto.str.startswith("0").fillna(False).astype(bool)] = 0
+
+    # mesmo dtype que pd.to_numeric daria para a coluna limpa via apply
+    if len(valores) and not valores.isna().any():
+        valores = valores.astype("int64")
+    return valores
 
-    colunas_escala = [
-        col for col in df.columns
+
+def identificar_colunas_escala(colunas):
+    return [
+        col for col in colunas
         if "gostaria de" in col.lower()
         or "receber como presente" in col.lower()
         or "nota" in col.lower()
     ]
 
+
+def limpar_escalas(df, log):
+
+    colunas_escala = identificar_colunas_escala(df.columns)
+
     log(f"🔄 Limpeza Likert em {len(colunas_escala)} colunas...")
 
     for col in colunas_escala:
+        if _eh_texto_arrow(df[col]):
+            df[col] = _limpar_likert_arrow(df[col])
+            continue
         df[col] = df[col].apply(limpar_likert)
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
@@ -180,10 +289,157 @@ def limpar_escalas(df, log):
     return df
 
 
+# ------------------------------------------------------------
+# 6.1 PONDERAÇÃO POR RAKING (OPCIONAL)
+# ------------------------------------------------------------
+
+def _resolver_coluna_alvo(colunas, chave):
+    # aceita o nome exato da coluna ou um trecho único dele (ex.: "#gen")
+    if chave in colunas:
+        return chave
+    candidatas = [c for c in colunas if chave in c]
+    if len(candidatas) != 1:
+        raise ValueError(
+            f"Meta de ponderação '{chave}' deve corresponder a exatamente uma coluna "
+            f"(encontradas: {len(candidatas)})."
+        )
+    return candidatas[0]
+
+
+def calcular_pesos_raking(df, alvos, max_iter=100, tolerancia=1e-6):
+    """Calcula pesos por raking (ajuste proporcional iterativo).
+
+    ``alvos`` mapeia coluna (ou tag, ex. "#gen") para {categoria: proporção}.
+    Respondentes fora das categorias da meta (ou sem resposta) não são
+    ajustados naquela variável. Os pesos voltam com média 1.
+    """
+    n = len(df)
+    pesos = np.ones(n)
+    dimensoes = []
+
+    for chave, metas in alvos.items():
+        col = _resolver_coluna_alvo(df.columns, chave)
+        categorias = list(metas)
+        proporcoes = np.asarray([metas[c] for c in categorias], dtype=float)
+        proporcoes = proporcoes / proporcoes.sum()
+
+        codigos = pd.Categorical(df[col], categories=categorias).codes.astype(np.int64)
+        presentes = np.bincount(codigos[codigos >= 0], minlength=len(categorias))
+        if (presentes == 0).any():
+            vazias = [c for c, q in zip(categorias, presentes) if q == 0]
+            raise ValueError(f"Categorias sem respondentes em '{col}': {vazias}")
+
+        dimensoes.append((col, codigos, proporcoes))
+
+    desvio = 0.0
+    iteracao = 0
+    for iteracao in range(1, max_iter + 1):
+        desvio = 0.0
+        for _, codigos, proporcoes in dimensoes:
+            validos = codigos >= 0
+            totais = np.bincount(codigos[validos], weights=pesos[validos], minlength=len(proporcoes))
+            desvio = max(desvio, np.abs(totais / totais.sum() - proporcoes).max())
+            fatores = proporcoes * totais.sum() / totais
+            pesos[validos] *= fatores[codigos[validos]]
+        if desvio < tolerancia:
+            break
+
+    if n:
+        pesos *= n / pesos.sum()
+
+    info = {
+        "variaveis": [col for col, _, _ in dimensoes],
+        "iteracoes": iteracao,
+        "convergiu": bool(desvio < tolerancia),
+        "n_efetivo": round(float(pesos.sum() ** 2 / (pesos ** 2).sum()), 1) if n else 0.0,
+        "peso_min": round(float(pesos.min()), 3) if n else 0.0,
+        "peso_max": round(float(pesos.max()), 3) if n else 0.0,
+    }
+    return pesos, info
+
+
+def aplicar_ponderacao(df, alvos, log):
+    pesos, info = calcular_pesos_raking(df, alvos)
+    df[COLUNA_PESO] = pesos
+    df.attrs["ponderacao"] = info
+
+    status = "convergiu" if info["convergiu"] else "NÃO convergiu"
+    log(
+        f"⚖️ Raking em {len(info['variaveis'])} variáveis {status} em {info['iteracoes']} iterações "
+        f"(pesos de {info['peso_min']} a {info['peso_max']}, n efetivo {info['n_efetivo']})."
+    )
+    return df
+
+
 # ------------------------------------------------------------
 # 7. FUNÇÕES DE GERAÇÃO DE TABELAS (SIMPLES, MULTI, MATRIZ TEXTO, MATRIZ NOTA)
 # ------------------------------------------------------------
 
+def _indice_object(valores, nome):
+    # índice em object com NaN para ausentes, igual ao value_counts padrão
+    indice = pd.Index(valores).astype(object)
+    return pd.Index(indice.where(indice.notna(), np.nan), name=nome)
+
+
+def _contar_valores(serie, dropna=True):
+    """Mesmo resultado de ``serie.value_counts(dropna=dropna)``.
+
+    Em colunas categóricas a contagem é feita direto nos códigos inteiros,
+    mantendo a ordem de primeira aparição para os empates. Em string[pyarrow]
+    a contagem roda no Arrow e o índice volta para object com NaN, como no
+    caminho padrão.
+    """
+    if _eh_texto_arrow(serie):
+        contagem = serie.value_counts(dropna=dropna, sort=False)
+        indice = _indice_object(contagem.index, serie.name)
+        return pd.Series(
+            contagem.to_numpy(dtype=np.int64), index=indice, name="count"
+        ).sort_values(ascending=False)
+
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.value_counts(dropna=dropna)
+
+    codigos = serie.cat.codes.to_numpy()
+    if dropna:
+        codigos = codigos[codigos >= 0]
+
+    unicos = pd.unique(codigos)
+    contagem = np.bincount(codigos.astype(np.int64) + 1)[unicos.astype(np.int64) + 1]
+    chaves = pd.Categorical.from_codes(unicos, serie.cat.categories)
+
+    indice = _indice_object(chaves, serie.name)
+    return pd.Series(contagem, index=indice, name="count").sort_values(ascending=False)
+
+
+def _contar_valores_ponderados(serie, pesos, dropna=True):
+    """Soma dos pesos por resposta, ordenada como ``value_counts``."""
+    codigos, chaves = pd.factorize(serie)
+    validos = codigos >= 0
+    somas = np.bincount(codigos[validos], weights=pesos[validos], minlength=len(chaves))
+
+    if pd.api.types.is_numeric_dtype(serie):
+        indice = pd.Index(chaves, name=serie.name)
+    else:
+        indice = _indice_object(chaves, serie.name)
+    contagem = pd.Series(somas, index=indice, name="count")
+
+    if not dropna and not validos.all():
+        nulos = pd.Series([pesos[~validos].sum()], index=_indice_object([np.nan], serie.name))
+        contagem = pd.concat([contagem, nulos])
+
+    return contagem.sort_values(ascending=False)
+
+
+def _tabela_frequencia(abs_):
+    rel_ = abs_ / abs_.sum() * 100
+    if pd.api.types.is_float_dtype(abs_):
+        abs_ = abs_.round(1)
+    return pd.DataFrame({
+        "Frequência Absoluta": abs_,
+        "Frequência Relativa (%)": rel_.round(1)
+    })
+
+
 def identificar_colunas_simples(df):
     col_response = [c for c in df.columns if "response" in c.lower()]
     col_not_multi = [c for c in df.columns if " - " not in c]
@@ -218,7 +474,12 @@ def classificar_perguntas(df, grupos):
             continue
 
         marca_ex = exemplo.split(" - ")[1].strip()
-        valores = serie.astype(str).str.strip().unique()
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            valores = serie.cat.categories.astype(str).str.strip().unique()
+        elif _eh_texto_arrow(serie):
+            valores = serie.str.strip().unique()
+        else:
+            valores = serie.astype(str).str.strip().unique()
 
         if marca_ex in valores:
             grupos_multi[pergunta] = cols
@@ -228,21 +489,20 @@ def classificar_perguntas(df, grupos):
     return grupos_multi, grupos_texto, grupos_nota
 
 
-def tabelas_simples(df, colunas):
+def tabelas_simples(df, colunas, pesos=None):
     t = {}
     for col in colunas:
-        abs_ = df[col].value_counts(dropna=False)
-        rel_ = df[col].value_counts(normalize=True, dropna=False) * 100
-        t[col] = pd.DataFrame({
-            "Frequência Absoluta": abs_,
-            "Frequência Relativa (%)": rel_.round(1)
-        })
+        if pesos is not None:
+            abs_ = _contar_valores_ponderados(df[col], pesos, dropna=False)
+        else:
+            abs_ = _contar_valores(df[col], dropna=False)
+        t[col] = _tabela_frequencia(abs_)
     return t
 
 
-def tabelas_multiresposta(df, grupos):
+def tabelas_multiresposta(df, grupos, pesos=None):
     t = {}
-    total = len(df)
+    total = len(df) if pesos is None else pesos.sum()
 
     for pergunta, cols in grupos.items():
         marcas = []
@@ -251,11 +511,15 @@ def tabelas_multiresposta(df, grupos):
 
         for col in cols:
             marca = col.split(" - ")[1].strip()
-            freq_abs = (df[col] == marca).sum()
+            marcados = (df[col] == marca).to_numpy(dtype=bool, na_value=False)
+            if pesos is not None:
+                freq_abs = float(pesos[marcados].sum())
+            else:
+                freq_abs = int(marcados.sum())
             freq_rel = (freq_abs / total * 100) if total else 0
 
             marcas.append(marca)
-            abs_list.append(freq_abs)
+            abs_list.append(freq_abs if pesos is None else round(freq_abs, 1))
             rel_list.append(round(freq_rel, 1))
 
         t[pergunta] = pd.DataFrame({
@@ -266,56 +530,60 @@ def tabelas_multiresposta(df, grupos):
     return t
 
 
-def tabelas_matriz_texto(df, grupos):
+def tabelas_matriz_texto(df, grupos, pesos=None):
     t = {}
     for pergunta, cols in grupos.items():
         meios = {}
         for col in cols:
             meio = col.split(" - ")[1].strip()
-            serie = df[col].dropna().astype(str).str.strip()
-            abs_ = serie.value_counts()
-            rel_ = (serie.value_counts(normalize=True) * 100).round(1)
-            meios[meio] = pd.DataFrame({
-                "Frequência Absoluta": abs_,
-                "Frequência Relativa (%)": rel_
-            })
+            if pesos is not None:
+                serie = df[col]
+                if serie.dtype == "object" or pd.api.types.is_numeric_dtype(serie):
+                    serie = serie.where(serie.isna(), serie.astype(str).str.strip()).astype(object)
+                abs_ = _contar_valores_ponderados(serie, pesos, dropna=True)
+            elif isinstance(df[col].dtype, pd.CategoricalDtype):
+                abs_ = _contar_valores(df[col], dropna=True)
+            elif _eh_texto_arrow(df[col]):
+                abs_ = _contar_valores(df[col].dropna().str.strip(), dropna=True)
+            else:
+                abs_ = df[col].dropna().astype(str).str.strip().value_counts()
+            meios[meio] = _tabela_frequencia(abs_)
         t[pergunta] = meios
     return t
 
 
-def tabelas_matriz_nota(df, grupos):
+def tabelas_matriz_nota(df, grupos, pesos=None):
     t = {}
     for pergunta, cols in grupos.items():
         marcas = {}
         for col in cols:
             marca = col.split(" - ")[1].strip()
-            serie = df[col].dropna()
-            abs_ = serie.value_counts().sort_index()
-            rel_ = (serie.value_counts(normalize=True).sort_index() * 100).round(1)
-            marcas[marca] = pd.DataFrame({
-                "Frequência Absoluta": abs_,
-                "Frequência Relativa (%)": rel_
-            })
+            if pesos is not None:
+                abs_ = _contar_valores_ponderados(df[col], pesos, dropna=True).sort_index()
+            else:
+                abs_ = df[col].dropna().value_counts().sort_index()
+            marcas[marca] = _tabela_frequencia(abs_)
         t[pergunta] = marcas
     return t
 
 
-def gerar_todas_as_tabelas(df):
+def gerar_todas_as_tabelas(df, pesos=None):
     col_simples = identificar_colunas_simples(df)
-    t_simples = tabelas_simples(df, col_simples)
+    t_simples = tabelas_simples(df, col_simples, pesos=pesos)
 
     col_hifen = encontrar_colunas_hifen(df)
     grupos = agrupar_por_pergunta(col_hifen)
     grupos_multi, grupos_texto, grupos_nota = classificar_perguntas(df, grupos)
 
-    t_multi = tabelas_multiresposta(df, grupos_multi)
-    t_matriz = tabelas_matriz_texto(df, grupos_texto)
-    t_nota = tabelas_matriz_nota(df, grupos_nota)
+    t_multi = tabelas_multiresposta(df, grupos_multi, pesos=pesos)
+    t_matriz = tabelas_matriz_texto(df, grupos_texto, pesos=pesos)
+    t_nota = tabelas_matriz_nota(df, grupos_nota, pesos=pesos)
 
     return t_simples, t_multi, t_matriz, t_nota
 
 
-def gerar_json_todas_as_tabelas(t_simples, t_multi, t_matriz, t_nota):
+def gerar_json_todas_as_tabelas(t_simples, t_multi, t_matriz, t_nota, cruzamentos=None,
+                                ponderacao=None):
 
     resultado = {
         "perguntas_simples": [],
@@ -333,9 +601,10 @@ def gerar_json_todas_as_tabelas(t_simples, t_multi, t_matriz, t_nota):
     for pergunta, tabela in t_multi.items():
         bloco = {"pergunta": pergunta, "marcas": []}
         for marca, row in tabela.iterrows():
+            freq_abs = float(row["Frequência Absoluta"])
             bloco["marcas"].append({
                 "marca": marca,
-                "frequencia_absoluta": int(row["Frequência Absoluta"]),
+                "frequencia_absoluta": int(freq_abs) if freq_abs.is_integer() else freq_abs,
                 "frequencia_relativa": float(row["Frequência Relativa (%)"])
             })
         resultado["multirresposta"].append(bloco)
@@ -358,14 +627,695 @@ def gerar_json_todas_as_tabelas(t_simples, t_multi, t_matriz, t_nota):
             })
         resultado["matriz_nota"].append(bloco)
 
-    return json.dumps(resultado, ensure_ascii=False, indent=2)
+    if ponderacao is not None:
+        resultado["ponderacao"] = ponderacao
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if cruzamentos is None:
+        return texto
+
+    # o cubo é quase só números: indentado, cada número iria numa linha e o
+    # trecho ficaria ~4x maior no prompt. Entra compacto como última chave.
+    cubo = json.dumps({
+        "formato_celulas": [
+            "indice_categoria_perfil",
+            "indice_resposta",
+            "frequencia_absoluta",
+            "percentual_no_perfil",
+            "lift",
+        ],
+        "perfis": cruzamentos,
+    }, ensure_ascii=False, separators=(",", ":"))
+    return f'{texto[:-2]},\n  "cruzamentos": {cubo}\n}}'
+
+
+# ------------------------------------------------------------
+# 7.1 BACKEND POLARS (OPCIONAL)
+# ------------------------------------------------------------
+
+def _importar_polars():
+    try:
+        import polars as pl
+    except ImportError:
+        return None
+    return pl
+
+
+def _preparar_para_polars(df):
+    # Colunas object com tipos misturados não entram no Polars; viram texto,
+    # como o remove_html já faria no caminho pandas.
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype != "object":
+            continue
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _expr_likert_polars(pl, col):
+    texto = pl.col(col).cast(pl.Utf8).str.strip_chars()
+    return (
+        pl.when(texto.str.starts_with("0")).then(pl.lit(0, pl.Int64))
+        .when(texto.str.starts_with("10")).then(pl.lit(10, pl.Int64))
+        .when(texto.str.contains(r"^[0-9]+$")).then(texto.cast(pl.Int64, strict=False))
+        .otherwise(pl.lit(None, pl.Int64))
+        .alias(col)
+    )
+
+
+def _consulta_limpeza_polars(pl, df_pl, log):
+    """Filtro, seleção de colunas, cidade/gênero, HTML e Likert numa LazyFrame."""
+    lf = df_pl.lazy()
+    schema = dict(df_pl.schema)
+
+    if COLUNA_PROPORCIONALIZACAO in schema:
+        if schema[COLUNA_PROPORCIONALIZACAO] == pl.Utf8:
+            lf = lf.filter(pl.col(COLUNA_PROPORCIONALIZACAO).ne_missing("NÃO"))
+    else:
+        log(f"⚠️ Coluna '{COLUNA_PROPORCIONALIZACAO}' não encontrada. Nenhuma linha removida.")
+
+    remover = set(identificar_colunas_indesejadas(schema))
+    colunas = [c for c in schema if c not in remover]
+    lf = lf.select(colunas)
+    log(f"✅ Remoção de colunas: {len(remover)} colunas removidas.")
+
+    for col1, col2 in PARES_CIDADE_GENERO:
+        if col1 not in colunas or col2 not in colunas:
+            continue
+        principal, outro = pl.col(col1), pl.col(col2)
+        if pl.Utf8 in (schema[col1], schema[col2]):
+            principal, outro = principal.cast(pl.Utf8), outro.cast(pl.Utf8)
+            principal = pl.when(principal == "").then(None).otherwise(principal)
+            schema[col1] = pl.Utf8
+        lf = lf.with_columns(pl.coalesce(principal, outro).alias(col1)).drop(col2)
+        colunas.remove(col2)
+    log("👤 Ajuste de cidade e gênero concluído.")
+
+    lf = lf.with_columns([
+        pl.col(c).str.replace_all(r"<.*?>", "").str.strip_chars()
+        for c in colunas if schema[c] == pl.Utf8
+    ])
+    log("🧽 Remoção de HTML aplicada às colunas de texto.")
+
+    colunas_escala = identificar_colunas_escala(colunas)
+    log(f"🔄 Limpeza Likert em {len(colunas_escala)} colunas...")
+    lf = lf.with_columns([_expr_likert_polars(pl, c) for c in colunas_escala])
+
+    return lf
+
+
+def _polars_para_pandas(df_pl):
+    df = df_pl.to_pandas()
+    for col in df.columns:
+        if df[col].dtype == "object":
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _expr_contagem_polars(pl, col, dropna, como_texto):
+    expr = pl.col(col)
+    if dropna:
+        expr = expr.drop_nulls()
+    if como_texto:
+        expr = expr.cast(pl.Utf8).str.strip_chars()
+    # unique/unique_counts mantêm a ordem de aparição, como o value_counts
+    return expr.unique(maintain_order=True).implode(), expr.unique_counts().implode()
+
+
+def _contagens_polars(pl, df_pl, df, especificacoes):
+    """Calcula todas as contagens numa única consulta paralela.
+
+    ``especificacoes`` é uma lista de (coluna, dropna, como_texto). Devolve
+    uma Series por especificação, já ordenada como ``value_counts``.
+    """
+    exprs = []
+    for i, (col, dropna, como_texto) in enumerate(especificacoes):
+        chaves, contagens = _expr_contagem_polars(pl, col, dropna, como_texto)
+        exprs += [chaves.alias(f"k{i}"), contagens.alias(f"n{i}")]
+
+    linha = df_pl.select(exprs).row(0, named=True) if exprs else {}
+
+    resultado = []
+    for i, (col, dropna, como_texto) in enumerate(especificacoes):
+        if dropna and not como_texto:
+            indice = pd.Index(linha[f"k{i}"], dtype=df[col].dtype, name=col)
+        else:
+            indice = _indice_object(linha[f"k{i}"], col)
+        resultado.append(pd.Series(
+            np.asarray(linha[f"n{i}"], dtype=np.int64), index=indice, name="count"
+        ).sort_values(ascending=False))
+    return resultado
+
+
+def _classificar_perguntas_polars(pl, df_pl, df, grupos):
+    grupos_multi = {}
+    grupos_texto = {}
+    grupos_nota = {}
+
+    exprs = {}
+    for pergunta, cols in grupos.items():
+        exemplo = cols[0]
+        if pd.api.types.is_numeric_dtype(df[exemplo]):
+            grupos_nota[pergunta] = cols
+            continue
+        marca_ex = exemplo.split(" - ")[1].strip()
+        exprs[pergunta] = (
+            pl.col(exemplo).drop_nulls().cast(pl.Utf8).str.strip_chars() == marca_ex
+        ).any()
+
+    aliases = {pergunta: f"p{i}" for i, pergunta in enumerate(exprs)}
+    linha = df_pl.select(
+        [expr.alias(aliases[p]) for p, expr in exprs.items()]
+    ).row(0, named=True) if exprs else {}
+
+    for pergunta in exprs:
+        if linha[aliases[pergunta]]:
+            grupos_multi[pergunta] = grupos[pergunta]
+        else:
+            grupos_texto[pergunta] = grupos[pergunta]
+
+    return grupos_multi, grupos_texto, grupos_nota
+
+
+def _tabelas_multiresposta_polars(pl, df_pl, grupos):
+    exprs = []
+    for pergunta, cols in grupos.items():
+        for col in cols:
+            marca = col.split(" - ")[1].strip()
+            if df_pl.schema[col] == pl.Utf8:
+                exprs.append((pl.col(col) == marca).sum().cast(pl.Int64))
+            else:
+                exprs.append(pl.lit(0, pl.Int64))
+
+    valores = iter(df_pl.select(
+        [e.alias(f"m{i}") for i, e in enumerate(exprs)]
+    ).row(0)) if exprs else iter(())
+
+    t = {}
+    total = df_pl.height
+    for pergunta, cols in grupos.items():
+        marcas = [col.split(" - ")[1].strip() for col in cols]
+        abs_list = [next(valores) for _ in cols]
+        rel_list = [round((a / total * 100) if total else 0, 1) for a in abs_list]
+        t[pergunta] = pd.DataFrame({
+            "Frequência Absoluta": abs_list,
+            "Frequência Relativa (%)": rel_list
+        }, index=marcas)
+    return t
+
+
+def gerar_todas_as_tabelas_polars(pl, df_pl, df):
+    col_simples = identificar_colunas_simples(df)
+
+    col_hifen = encontrar_colunas_hifen(df)
+    grupos = agrupar_por_pergunta(col_hifen)
+    grupos_multi, grupos_texto, grupos_nota = _classificar_perguntas_polars(pl, df_pl, df, grupos)
+
+    especificacoes = [(c, False, False) for c in col_simples]
+    especificacoes += [(c, True, True) for cols in grupos_texto.values() for c in cols]
+    especificacoes += [(c, True, False) for cols in grupos_nota.values() for c in cols]
+    contagens = iter(_contagens_polars(pl, df_pl, df, especificacoes))
+
+    t_simples = {col: _tabela_frequencia(next(contagens)) for col in col_simples}
+
+    t_multi = _tabelas_multiresposta_polars(pl, df_pl, grupos_multi)
+
+    t_matriz = {}
+    for pergunta, cols in grupos_texto.items():
+        t_matriz[pergunta] = {
+            col.split(" - ")[1].strip(): _tabela_frequencia(next(contagens)) for col in cols
+        }
+
+    t_nota = {}
+    for pergunta, cols in grupos_nota.items():
+        t_nota[pergunta] = {
+            col.split(" - ")[1].strip(): _tabela_frequencia(next(contagens).sort_index())
+            for col in cols
+        }
+
+    return t_simples, t_multi, t_matriz, t_nota
+
+
+def processar_dados_polars(df, log):
+    """Mesmas etapas de processar_dados expressas como consulta Polars.
+
+    Devolve o DataFrame limpo em pandas e as mesmas tabelas do caminho
+    pandas, gerando um JSON idêntico.
+    """
+    pl = _importar_polars()
+
+    linhas_iniciais = df.shape[0]
+    df_pl = pl.from_pandas(_preparar_para_polars(df))
+    df_pl = _consulta_limpeza_polars(pl, df_pl, log).collect()
+
+    removidos = linhas_iniciais - df_pl.height
+    log(f"✅ Filtragem aplicada: {removidos} removidos. Total final: {df_pl.height}")
+    log(f"📊 Shape após limpeza: {df_pl.shape}")
+
+    df = _polars_para_pandas(df_pl)
+
+    log("📊 Gerando tabelas de frequência...")
+    t_simples, t_multi, t_matriz, t_nota = gerar_todas_as_tabelas_polars(pl, df_pl, df)
+    log("✅ Tabelas de frequência criadas.")
+
+    return df, t_simples, t_multi, t_matriz, t_nota
+
+
+# ------------------------------------------------------------
+# 7.2 MOTOR DUCKDB PARA TABELAS E CRUZAMENTOS (OPCIONAL)
+# ------------------------------------------------------------
+
+TABELA_DUCKDB = "pesquisa"
+COLUNA_LINHA_DUCKDB = "__linha__"
+
+
+def _importar_duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        return None
+    return duckdb
+
+
+def _sql_id(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+
+def _eh_texto(serie):
+    return (
+        serie.dtype == "object"
+        or _eh_texto_arrow(serie)
+        or isinstance(serie.dtype, pd.CategoricalDtype)
+    )
+
+
+def registrar_pesquisa_duckdb(df):
+    """Registra a pesquisa limpa numa conexão DuckDB em memória.
+
+    A tabela ``pesquisa`` ganha a coluna ``__linha__`` com a posição de cada
+    respondente, usada para desempatar contagens e para os cruzamentos.
+    """
+    duckdb = _importar_duckdb()
+    if duckdb is None:
+        raise ImportError("duckdb não está instalado. Rode: pip install duckdb")
+
+    # string[pyarrow] vai como ArrowDtype (mesmos buffers): o scan de pandas do
+    # DuckDB lê ArrowStringArray._data, obsoleto, e emite FutureWarning
+    colunas_arrow = [c for c in df.columns if df[c].dtype == DTYPE_TEXTO_ARROW]
+    tabela = df
+    if colunas_arrow:
+        import pyarrow as pa
+        tabela = df.astype({c: pd.ArrowDtype(pa.string()) for c in colunas_arrow}, copy=False)
+
+    con = duckdb.connect()
+    con.register(TABELA_DUCKDB, tabela.assign(**{COLUNA_LINHA_DUCKDB: np.arange(len(df))}))
+    return con
+
+
+def _contagens_duckdb(con, df, colunas, dropna, tipo_sql="VARCHAR", aparar=False):
+    """Conta todas as ``colunas`` numa única consulta GROUP BY sobre UNPIVOT.
+
+    Devolve {coluna: Series} ordenadas como ``value_counts``.
+    """
+    if not colunas:
+        return {}
+
+    valor = f"CAST({{col}} AS {tipo_sql})"
+    if aparar:
+        valor = f"trim({valor})"
+
+    selecao = ", ".join(
+        valor.format(col=_sql_id(c)) + f" AS {_sql_id(c)}" for c in colunas
+    )
+    filtro = "WHERE valor IS NOT NULL" if dropna else ""
+    consulta = f"""
+        WITH base AS (
+            SELECT {COLUNA_LINHA_DUCKDB}, {selecao} FROM {TABELA_DUCKDB}
+        )
+        SELECT coluna, valor, count(*) AS n, min({COLUNA_LINHA_DUCKDB}) AS primeira
+        FROM base UNPIVOT INCLUDE NULLS (valor FOR coluna IN ({", ".join(_sql_id(c) for c in colunas)}))
+        {filtro}
+        GROUP BY coluna, valor
+        ORDER BY coluna, primeira
+    """
+    linhas = con.execute(consulta).fetchall()
+
+    agrupado = defaultdict(lambda: ([], []))
+    for coluna, chave, n, _ in linhas:
+        agrupado[coluna][0].append(chave)
+        agrupado[coluna][1].append(n)
+
+    resultado = {}
+    for col in colunas:
+        chaves, contagens = agrupado[col]
+        if tipo_sql == "VARCHAR":
+            indice = _indice_object(chaves, col)
+        else:
+            indice = pd.Index(chaves, name=col).astype(df[col].dtype)
+        resultado[col] = pd.Series(
+            np.asarray(contagens, dtype=np.int64), index=indice, name="count"
+        ).sort_values(ascending=False)
+    return resultado
+
+
+def _tabelas_multiresposta_duckdb(con, df, grupos):
+    somas = []
+    parametros = []
+    for cols in grupos.values():
+        for col in cols:
+            if _eh_texto(df[col]):
+                somas.append(f"count(*) FILTER (WHERE CAST({_sql_id(col)} AS VARCHAR) = ?)")
+                parametros.append(col.split(" - ")[1].strip())
+            else:
+                somas.append("0")
+
+    valores = iter(
+        con.execute(f"SELECT {', '.join(somas)} FROM {TABELA_DUCKDB}", parametros).fetchone()
+        if somas else ()
+    )
+
+    t = {}
+    total = len(df)
+    for pergunta, cols in grupos.items():
+        marcas = [col.split(" - ")[1].strip() for col in cols]
+        abs_list = [int(next(valores)) for _ in cols]
+        rel_list = [round((a / total * 100) if total else 0, 1) for a in abs_list]
+        t[pergunta] = pd.DataFrame({
+            "Frequência Absoluta": abs_list,
+            "Frequência Relativa (%)": rel_list
+        }, index=marcas)
+    return t
+
+
+def gerar_todas_as_tabelas_duckdb(df):
+    """Mesmas tabelas de gerar_todas_as_tabelas, calculadas pelo DuckDB."""
+    con = registrar_pesquisa_duckdb(df)
+
+    col_simples = identificar_colunas_simples(df)
+    col_hifen = encontrar_colunas_hifen(df)
+    grupos = agrupar_por_pergunta(col_hifen)
+    grupos_multi, grupos_texto, grupos_nota = classificar_perguntas(df, grupos)
+
+    simples_texto = [c for c in col_simples if _eh_texto(df[c])]
+    contagens = _contagens_duckdb(con, df, simples_texto, dropna=False)
+    t_simples = {}
+    for col in col_simples:
+        abs_ = contagens[col] if col in contagens else _contar_valores(df[col], dropna=False)
+        t_simples[col] = _tabela_frequencia(abs_)
+
+    t_multi = _tabelas_multiresposta_duckdb(con, df, grupos_multi)
+
+    cols_texto = [c for cols in grupos_texto.values() for c in cols]
+    contagens = _contagens_duckdb(con, df, cols_texto, dropna=True, aparar=True)
+    t_matriz = {
+        pergunta: {col.split(" - ")[1].strip(): _tabela_frequencia(contagens[col]) for col in cols}
+        for pergunta, cols in grupos_texto.items()
+    }
+
+    cols_nota = [c for cols in grupos_nota.values() for c in cols]
+    numericas = [c for c in cols_nota if pd.api.types.is_numeric_dtype(df[c])]
+    contagens = _contagens_duckdb(con, df, numericas, dropna=True, tipo_sql="DOUBLE")
+    t_nota = {}
+    for pergunta, cols in grupos_nota.items():
+        marcas = {}
+        for col in cols:
+            abs_ = contagens[col] if col in contagens else df[col].dropna().value_counts()
+            marcas[col.split(" - ")[1].strip()] = _tabela_frequencia(abs_.sort_index())
+        t_nota[pergunta] = marcas
+
+    con.close()
+    return t_simples, t_multi, t_matriz, t_nota
+
+
+def _respostas_longas_sql(colunas, pergunta):
+    """SQL (linha, categoria) de uma coluna ou de um grupo multirresposta.
+
+    A coluna vai sem CAST: notas continuam números (10.0, não "10.0") e
+    batem com os rótulos das tabelas de frequência.
+    """
+    if pergunta in colunas:
+        return (
+            f"SELECT {COLUNA_LINHA_DUCKDB} AS linha, {_sql_id(pergunta)} AS categoria "
+            f"FROM {TABELA_DUCKDB} WHERE {_sql_id(pergunta)} IS NOT NULL"
+        ), []
+
+    grupo = agrupar_por_pergunta(
+        [c for c in colunas if c != COLUNA_LINHA_DUCKDB and " - " in c]
+    ).get(pergunta)
+    if not grupo:
+        raise ValueError(f"Pergunta '{pergunta}' não encontrada na pesquisa.")
+
+    # Multirresposta: cada coluna marcada vira uma linha com o nome da marca
+    partes = []
+    parametros = []
+    for col in grupo:
+        marca = col.split(" - ")[1].strip()
+        partes.append(
+            f"SELECT {COLUNA_LINHA_DUCKDB} AS linha, ? AS categoria FROM {TABELA_DUCKDB} "
+            f"WHERE trim(CAST({_sql_id(col)} AS VARCHAR)) = ?"
+        )
+        parametros += [marca, marca]
+    return " UNION ALL ".join(partes), parametros
+
+
+def tabela_cruzada(con, pergunta_linha, pergunta_coluna, normalizar=None):
+    """Cruza duas perguntas da pesquisa registrada em ``con``.
+
+    Cada pergunta pode ser o nome de uma coluna ou o enunciado de um grupo
+    multirresposta. ``normalizar`` aceita None (contagens), "linha", "coluna"
+    ou "total" (percentuais arredondados em 1 casa).
+    """
+    colunas = con.table(TABELA_DUCKDB).columns
+    sql_linha, par_linha = _respostas_longas_sql(colunas, pergunta_linha)
+    sql_coluna, par_coluna = _respostas_longas_sql(colunas, pergunta_coluna)
+
+    contagens = con.execute(f"""
+        WITH l AS ({sql_linha}), c AS ({sql_coluna})
+        SELECT l.categoria AS linha, c.categoria AS coluna, count(*) AS n
+        FROM l JOIN c USING (linha)
+        GROUP BY ALL
+    """, par_linha + par_coluna).df()
+
+    tabela = contagens.pivot(index="linha", columns="coluna", values="n").fillna(0).astype(int)
+    tabela.index.name = pergunta_linha
+    tabela.columns.name = pergunta_coluna
+
+    if normalizar == "linha":
+        tabela = (tabela.div(tabela.sum(axis=1), axis=0) * 100).round(1)
+    elif normalizar == "coluna":
+        tabela = (tabela.div(tabela.sum(axis=0), axis=1) * 100).round(1)
+    elif normalizar == "total":
+        tabela = (tabela / tabela.to_numpy().sum() * 100).round(1)
+
+    return tabela
+
+
+# ------------------------------------------------------------
+# 7.3 CUBO DE CRUZAMENTOS PERFIL × COMPORTAMENTO
+# ------------------------------------------------------------
+
+def _valor_json(valor):
+    if pd.isna(valor):
+        return None
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+def _frequencia_json(valor):
+    valor = float(valor)
+    return int(valor) if valor.is_integer() else round(valor, 1)
+
+
+def _codigos_comportamento(df, colunas_perfil, limite_respostas):
+    """Lista (pergunta, respostas, [códigos por coluna]) das perguntas de comportamento.
+
+    Multirresposta vira uma pergunta só: cada coluna marcada aponta para o
+    índice da sua marca. Matrizes entram item a item. Colunas com mais de
+    ``limite_respostas`` respostas distintas (texto livre) ficam de fora.
+    """
+    perguntas = []
+
+    for col in identificar_colunas_simples(df):
+        if col in colunas_perfil:
+            continue
+        codigos, respostas = pd.factorize(df[col])
+        if len(respostas) <= limite_respostas:
+            perguntas.append((col, list(respostas), [codigos]))
+
+    grupos = agrupar_por_pergunta(encontrar_colunas_hifen(df))
+    grupos_multi, grupos_texto, grupos_nota = classificar_perguntas(df, grupos)
+
+    for pergunta, cols in grupos_multi.items():
+        marcas = [col.split(" - ")[1].strip() for col in cols]
+        codigos = [
+            np.where((df[col] == marca).to_numpy(dtype=bool, na_value=False), j, -1)
+            for j, (col, marca) in enumerate(zip(cols, marcas))
+        ]
+        perguntas.append((pergunta, marcas, codigos))
+
+    for cols in list(grupos_texto.values()) + list(grupos_nota.values()):
+        for col in cols:
+            codigos, respostas = pd.factorize(
+                df[col], sort=pd.api.types.is_numeric_dtype(df[col])
+            )
+            if len(respostas) <= limite_respostas:
+                perguntas.append((col, list(respostas), [codigos]))
+
+    return perguntas
+
+
+def gerar_cubo_cruzamentos(df, tags_perfil=TAGS_PERFIL, max_celulas_bloco=2_000_000,
+                           pesos=None, max_respostas=50, proporcao_max=0.5,
+                           base_minima=30, max_celulas_perfil=150):
+    """Cruza cada pergunta de perfil com todas as perguntas de comportamento.
+
+    Perguntas abertas não entram: uma coluna com mais de ``max_respostas``
+    respostas distintas, ou mais que ``proporcao_max`` do número de
+    respondentes, é tratada como texto livre (mesma regra de
+    converter_categoricas).
+
+    As contagens saem de um np.bincount sobre os códigos combinados
+    (perfil × resposta), em blocos de colunas para limitar a memória. Com
+    ``pesos`` as frequências são somas ponderadas.
+
+    O cubo vai no prompt de insights, então tem orçamento: categorias de
+    perfil com menos de ``base_minima`` respondentes ficam sem células e, por
+    perfil, só entram as ``max_celulas_perfil`` células de maior lift (% na
+    categoria ÷ % no total, o quanto a categoria se afasta da média). Cada
+    célula é [índice do perfil, índice da resposta, frequência,
+    % dentro do perfil, lift].
+    """
+    colunas_perfil = [
+        c for c in identificar_colunas_simples(df) if any(t in c for t in tags_perfil)
+    ]
+    if not colunas_perfil or df.empty:
+        return []
+
+    limite = min(max_respostas, max(1, int(len(df) * proporcao_max)))
+    perguntas = _codigos_comportamento(df, colunas_perfil, limite)
+
+    # cada pergunta ocupa uma faixa [deslocamento, deslocamento + n_respostas)
+    deslocamentos = np.cumsum([0] + [len(r) for _, r, _ in perguntas])
+    n_niveis = int(deslocamentos[-1])
+    colunas = [
+        (deslocamentos[q], codigos)
+        for q, (_, _, lista) in enumerate(perguntas) for codigos in lista
+    ]
+    por_bloco = max(1, max_celulas_bloco // len(df))
+
+    perfis = []
+    for col_perfil in colunas_perfil:
+        codigos_perfil, categorias = pd.factorize(df[col_perfil])
+        validos_perfil = codigos_perfil >= 0
+        bases = np.bincount(
+            codigos_perfil[validos_perfil],
+            weights=None if pesos is None else pesos[validos_perfil],
+            minlength=len(categorias),
+        )
+        respondentes = np.bincount(codigos_perfil[validos_perfil], minlength=len(categorias))
+        perfis.append((
+            col_perfil, categorias, bases, respondentes >= base_minima,
+            codigos_perfil.astype(np.int64) * n_niveis, validos_perfil,
+            np.zeros(len(categorias) * n_niveis),
+        ))
+
+    # os códigos deslocados só existem bloco a bloco: a memória de pico fica
+    # em torno de max_celulas_bloco, e cada bloco é somado em todos os perfis
+    for inicio in range(0, len(colunas), por_bloco):
+        bloco = np.column_stack([
+            np.where(codigos >= 0, codigos + deslocamento, -1)
+            for deslocamento, codigos in colunas[inicio:inicio + por_bloco]
+        ])
+        preenchidos = bloco >= 0
+        for *_, chaves_perfil, validos_perfil, contagens in perfis:
+            validos = preenchidos & validos_perfil[:, None]
+            chaves = chaves_perfil[:, None] + bloco
+            pesos_bloco = None
+            if pesos is not None:
+                pesos_bloco = np.broadcast_to(pesos[:, None], bloco.shape)[validos]
+            contagens += np.bincount(chaves[validos], weights=pesos_bloco, minlength=len(contagens))
+
+    cubo = []
+    for col_perfil, categorias, bases, com_base, _, _, contagens in perfis:
+        contagens = contagens.reshape(len(categorias), n_niveis)
+        total = bases[com_base].sum()
+
+        candidatas = []
+        for q in range(len(perguntas)):
+            faixa = contagens[:, deslocamentos[q]:deslocamentos[q + 1]]
+            no_total = faixa[com_base].sum(axis=0) / total if total else None
+            linhas, cols = np.nonzero(faixa * com_base[:, None])
+            for i, j in zip(linhas, cols):
+                percentual = faixa[i, j] / bases[i]
+                lift = percentual / no_total[j]
+                candidatas.append((abs(lift - 1), q, int(i), int(j), [
+                    int(i), int(j), _frequencia_json(faixa[i, j]),
+                    round(float(percentual * 100), 1), round(float(lift), 2),
+                ]))
+
+        # as de maior lift, de volta na ordem pergunta → categoria → resposta
+        escolhidas = sorted(candidatas, key=lambda c: -c[0])[:max_celulas_perfil]
+        por_pergunta = defaultdict(list)
+        for _, q, i, j, celula in sorted(escolhidas, key=lambda c: c[1:4]):
+            por_pergunta[q].append(celula)
+
+        cubo.append({
+            "perfil": col_perfil,
+            "categorias": [_valor_json(c) for c in categorias],
+            "bases": [_frequencia_json(b) for b in bases],
+            "celulas_omitidas": len(candidatas) - len(escolhidas),
+            "perguntas": [
+                {
+                    "pergunta": perguntas[q][0],
+                    "respostas": [_valor_json(r) for r in perguntas[q][1]],
+                    "celulas": celulas,
+                }
+                for q, celulas in por_pergunta.items()
+            ],
+        })
+
+    return cubo
 
 
 # ------------------------------------------------------------
 # 8. PIPELINE PRINCIPAL
 # ------------------------------------------------------------
 
-def executar_etl(file_path):
+def processar_dados(df, log, categorizar=False, modo_texto="object", backend="pandas",
+                    alvos_ponderacao=None):
+
+    if modo_texto == "pyarrow":
+        df = converter_texto_arrow(df, log)
+
+    df = filtrar_respondentes_validos(df, log)
+    df = limpar_colunas_indesejadas(df, log)
+    df = ajustar_cidade_genero(df, log)
+    df = limpar_html_df(df, log)
+    if categorizar:
+        df = converter_categoricas(df, log)
+    df = limpar_escalas(df, log)
+
+    pesos = None
+    if alvos_ponderacao:
+        df = aplicar_ponderacao(df, alvos_ponderacao, log)
+        pesos = df[COLUNA_PESO].to_numpy()
+
+    log("📊 Gerando tabelas de frequência...")
+    if backend == "duckdb":
+        t_simples, t_multi, t_matriz, t_nota = gerar_todas_as_tabelas_duckdb(df)
+    else:
+        t_simples, t_multi, t_matriz, t_nota = gerar_todas_as_tabelas(df, pesos=pesos)
+    log("✅ Tabelas de frequência criadas.")
+
+    return df, t_simples, t_multi, t_matriz, t_nota
+
+
+def executar_etl(file_path, categorizar=False, modo_texto="object", backend="pandas",
+                 cruzamentos=False, alvos_ponderacao=None, caminho_json="resultado_pesquisa.json"):
+    """O JSON gerado também fica em ``df.attrs["json"]``; com ``caminho_json=None``
+    nada é gravado em disco (uso concorrente, várias pesquisas no mesmo processo)."""
 
     logs = []
 
@@ -378,22 +1328,91 @@ def executar_etl(file_path):
         log("❌ ETL abortado por erro no carregamento.")
         return None, None, None, None, None, logs
 
-    df = filtrar_respondentes_validos(df, log)
-    df = limpar_colunas_indesejadas(df, log)
-    df = ajustar_cidade_genero(df, log)
-    df = limpar_html_df(df, log)
-    df = limpar_escalas(df, log)
+    if alvos_ponderacao and backend != "pandas":
+        log("⚠️ A ponderação usa o backend pandas.")
+        backend = "pandas"
+
+    if backend == "polars" and _importar_polars() is None:
+        log("⚠️ polars não instalado. Seguindo com o backend pandas.")
+        backend = "pandas"
+
+    if backend == "duckdb" and _importar_duckdb() is None:
+        log("⚠️ duckdb não instalado. Seguindo com o backend pandas.")
+        backend = "pandas"
+
+    if backend == "polars" and df.columns.duplicated().any():
+        log("⚠️ Cabeçalhos duplicados não são aceitos pelo Polars. Seguindo com pandas.")
+        backend = "pandas"
+
+    if backend == "polars":
+        ignorados = [nome for nome, ativo in (
+            ("categorizar", categorizar), (f"modo_texto={modo_texto}", modo_texto != "object"),
+        ) if ativo]
+        if ignorados:
+            log(f"⚠️ O backend polars ignora {', '.join(ignorados)}.")
+        df, t_simples, t_multi, t_matriz, t_nota = processar_dados_polars(df, log)
+    else:
+        df, t_simples, t_multi, t_matriz, t_nota = processar_dados(
+            df, log, categorizar=categorizar, modo_texto=modo_texto, backend=backend,
+            alvos_ponderacao=alvos_ponderacao,
+        )
+
+    pesos = df[COLUNA_PESO].to_numpy() if COLUNA_PESO in df.columns else None
+
+    cubo = None
+    if cruzamentos:
+        cubo = gerar_cubo_cruzamentos(df, pesos=pesos)
+        log(f"🔀 Cubo de cruzamentos gerado para {len(cubo)} perguntas de perfil.")
+
+    resultado_json = gerar_json_todas_as_tabelas(
+        t_simples, t_multi, t_matriz, t_nota, cruzamentos=cubo,
+        ponderacao=df.attrs.get("ponderacao"),
+    )
+
+    df.attrs["json"] = resultado_json
+    if caminho_json:
+        with open(caminho_json, "w", encoding="utf-8") as f:
+            f.write(resultado_json)
+        log(f"📁 JSON salvo como {caminho_json}")
+    log("🏁 ETL finalizado com sucesso!")
 
-    log("📊 Gerando tabelas de frequência...")
-    t_simples, t_multi, t_matriz, t_nota = gerar_todas_as_tabelas(df)
-    log("✅ Tabelas de frequência criadas.")
+    return df, t_simples, t_multi, t_matriz, t_nota, logs
 
-    resultado_json = gerar_json_todas_as_tabelas(t_simples, t_multi, t_matriz, t_nota)
 
-    with open("resultado_pesquisa.json", "w", encoding="utf-8") as f:
-        f.write(resultado_json)
+# ------------------------------------------------------------
+# 9. BENCHMARK DOS MODOS DE TEXTO
+# ------------------------------------------------------------
+
+def comparar_modos_texto(file_path, repeticoes=3):
+    """Mede o tempo do ETL (sem leitura do Excel) nos modos object e pyarrow.
 
-    log("📁 JSON salvo como resultado_pesquisa.json")
-    log("🏁 ETL finalizado com sucesso!")
+    Retorna um DataFrame com o melhor tempo de cada modo e se o JSON gerado
+    é idêntico ao do modo object.
+    """
+    logs = []
+    df_base = carregar_e_padronizar_dados(file_path, logs.append)
+    if df_base is None:
+        raise ValueError(logs[-1])
+
+    modos = ["object"] + (["pyarrow"] if _pyarrow_disponivel() else [])
+    linhas = []
+    json_referencia = None
+
+    for modo in modos:
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            _, *tabelas = processar_dados(df_base.copy(), logs.append, modo_texto=modo)
+            resultado_json = gerar_json_todas_as_tabelas(*tabelas)
+            tempos.append(time.perf_counter() - inicio)
+
+        if json_referencia is None:
+            json_referencia = resultado_json
+
+        linhas.append({
+            "modo_texto": modo,
+            "melhor_tempo_s": round(min(tempos), 4),
+            "json_identico": resultado_json == json_referencia,
+        })
 
-    return df, t_simples, t_multi, t_matriz, t_nota, logs
\ No newline at end of file
+    return pd.DataFrame(linhas)
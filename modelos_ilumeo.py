@@ -0,0 +1,254 @@
+# ============================================================
+#  ILUMEO - ROTEAMENTO DE MODELOS POR TAREFA
+#  Cada tarefa usa uma faixa de modelo (econômica ou forte) definida
+#  em configuração, corrige ou sobe de faixa quando a saída não passa
+#  na validação e registra tempo, tokens e custo de cada chamada
+#  Franciane Rodrigues
+# ============================================================
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+# ------------------------------------------------------------
+# 1. CONFIGURAÇÃO
+# ------------------------------------------------------------
+
+FAIXAS = {
+    "economica": os.getenv("ILUMEO_MODELO_ECONOMICO", "gpt-4o-mini"),
+    "forte": os.getenv("ILUMEO_MODELO_FORTE", "gpt-4o"),
+}
+# Ordem de escalonamento: da mais barata para a mais capaz
+ORDEM_FAIXAS = ["economica", "forte"]
+
+# tarefa → faixa (ou o nome de um modelo, que então não escala)
+ROTAS_PADRAO = {
+    "insights": "forte",
+    "linkedin": "economica",
+    "blog": "forte",
+    "one_page": "economica",
+    "release": "forte",
+    "blog_youtube": "forte",
+    "resumo_trecho": "economica",
+}
+
+# Sobe de faixa quando a validação falha (ILUMEO_ESCALAR_MODELO=0 desliga)
+ESCALAR = os.getenv("ILUMEO_ESCALAR_MODELO", "1") != "0"
+
+# Correções pontuais por faixa antes de escalar (cada uma é uma chamada curta)
+MAX_REPAROS = int(os.getenv("ILUMEO_MAX_REPAROS", "2"))
+
+# USD por milhão de tokens (entrada, saída); modelos fora da tabela ficam sem custo
+PRECOS_POR_MILHAO = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+}
+
+MAX_REGISTROS = 2000
+
+# Aceitos como rota além das faixas
+MODELOS_CONHECIDOS = set(PRECOS_POR_MILHAO) | set(FAIXAS.values())
+
+_log = logging.getLogger(__name__)
+
+
+def _carregar_rotas():
+    """ROTAS_PADRAO + ILUMEO_ROTAS_MODELOS (JSON), ex.: '{"release": "economica"}'.
+
+    Roda na importação: um valor malformado não derruba o app. O JSON
+    inválido inteiro, ou cada tarefa desconhecida ou rota que não seja faixa
+    nem modelo conhecido, é ignorado com um aviso no log.
+    """
+    rotas = dict(ROTAS_PADRAO)
+    extra = os.getenv("ILUMEO_ROTAS_MODELOS")
+    if not extra:
+        return rotas
+
+    try:
+        extra = json.loads(extra)
+    except json.JSONDecodeError as e:
+        _log.warning("ILUMEO_ROTAS_MODELOS ignorado: JSON inválido (%s)", e)
+        return rotas
+    if not isinstance(extra, dict):
+        _log.warning("ILUMEO_ROTAS_MODELOS ignorado: esperado um objeto JSON {tarefa: rota}")
+        return rotas
+
+    for tarefa, rota in extra.items():
+        if tarefa not in ROTAS_PADRAO:
+            _log.warning("ILUMEO_ROTAS_MODELOS: tarefa desconhecida %r ignorada", tarefa)
+        elif rota not in FAIXAS and rota not in MODELOS_CONHECIDOS:
+            _log.warning("ILUMEO_ROTAS_MODELOS: rota %r de %r ignorada (use %s ou um modelo de %s)",
+                         rota, tarefa, "/".join(FAIXAS), sorted(MODELOS_CONHECIDOS))
+        else:
+            rotas[tarefa] = rota
+    return rotas
+
+
+ROTAS = _carregar_rotas()
+
+
+def faixa_da_tarefa(tarefa):
+    return ROTAS.get(tarefa, "forte")
+
+
+def modelo_da_tarefa(tarefa, faixa=None):
+    faixa = faixa or faixa_da_tarefa(tarefa)
+    return FAIXAS.get(faixa, faixa)
+
+
+def proxima_faixa(faixa):
+    if faixa not in ORDEM_FAIXAS:
+        return None
+    i = ORDEM_FAIXAS.index(faixa)
+    return ORDEM_FAIXAS[i + 1] if i + 1 < len(ORDEM_FAIXAS) else None
+
+
+# ------------------------------------------------------------
+# 2. EXECUÇÃO COM REPARO E ESCALONAMENTO
+# ------------------------------------------------------------
+
+def problemas_basicos(texto):
+    """Validação mínima: saída vazia ou só um marcador como "[conteúdo acima]"."""
+    texto = (texto or "").strip()
+    if not texto:
+        return ["saída vazia"]
+    if texto.startswith("[") and texto.endswith("]") and len(texto) < 60:
+        return [f"marcador no lugar do conteúdo: {texto}"]
+    return []
+
+
+def uso_tokens(objeto):
+    """(entrada, saída) de uma resposta de chat (``usage``) ou de um CrewOutput (``token_usage``)."""
+    uso = getattr(objeto, "usage", None) or getattr(objeto, "token_usage", None)
+    if uso is None:
+        return 0, 0
+    return int(getattr(uso, "prompt_tokens", 0) or 0), int(getattr(uso, "completion_tokens", 0) or 0)
+
+
+def somar_uso(respostas):
+    """Uma "resposta" com a soma dos tokens de várias (reparo feito em partes)."""
+    usos = [uso_tokens(r) for r in respostas]
+    return SimpleNamespace(usage=SimpleNamespace(
+        prompt_tokens=sum(u[0] for u in usos), completion_tokens=sum(u[1] for u in usos)
+    ))
+
+
+def _tentativa(tarefa, modelo, funcao, validar, tipo):
+    inicio = time.perf_counter()
+    texto, resposta = funcao(modelo)
+    segundos = time.perf_counter() - inicio
+
+    problemas = validar(texto) if validar else []
+    entrada, saida = uso_tokens(resposta)
+    registrar(tarefa, modelo, segundos, entrada, saida, tipo=tipo, valida=not problemas)
+    return texto, problemas
+
+
+def executar_roteado(tarefa, gerar, validar=problemas_basicos, escalar=None, reparar=None,
+                     max_reparos=MAX_REPAROS):
+    """Roda ``gerar(modelo) -> (texto, resposta)`` no modelo da tarefa.
+
+    Se ``validar(texto)`` apontar problemas, ``reparar(modelo, texto,
+    problemas) -> (texto, resposta)`` corrige só o que falhou, até
+    ``max_reparos`` vezes; depois (ou sem texto aproveitável) a tarefa sobe
+    de faixa. Cada tentativa entra no relatório; devolve o último texto.
+    """
+    escalar = ESCALAR if escalar is None else escalar
+    faixa = faixa_da_tarefa(tarefa)
+    modelo = modelo_da_tarefa(tarefa, faixa)
+    texto, problemas = _tentativa(tarefa, modelo, gerar, validar, "geracao")
+    reparos = 0
+
+    while problemas:
+        aproveitavel = reparar is not None and not problemas_basicos(texto)
+        if aproveitavel and reparos < max_reparos:
+            reparos += 1
+            tipo = "reparo"
+        else:
+            proxima = proxima_faixa(faixa) if escalar else None
+            if proxima is None:
+                break
+            faixa, reparos = proxima, 0
+            modelo = modelo_da_tarefa(tarefa, faixa)
+            tipo = "escalada"
+
+        if aproveitavel:
+            funcao = lambda m, t=texto, p=problemas: reparar(m, t, p)
+        else:
+            funcao = gerar
+        texto, problemas = _tentativa(tarefa, modelo, funcao, validar, tipo)
+
+    return texto
+
+
+# ------------------------------------------------------------
+# 3. RELATÓRIO DE TEMPO E CUSTO
+# ------------------------------------------------------------
+
+_registros = deque(maxlen=MAX_REGISTROS)
+_trava = threading.Lock()
+
+
+def custo_estimado(modelo, entrada, saida):
+    precos = PRECOS_POR_MILHAO.get(modelo)
+    if precos is None:
+        return None
+    return (entrada * precos[0] + saida * precos[1]) / 1_000_000
+
+
+def registrar(tarefa, modelo, segundos, entrada=0, saida=0, tipo="geracao", valida=True):
+    with _trava:
+        _registros.append({
+            "tarefa": tarefa,
+            "modelo": modelo,
+            "segundos": segundos,
+            "tokens_entrada": entrada,
+            "tokens_saida": saida,
+            "custo_usd": custo_estimado(modelo, entrada, saida),
+            "tipo": tipo,  # geracao | reparo | escalada
+            "valida": valida,
+            "em": time.time(),
+        })
+
+
+def relatorio():
+    """Uma linha por tarefa + modelo: chamadas, reparos, escalonamentos, tempo, tokens e custo."""
+    with _trava:
+        registros = list(_registros)
+
+    linhas = {}
+    for r in registros:
+        linha = linhas.setdefault((r["tarefa"], r["modelo"]), {
+            "tarefa": r["tarefa"],
+            "modelo": r["modelo"],
+            "chamadas": 0,
+            "reparos": 0,
+            "escaladas": 0,
+            "invalidas": 0,
+            "segundos_total": 0.0,
+            "tokens_entrada": 0,
+            "tokens_saida": 0,
+            "custo_usd": 0.0,
+        })
+        linha["chamadas"] += 1
+        linha["reparos"] += r["tipo"] == "reparo"
+        linha["escaladas"] += r["tipo"] == "escalada"
+        linha["invalidas"] += not r["valida"]
+        linha["segundos_total"] += r["segundos"]
+        linha["tokens_entrada"] += r["tokens_entrada"]
+        linha["tokens_saida"] += r["tokens_saida"]
+        linha["custo_usd"] += r["custo_usd"] or 0.0
+
+    saida = []
+    for linha in linhas.values():
+        linha["segundos_medio"] = round(linha["segundos_total"] / linha["chamadas"], 2)
+        linha["segundos_total"] = round(linha["segundos_total"], 2)
+        linha["custo_usd"] = round(linha["custo_usd"], 4)
+        saida.append(linha)
+    return sorted(saida, key=lambda l: (l["tarefa"], l["modelo"]))
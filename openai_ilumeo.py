@@ -0,0 +1,467 @@
+# ============================================================
+#  ILUMEO - CHAMADAS À OPENAI
+#  Agendador central: limites RPM/TPM (balde de tokens), fila por
+#  prioridade, nova tentativa com backoff + jitter e métricas de espera
+#  + clientes HTTP compartilhados (pool de conexões com keep-alive)
+#  + Batch API (envio em JSONL, consulta e leitura dos resultados)
+#  Franciane Rodrigues
+# ============================================================
+
+import contextvars
+import hashlib
+import heapq
+import importlib.util
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import httpx
+from openai import APIConnectionError, DefaultHttpxClient, InternalServerError, OpenAI, RateLimitError
+
+# Limites da conta (ajuste no .env conforme o tier da chave)
+RPM = int(os.getenv("ILUMEO_OPENAI_RPM", "500"))
+TPM = int(os.getenv("ILUMEO_OPENAI_TPM", "200000"))
+
+MAX_TENTATIVAS = 6
+ESPERA_BASE_SEGUNDOS = 1.0
+ESPERA_MAX_SEGUNDOS = 60.0
+
+# Menor número sai primeiro: telas interativas passam na frente dos lotes
+PRIORIDADE_INTERATIVA = 0
+PRIORIDADE_LOTE = 10
+
+# 429, 5xx, timeout e falha de conexão: vale tentar de novo
+ERROS_TEMPORARIOS = (RateLimitError, InternalServerError, APIConnectionError)
+
+# 429 de cota/crédito esgotado: não passa esperando, não vale tentar de novo
+CODIGOS_PERMANENTES = ("insufficient_quota",)
+
+# Pool HTTP: conexões quentes reaproveitadas por todas as sessões do processo
+MAX_CONEXOES = 50
+MAX_CONEXOES_OCIOSAS = 20
+KEEPALIVE_SEGUNDOS = 90.0
+TIMEOUT = httpx.Timeout(600.0, connect=10.0, pool=30.0)
+
+_prioridade_atual = contextvars.ContextVar("prioridade_openai", default=PRIORIDADE_INTERATIVA)
+
+
+@contextmanager
+def prioridade(valor):
+    """Chamadas feitas dentro do bloco (e em pools que copiem o contexto) usam ``valor``."""
+    marca = _prioridade_atual.set(valor)
+    try:
+        yield
+    finally:
+        _prioridade_atual.reset(marca)
+
+
+# ------------------------------------------------------------
+# 1. BALDE DE TOKENS
+# ------------------------------------------------------------
+
+class BaldeTokens:
+    """Capacidade que se repõe continuamente (``por_minuto`` / 60 a cada segundo).
+
+    Não é thread-safe sozinho: o agendador só o usa sob a própria trava.
+    """
+
+    def __init__(self, por_minuto):
+        self.capacidade = float(por_minuto)
+        self.por_segundo = por_minuto / 60.0
+        self.disponivel = self.capacidade
+        self.atualizado = time.monotonic()
+
+    def _repor(self, agora):
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self.atualizado) * self.por_segundo)
+        self.atualizado = agora
+
+    def espera_para(self, quantidade, agora):
+        self._repor(agora)
+        quantidade = min(quantidade, self.capacidade)
+        if self.disponivel >= quantidade:
+            return 0.0
+        return (quantidade - self.disponivel) / self.por_segundo
+
+    def consumir(self, quantidade):
+        self.disponivel -= min(quantidade, self.capacidade)
+
+
+# ------------------------------------------------------------
+# 2. AGENDADOR
+# ------------------------------------------------------------
+
+class AgendadorOpenAI:
+    def __init__(self, rpm=RPM, tpm=TPM, max_tentativas=MAX_TENTATIVAS):
+        self.max_tentativas = max_tentativas
+        self._cond = threading.Condition()
+        self._fila = []
+        self._sequencia = itertools.count()
+        self._rpm = BaldeTokens(rpm)
+        self._tpm = BaldeTokens(tpm)
+        self._pausa_ate = 0.0
+        self._esperas = {}
+        self._contadores = {"chamadas": 0, "novas_tentativas": 0, "falhas": 0}
+
+    def _aguardar_vez(self, prioridade, tokens):
+        inicio = time.monotonic()
+        with self._cond:
+            item = (prioridade, next(self._sequencia))
+            heapq.heappush(self._fila, item)
+            while True:
+                if self._fila[0] != item:
+                    self._cond.wait()
+                    continue
+
+                agora = time.monotonic()
+                espera = max(
+                    self._pausa_ate - agora,
+                    self._rpm.espera_para(1, agora),
+                    self._tpm.espera_para(tokens, agora),
+                )
+                if espera <= 0:
+                    heapq.heappop(self._fila)
+                    self._rpm.consumir(1)
+                    self._tpm.consumir(tokens)
+                    self._cond.notify_all()
+                    break
+                self._cond.wait(timeout=espera)
+
+            self._esperas.setdefault(prioridade, deque(maxlen=500)).append(time.monotonic() - inicio)
+            self._contadores["chamadas"] += 1
+
+    def _espera_nova_tentativa(self, tentativa, erro):
+        resposta = getattr(erro, "response", None)
+        retry_after = resposta.headers.get("retry-after") if resposta is not None else None
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), ESPERA_MAX_SEGUNDOS)
+        except ValueError:
+            pass
+
+        # backoff exponencial com metade fixa + metade aleatória (evita rajadas sincronizadas)
+        teto = min(ESPERA_MAX_SEGUNDOS, ESPERA_BASE_SEGUNDOS * 2 ** tentativa)
+        return teto / 2 + random.uniform(0, teto / 2)
+
+    def _ajustar_tokens(self, resultado, estimados):
+        uso = getattr(resultado, "usage", None)
+        total = getattr(uso, "total_tokens", None)
+        if total is None:
+            return
+        with self._cond:
+            self._tpm.consumir(total - estimados)
+
+    @staticmethod
+    def _erro_permanente(erro):
+        """429 por falta de cota (``code`` ou ``error.type`` = insufficient_quota)."""
+        if getattr(erro, "code", None) in CODIGOS_PERMANENTES:
+            return True
+        corpo = getattr(erro, "body", None)
+        detalhe = corpo.get("error", corpo) if isinstance(corpo, dict) else None
+        return isinstance(detalhe, dict) and detalhe.get("type") in CODIGOS_PERMANENTES
+
+    def executar(self, funcao, *args, prioridade=None, tokens=0, **kwargs):
+        """Chama ``funcao(*args, **kwargs)`` respeitando fila, limites e novas tentativas.
+
+        ``tokens`` é a estimativa (entrada + saída) reservada no limite por
+        minuto; se a resposta trouxer ``usage`` o balde é corrigido pelo real.
+        """
+        prioridade = _prioridade_atual.get() if prioridade is None else prioridade
+        for tentativa in range(self.max_tentativas):
+            self._aguardar_vez(prioridade, tokens)
+            try:
+                resultado = funcao(*args, **kwargs)
+            except ERROS_TEMPORARIOS as erro:
+                if tentativa + 1 >= self.max_tentativas or self._erro_permanente(erro):
+                    with self._cond:
+                        self._contadores["falhas"] += 1
+                    raise
+                espera = self._espera_nova_tentativa(tentativa, erro)
+                with self._cond:
+                    self._contadores["novas_tentativas"] += 1
+                    # 429 vale para a chave toda: segura a fila inteira
+                    if isinstance(erro, RateLimitError):
+                        self._pausa_ate = max(self._pausa_ate, time.monotonic() + espera)
+                time.sleep(espera)
+                continue
+
+            self._ajustar_tokens(resultado, tokens)
+            return resultado
+
+    def metricas(self):
+        with self._cond:
+            esperas = {p: sorted(v) for p, v in self._esperas.items()}
+            resumo = dict(self._contadores, fila_atual=len(self._fila))
+
+        resumo["espera_fila"] = {
+            p: {
+                "n": len(v),
+                "media_s": round(sum(v) / len(v), 3),
+                "p95_s": round(v[min(len(v) - 1, int(len(v) * 0.95))], 3),
+                "max_s": round(v[-1], 3),
+            }
+            for p, v in esperas.items() if v
+        }
+        return resumo
+
+
+# ------------------------------------------------------------
+# 3. AGENDADOR DO PROCESSO
+# ------------------------------------------------------------
+
+_agendador = None
+_trava_agendador = threading.Lock()
+
+
+def agendador():
+    """Um agendador por processo: todas as sessões dividem os limites da mesma chave."""
+    global _agendador
+    with _trava_agendador:
+        if _agendador is None:
+            _agendador = AgendadorOpenAI()
+        return _agendador
+
+
+def chamar_openai(funcao, *args, prioridade=None, tokens=0, **kwargs):
+    return agendador().executar(funcao, *args, prioridade=prioridade, tokens=tokens, **kwargs)
+
+
+def metricas():
+    return agendador().metricas()
+
+
+# ------------------------------------------------------------
+# 4. CLIENTES HTTP COMPARTILHADOS
+# ------------------------------------------------------------
+
+_clientes = {}
+_trava_clientes = threading.Lock()
+
+
+def _http2_disponivel():
+    # httpx só negocia HTTP/2 com o pacote h2 instalado
+    return importlib.util.find_spec("h2") is not None
+
+
+def criar_http_client():
+    """Cliente httpx com pool; com ILUMEO_GRAVAR_LLM=arquivo.jsonl cada chamada
+    também é gravada para reprodução no simulador (simulador_ilumeo)."""
+    limites = httpx.Limits(
+        max_connections=MAX_CONEXOES,
+        max_keepalive_connections=MAX_CONEXOES_OCIOSAS,
+        keepalive_expiry=KEEPALIVE_SEGUNDOS,
+    )
+    caminho_gravacao = os.getenv("ILUMEO_GRAVAR_LLM")
+    if not caminho_gravacao:
+        return DefaultHttpxClient(http2=_http2_disponivel(), timeout=TIMEOUT, limits=limites)
+
+    from simulador_ilumeo import TransporteGravador
+
+    transporte = httpx.HTTPTransport(http2=_http2_disponivel(), limits=limites)
+    return DefaultHttpxClient(timeout=TIMEOUT, transport=TransporteGravador(transporte, caminho_gravacao))
+
+
+def _compartilhar_com_litellm(http_client):
+    # o CrewAI chama a OpenAI pelo litellm, que aceita uma sessão httpx global
+    try:
+        import litellm
+    except ImportError:
+        return
+    litellm.client_session = http_client
+
+
+def cliente_openai(api_key=None, base_url=None):
+    """Cliente OpenAI único por (chave, base_url) no processo, com pool HTTP próprio.
+
+    O mesmo pool passa a ser usado pelas chamadas do CrewAI (litellm).
+    As novas tentativas ficam com o agendador, não com o SDK. Sem
+    ``base_url`` vale OPENAI_BASE_URL (ex.: o simulador local).
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+    chave = (hashlib.sha256((api_key or "").encode()).hexdigest(), base_url)
+    with _trava_clientes:
+        cliente = _clientes.get(chave)
+        if cliente is None:
+            http_client = criar_http_client()
+            cliente = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=http_client,
+                timeout=TIMEOUT,
+                max_retries=0,
+            )
+            _compartilhar_com_litellm(http_client)
+            _clientes[chave] = cliente
+        return cliente
+
+
+# ------------------------------------------------------------
+# 5. BATCH API (MODO ADIADO, METADE DO PREÇO)
+# ------------------------------------------------------------
+
+ENDPOINT_CHAT = "/v1/chat/completions"
+INTERVALO_CONSULTA_LOTE = 30
+STATUS_FINAIS_LOTE = {"completed", "failed", "expired", "cancelled"}
+
+
+def requisicao_chat(custom_id, messages, model, **parametros):
+    """Uma linha do arquivo JSONL da Batch API (chat completions)."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": ENDPOINT_CHAT,
+        "body": {"model": model, "messages": messages, **parametros},
+    }
+
+
+def enviar_lote(cliente, requisicoes, metadados=None):
+    """Sobe o JSONL e cria o lote; devolve o id do lote."""
+    conteudo = "\n".join(json.dumps(r, ensure_ascii=False) for r in requisicoes).encode("utf-8")
+    arquivo = cliente.files.create(file=("lote.jsonl", conteudo), purpose="batch")
+    lote = cliente.batches.create(
+        input_file_id=arquivo.id,
+        endpoint=ENDPOINT_CHAT,
+        completion_window="24h",
+        metadata=metadados or None,
+    )
+    return lote.id
+
+
+def aguardar_lote(cliente, lote_id, intervalo=INTERVALO_CONSULTA_LOTE, limite_segundos=None,
+                  ao_consultar=None):
+    """Consulta o lote até um status final; ``ao_consultar(lote)`` a cada volta."""
+    inicio = time.monotonic()
+    while True:
+        lote = cliente.batches.retrieve(lote_id)
+        if ao_consultar:
+            ao_consultar(lote)
+        if lote.status in STATUS_FINAIS_LOTE:
+            return lote
+        if limite_segundos is not None and time.monotonic() - inicio > limite_segundos:
+            raise TimeoutError(f"Lote {lote_id} ainda em '{lote.status}' após {limite_segundos}s.")
+        time.sleep(intervalo)
+
+
+def _linhas_jsonl(cliente, arquivo_id):
+    if not arquivo_id:
+        return []
+    texto = cliente.files.content(arquivo_id).text
+    return [json.loads(linha) for linha in texto.splitlines() if linha.strip()]
+
+
+def resultados_lote(cliente, lote):
+    """{custom_id: {"texto", "erro"}} a partir dos arquivos de saída e de erro do lote."""
+    resultados = {}
+    for linha in _linhas_jsonl(cliente, lote.output_file_id) + _linhas_jsonl(cliente, lote.error_file_id):
+        resposta = linha.get("response") or {}
+        corpo = resposta.get("body") or {}
+        erro = linha.get("error") or corpo.get("error")
+        texto = None
+        if not erro and resposta.get("status_code") == 200:
+            texto = corpo["choices"][0]["message"]["content"]
+        elif not erro:
+            erro = f"status {resposta.get('status_code')}"
+        resultados[linha["custom_id"]] = {
+            "texto": texto,
+            "erro": erro.get("message", str(erro)) if isinstance(erro, dict) else erro,
+        }
+    return resultados
+
+
+def executar_lote(cliente, requisicoes, metadados=None, **kwargs_aguardar):
+    """Envia, espera e devolve os resultados por custom_id (ver resultados_lote)."""
+    lote = aguardar_lote(cliente, enviar_lote(cliente, requisicoes, metadados), **kwargs_aguardar)
+    if lote.status != "completed":
+        raise RuntimeError(f"Lote {lote.id} terminou com status '{lote.status}'.")
+    return resultados_lote(cliente, lote)
+
+
+class ClienteLoteLocal:
+    """Substituto local da Batch API (files + batches) para rodar sem a OpenAI.
+
+    Cada lote é processado na criação, linha a linha, por ``responder(body)``
+    -> texto (padrão: devolve a última mensagem do usuário). Útil para
+    testar o empacotamento e o mapeamento das respostas.
+    """
+
+    def __init__(self, responder=None):
+        self._responder = responder or (lambda corpo: corpo["messages"][-1]["content"])
+        self._arquivos = {}
+        self._lotes = {}
+        self._ids = itertools.count(1)
+        self.files = _ArquivosLocais(self)
+        self.batches = _LotesLocais(self)
+
+    def _novo_id(self, prefixo):
+        return f"{prefixo}-local-{next(self._ids)}"
+
+    def _processar(self, arquivo_id):
+        saida, erros = [], []
+        for linha in self._arquivos[arquivo_id].decode("utf-8").splitlines():
+            if not linha.strip():
+                continue
+            req = json.loads(linha)
+            try:
+                texto = self._responder(req["body"])
+            except Exception as e:
+                erros.append({"custom_id": req["custom_id"], "response": None,
+                              "error": {"message": str(e)}})
+                continue
+            saida.append({
+                "custom_id": req["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": {"choices": [{"message": {"role": "assistant", "content": texto}}]},
+                },
+                "error": None,
+            })
+        return saida, erros
+
+    def _gravar_jsonl(self, linhas):
+        if not linhas:
+            return None
+        arquivo_id = self._novo_id("file")
+        self._arquivos[arquivo_id] = "\n".join(json.dumps(l, ensure_ascii=False) for l in linhas).encode("utf-8")
+        return arquivo_id
+
+
+class _ArquivosLocais:
+    def __init__(self, dono):
+        self._dono = dono
+
+    def create(self, file, purpose):
+        _nome, conteudo = file
+        arquivo_id = self._dono._novo_id("file")
+        self._dono._arquivos[arquivo_id] = conteudo
+        return SimpleNamespace(id=arquivo_id, purpose=purpose)
+
+    def content(self, arquivo_id):
+        return SimpleNamespace(text=self._dono._arquivos[arquivo_id].decode("utf-8"))
+
+
+class _LotesLocais:
+    def __init__(self, dono):
+        self._dono = dono
+
+    def create(self, input_file_id, endpoint, completion_window, metadata=None):
+        saida, erros = self._dono._processar(input_file_id)
+        lote = SimpleNamespace(
+            id=self._dono._novo_id("batch"),
+            status="completed",
+            endpoint=endpoint,
+            metadata=metadata,
+            output_file_id=self._dono._gravar_jsonl(saida),
+            error_file_id=self._dono._gravar_jsonl(erros),
+            request_counts=SimpleNamespace(total=len(saida) + len(erros), completed=len(saida), failed=len(erros)),
+        )
+        self._dono._lotes[lote.id] = lote
+        return lote
+
+    def retrieve(self, lote_id):
+        return self._dono._lotes[lote_id]
@@ -0,0 +1,199 @@
+# ============================================================
+#  ILUMEO - SEGMENTOS DE TRANSCRIÇÃO COM TEMPO
+#  Arrays paralelos (início, duração, fim no texto) + um único buffer
+#  Franciane Rodrigues
+# ============================================================
+
+import re
+from array import array
+
+# Uma marca [mm:ss] a cada INTERVALO_MARCAS segundos no texto enviado à IA
+INTERVALO_MARCAS = 30
+
+# Maior sobreposição (em palavras) procurada entre linhas seguidas de legenda
+MAX_PALAVRAS_SOBREPOSTAS = 20
+
+
+# ------------------------------------------------------------
+# 1. ESTRUTURA
+# ------------------------------------------------------------
+
+class Segmentos:
+    """Segmentos de uma transcrição sem um objeto por segmento.
+
+    ``inicios`` e ``duracoes`` (float32, segundos) e ``fins`` (uint32,
+    posição no texto onde o segmento termina) são arrays paralelos; o texto
+    de todos os segmentos fica em ``texto``, separado por um espaço. Cerca de
+    12 bytes por segmento além do próprio texto, contra algumas centenas de
+    uma lista de dicts.
+    """
+
+    __slots__ = ("inicios", "duracoes", "fins", "texto")
+
+    def __init__(self, inicios=None, duracoes=None, fins=None, texto=""):
+        self.inicios = inicios if inicios is not None else array("f")
+        self.duracoes = duracoes if duracoes is not None else array("f")
+        self.fins = fins if fins is not None else array("I")
+        self.texto = texto
+
+    def __len__(self):
+        return len(self.fins)
+
+    def inicio_texto(self, i):
+        return 0 if i == 0 else self.fins[i - 1] + 1
+
+    def texto_do(self, i):
+        return self.texto[self.inicio_texto(i):self.fins[i]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.inicios[i], self.duracoes[i], self.texto_do(i)
+
+
+def _normalizar_palavra(palavra):
+    return re.sub(r"[^\w]", "", palavra.lower())
+
+
+def _sobreposicao(anterior, atual, max_palavras=MAX_PALAVRAS_SOBREPOSTAS):
+    """Quantas palavras do começo de ``atual`` repetem o fim de ``anterior``."""
+    limite = min(len(anterior), len(atual), max_palavras)
+    for k in range(limite, 0, -1):
+        if anterior[-k:] == atual[:k]:
+            return k
+    return 0
+
+
+def criar_segmentos(itens, deduplicar=False):
+    """Monta Segmentos a partir de (início, duração, texto).
+
+    Com ``deduplicar`` as palavras que uma linha repete do fim da anterior
+    (legendas automáticas "rolantes") são removidas; linhas que ficam vazias
+    só estendem a duração da anterior.
+    """
+    inicios, duracoes, fins = array("f"), array("f"), array("I")
+    partes = []
+    tamanho = 0
+    palavras_anteriores = []
+
+    for inicio, duracao, texto in itens:
+        palavras = " ".join((texto or "").split()).split(" ")
+        palavras = [p for p in palavras if p]
+
+        if deduplicar and palavras_anteriores:
+            k = _sobreposicao(palavras_anteriores, [_normalizar_palavra(p) for p in palavras])
+            palavras = palavras[k:]
+            if not palavras and len(fins):
+                duracoes[-1] = max(duracoes[-1], inicio + duracao - inicios[-1])
+                continue
+
+        if not palavras:
+            continue
+
+        trecho = " ".join(palavras)
+        if partes:
+            tamanho += 1
+        tamanho += len(trecho)
+        partes.append(trecho)
+        inicios.append(inicio)
+        duracoes.append(duracao)
+        fins.append(tamanho)
+        palavras_anteriores = [_normalizar_palavra(p) for p in palavras]
+
+    return Segmentos(inicios, duracoes, fins, " ".join(partes))
+
+
+def segmentos_de_legenda(itens):
+    """Itens da youtube_transcript_api ({"text", "start", "duration"}) → Segmentos."""
+    return criar_segmentos(
+        ((float(i.get("start", 0.0)), float(i.get("duration", 0.0)), i.get("text", "")) for i in itens),
+        deduplicar=True,
+    )
+
+
+# ------------------------------------------------------------
+# 2. SERIALIZAÇÃO (ARMAZÉM)
+# ------------------------------------------------------------
+
+def para_bytes(segmentos):
+    """Só os arrays; o texto é gravado à parte (coluna ``texto`` do armazém)."""
+    n = array("I", [len(segmentos)])
+    return n.tobytes() + segmentos.inicios.tobytes() + segmentos.duracoes.tobytes() + segmentos.fins.tobytes()
+
+
+def de_bytes(dados, texto):
+    cabecalho = array("I")
+    cabecalho.frombytes(dados[:cabecalho.itemsize])
+    n = cabecalho[0]
+
+    posicao = cabecalho.itemsize
+    arrays = []
+    for tipo in ("f", "f", "I"):
+        a = array(tipo)
+        fim = posicao + n * a.itemsize
+        a.frombytes(dados[posicao:fim])
+        arrays.append(a)
+        posicao = fim
+
+    return Segmentos(*arrays, texto)
+
+
+# ------------------------------------------------------------
+# 3. MARCAS DE TEMPO
+# ------------------------------------------------------------
+
+def formatar_tempo(segundos):
+    segundos = int(segundos)
+    horas, resto = divmod(segundos, 3600)
+    minutos, seg = divmod(resto, 60)
+    return f"{horas}:{minutos:02d}:{seg:02d}" if horas else f"{minutos:02d}:{seg:02d}"
+
+
+def _segundos_da_marca(marca):
+    partes = [int(p) for p in marca.split(":")]
+    total = 0
+    for p in partes:
+        total = total * 60 + p
+    return total
+
+
+def link_tempo(url, segundos):
+    separador = "&" if "?" in url else "?"
+    return f"{url}{separador}t={int(segundos)}s"
+
+
+def texto_com_marcas(segmentos, inicio=0, fim=None, intervalo=INTERVALO_MARCAS):
+    """Texto dos segmentos [inicio, fim) com uma marca [mm:ss] a cada ``intervalo`` s."""
+    fim = len(segmentos) if fim is None else fim
+    partes = []
+    proxima_marca = None
+    for i in range(inicio, fim):
+        t = segmentos.inicios[i]
+        if proxima_marca is None or t >= proxima_marca:
+            partes.append(f"[{formatar_tempo(t)}]")
+            proxima_marca = t + intervalo
+        partes.append(segmentos.texto_do(i))
+    return " ".join(partes)
+
+
+def trechos_por_tokens(segmentos, max_tokens, contar_tokens):
+    """Agrupa segmentos inteiros em trechos de até ``max_tokens`` (texto com marcas)."""
+    trechos = []
+    inicio, tokens = 0, 0
+    for i in range(len(segmentos)):
+        n = contar_tokens(segmentos.texto_do(i))
+        if i > inicio and tokens + n > max_tokens:
+            trechos.append(texto_com_marcas(segmentos, inicio, i))
+            inicio, tokens = i, 0
+        tokens += n
+    if len(segmentos) > inicio:
+        trechos.append(texto_com_marcas(segmentos, inicio, len(segmentos)))
+    return trechos
+
+
+def vincular_marcas(texto, url):
+    """Troca cada [mm:ss] do texto por um link para esse momento do vídeo."""
+    return re.sub(
+        r"\[((?:\d+:)?\d{1,2}:\d{2})\](?!\()",
+        lambda m: f"[{m.group(1)}]({link_tempo(url, _segundos_da_marca(m.group(1)))})",
+        texto,
+    )
@@ -0,0 +1,313 @@
+# ============================================================
+#  ILUMEO - SIMULADOR DA API DA OPENAI (GRAVAÇÃO E REPRODUÇÃO)
+#  Grava as chamadas reais e serve as respostas localmente, com
+#  latência e ritmo de streaming configuráveis (testes de carga)
+#  Franciane Rodrigues
+# ============================================================
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+# Campos que não mudam a resposta: ficam fora da chave da gravação
+CAMPOS_IGNORADOS = ("stream", "stream_options", "user")
+
+# Cabeçalhos que não valem para o corpo já descomprimido que é regravado/servido
+CABECALHOS_DO_TRANSPORTE = ("content-encoding", "content-length", "transfer-encoding")
+
+
+# ------------------------------------------------------------
+# 1. CHAVE DA REQUISIÇÃO
+# ------------------------------------------------------------
+
+def chave_requisicao(metodo, caminho, corpo, content_type=""):
+    """Hash estável da requisição: JSON canônico ou multipart sem o boundary."""
+    caminho = "/" + caminho.split("/v1/", 1)[-1].lstrip("/")
+    if "json" in content_type:
+        try:
+            dados = json.loads(corpo or b"{}")
+            for campo in CAMPOS_IGNORADOS:
+                dados.pop(campo, None)
+            corpo = json.dumps(dados, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        except ValueError:
+            pass
+    elif "boundary=" in content_type:
+        corpo = _multipart_normalizado(corpo, content_type)
+
+    return hashlib.sha256(metodo.upper().encode() + b" " + caminho.encode() + b"\n" + (corpo or b"")).hexdigest()
+
+
+def _multipart_normalizado(corpo, content_type):
+    """Campos do multipart como (nome, conteúdo), em ordem de nome.
+
+    O boundary e o nome do arquivo (temporário, aleatório) mudam a cada
+    envio; só o nome do campo e o conteúdo identificam a requisição.
+    """
+    boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip('"').encode()
+    campos = []
+    for parte in (corpo or b"").split(b"--" + boundary):
+        cabecalho, separador, conteudo = parte.partition(b"\r\n\r\n")
+        if not separador:
+            continue
+        nome = re.search(rb'name="([^"]*)"', cabecalho)
+        if conteudo.endswith(b"\r\n"):
+            conteudo = conteudo[:-2]
+        campos.append((nome.group(1) if nome else b"", hashlib.sha256(conteudo).digest()))
+    return b"".join(nome + b"=" + digest + b"\n" for nome, digest in sorted(campos))
+
+
+# ------------------------------------------------------------
+# 2. GRAVAÇÃO (TRANSPORTE HTTPX)
+# ------------------------------------------------------------
+
+class TransporteGravador(httpx.BaseTransport):
+    """Repassa ao transporte real e acrescenta cada par requisição/resposta
+    num arquivo JSONL (uma linha por chamada)."""
+
+    def __init__(self, transporte, caminho):
+        self._transporte = transporte
+        self._caminho = caminho
+        self._trava = threading.Lock()
+
+    def handle_request(self, request):
+        corpo_req = request.read()
+        resposta = self._transporte.handle_request(request)
+        corpo_resp = resposta.read()
+
+        content_type = request.headers.get("content-type", "")
+        registro = {
+            "chave": chave_requisicao(request.method, request.url.path, corpo_req, content_type),
+            "metodo": request.method,
+            "caminho": request.url.path,
+            "requisicao": corpo_req.decode("utf-8") if "json" in content_type else None,
+            "status": resposta.status_code,
+            "content_type": resposta.headers.get("content-type", "application/json"),
+            "corpo_b64": base64.b64encode(corpo_resp).decode("ascii"),
+            "gravado_em": time.time(),
+        }
+        with self._trava, open(self._caminho, "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+        # ``read()`` já descomprimiu o corpo: sem tirar Content-Encoding o
+        # httpx tentaria descomprimir de novo (DecodingError)
+        cabecalhos = [
+            (nome, valor) for nome, valor in resposta.headers.multi_items()
+            if nome.lower() not in CABECALHOS_DO_TRANSPORTE
+        ]
+        return httpx.Response(
+            status_code=resposta.status_code,
+            headers=cabecalhos,
+            content=corpo_resp,
+            request=request,
+            extensions=resposta.extensions,
+        )
+
+    def close(self):
+        self._transporte.close()
+
+
+def carregar_gravacoes(caminho):
+    """chave → registro (a última gravação de cada chave prevalece)."""
+    gravacoes = {}
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            if linha.strip():
+                registro = json.loads(linha)
+                gravacoes[registro["chave"]] = registro
+    return gravacoes
+
+
+# ------------------------------------------------------------
+# 3. RESPOSTAS SINTÉTICAS (SEM GRAVAÇÃO)
+# ------------------------------------------------------------
+
+def _resposta_chat(modelo, texto):
+    palavras = len(texto.split())
+    return {
+        "id": f"chatcmpl-sim-{random.randrange(1 << 30)}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": modelo,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": texto},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": palavras, "total_tokens": palavras},
+    }
+
+
+def _resposta_sintetica(caminho, corpo, palavras_resposta):
+    texto = " ".join(["simulado"] * palavras_resposta)
+    if caminho.endswith("/chat/completions"):
+        dados = json.loads(corpo or b"{}")
+        return _resposta_chat(dados.get("model", "simulado"), texto)
+    if caminho.endswith("/audio/transcriptions"):
+        return {
+            "text": texto,
+            "duration": 10.0,
+            "segments": [{"id": 0, "start": 0.0, "end": 10.0, "text": texto}],
+        }
+    return None
+
+
+# ------------------------------------------------------------
+# 4. SERVIDOR COMPATÍVEL COM A OPENAI
+# ------------------------------------------------------------
+
+def _blocos_sse(resposta_chat, palavras_por_bloco):
+    """Quebra uma chat.completion pronta em eventos SSE de chat.completion.chunk."""
+    texto = resposta_chat["choices"][0]["message"]["content"] or ""
+    palavras = texto.split(" ")
+    base = {k: resposta_chat[k] for k in ("id", "created", "model")}
+    base["object"] = "chat.completion.chunk"
+
+    yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    for i in range(0, len(palavras), palavras_por_bloco):
+        pedaco = " ".join(palavras[i:i + palavras_por_bloco])
+        if i:
+            pedaco = " " + pedaco
+        yield {**base, "choices": [{"index": 0, "delta": {"content": pedaco}, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+
+def criar_servidor(gravacoes, porta=8090, latencia_ms=300, jitter_ms=100, primeiro_bloco_ms=200,
+                   intervalo_bloco_ms=30, palavras_por_bloco=3, palavras_resposta=200, estrito=False):
+    """Servidor HTTP com a superfície da OpenAI usada pelo app (chat e transcrição).
+
+    Procura a requisição nas ``gravacoes``; sem gravação devolve uma resposta
+    sintética (ou 404 com ``estrito``). Requisições com "stream": true
+    recebem SSE no ritmo de ``primeiro_bloco_ms`` + ``intervalo_bloco_ms``.
+    """
+    contadores = {"gravadas": 0, "sinteticas": 0, "nao_encontradas": 0}
+    trava = threading.Lock()
+
+    class Manipulador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _enviar(self, status, content_type, corpo):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def _contar(self, chave):
+            with trava:
+                contadores[chave] += 1
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/metricas"):
+                with trava:
+                    corpo = json.dumps(contadores).encode()
+                return self._enviar(200, "application/json", corpo)
+            self._enviar(404, "application/json", b'{"error": {"message": "rota nao simulada"}}')
+
+        def do_POST(self):
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            corpo = self.rfile.read(tamanho)
+            content_type = self.headers.get("Content-Type", "")
+            stream = False
+            if "json" in content_type:
+                try:
+                    stream = bool(json.loads(corpo or b"{}").get("stream"))
+                except ValueError:
+                    pass
+
+            time.sleep(max(0.0, latencia_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+            registro = gravacoes.get(chave_requisicao("POST", self.path, corpo, content_type))
+            if registro is not None:
+                self._contar("gravadas")
+                status = registro["status"]
+                tipo = registro["content_type"]
+                dados = base64.b64decode(registro["corpo_b64"])
+            else:
+                sintetica = None if estrito else _resposta_sintetica(self.path, corpo, palavras_resposta)
+                if sintetica is None:
+                    self._contar("nao_encontradas")
+                    return self._enviar(404, "application/json",
+                                        b'{"error": {"message": "requisicao nao gravada"}}')
+                self._contar("sinteticas")
+                status, tipo, dados = 200, "application/json", json.dumps(sintetica).encode()
+
+            if stream and status == 200 and self.path.endswith("/chat/completions") and "json" in tipo:
+                return self._enviar_stream(json.loads(dados))
+            self._enviar(status, tipo, dados)
+
+        def _enviar_stream(self, resposta_chat):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            time.sleep(primeiro_bloco_ms / 1000)
+            for i, bloco in enumerate(_blocos_sse(resposta_chat, palavras_por_bloco)):
+                if i:
+                    time.sleep(intervalo_bloco_ms / 1000)
+                self.wfile.write(f"data: {json.dumps(bloco, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), Manipulador)
+    servidor.daemon_threads = True
+    servidor.contadores = contadores
+    return servidor
+
+
+# ------------------------------------------------------------
+# 5. LINHA DE COMANDO
+# ------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Servidor local compatível com a OpenAI (aponte OPENAI_BASE_URL para ele)."
+    )
+    parser.add_argument("--gravacoes", help="JSONL gravado com ILUMEO_GRAVAR_LLM")
+    parser.add_argument("--porta", type=int, default=8090)
+    parser.add_argument("--latencia-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--primeiro-bloco-ms", type=float, default=200)
+    parser.add_argument("--intervalo-bloco-ms", type=float, default=30)
+    parser.add_argument("--palavras-por-bloco", type=int, default=3)
+    parser.add_argument("--palavras-resposta", type=int, default=200)
+    parser.add_argument("--estrito", action="store_true", help="404 para requisições não gravadas")
+    args = parser.parse_args()
+
+    gravacoes = carregar_gravacoes(args.gravacoes) if args.gravacoes else {}
+    servidor = criar_servidor(
+        gravacoes,
+        porta=args.porta,
+        latencia_ms=args.latencia_ms,
+        jitter_ms=args.jitter_ms,
+        primeiro_bloco_ms=args.primeiro_bloco_ms,
+        intervalo_bloco_ms=args.intervalo_bloco_ms,
+        palavras_por_bloco=args.palavras_por_bloco,
+        palavras_resposta=args.palavras_resposta,
+        estrito=args.estrito,
+    )
+    print(f"Simulador em http://127.0.0.1:{args.porta}/v1 ({len(gravacoes)} gravações)", flush=True)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
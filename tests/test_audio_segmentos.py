@@ -0,0 +1,64 @@
+# ============================================================
+#  ILUMEO - TESTES DA DIVISÃO E DA JUNÇÃO DAS PARTES TRANSCRITAS
+# ============================================================
+
+import pytest
+
+import audio_ilumeo
+from audio_ilumeo import (
+    LIMITE_WHISPER_BYTES,
+    alvo_por_tamanho,
+    planejar_segmentos,
+    transcrever_com_tempos,
+)
+
+# duas partes com 4 s de sobreposição (298–302): o corte fica em 300
+PARTES = [(0.0, 302.0), (298.0, 600.0)]
+
+
+def _com_partes(monkeypatch, trechos_por_parte):
+    """Substitui o corte + Whisper por trechos fixos (tempos relativos a cada parte)."""
+    def falso(caminho, transcrever, alvo, max_simultaneas, preparar, cancelar):
+        return list(zip(PARTES, trechos_por_parte))
+
+    monkeypatch.setattr(audio_ilumeo, "_transcrever_partes", falso)
+
+
+def _itens(segmentos):
+    return [(pytest.approx(i), texto) for i, _, texto in segmentos]
+
+
+def test_trecho_que_atravessa_o_corte_fica_so_com_a_parte_onde_comeca(monkeypatch):
+    # o trecho real vai de 295 a 305; cada parte só ouve um pedaço dele
+    _com_partes(monkeypatch, [
+        [(10.0, 5.0, "antes"), (295.0, 7.0, "atravessa")],
+        [(0.0, 7.0, "atravessa"), (20.0, 5.0, "depois")],
+    ])
+    segmentos = transcrever_com_tempos("audio.mp3", None)
+
+    assert _itens(segmentos) == [(10.0, "antes"), (295.0, "atravessa"), (318.0, "depois")]
+
+
+def test_trecho_que_comeca_depois_do_corte_fica_com_a_parte_seguinte(monkeypatch):
+    # de 300.5 a 303: a parte anterior o ouve truncado em 302
+    _com_partes(monkeypatch, [
+        [(300.5, 1.5, "seguinte")],
+        [(2.5, 2.5, "seguinte")],
+    ])
+    segmentos = transcrever_com_tempos("audio.mp3", None)
+
+    assert _itens(segmentos) == [(300.5, "seguinte")]
+
+
+@pytest.mark.parametrize("duracao", [200.0, 1800.0])
+def test_arquivo_pesado_sem_preparar_gera_segmentos_abaixo_do_limite(duracao):
+    # vídeo enviado como está: ~400 KB/s, bem acima do áudio preparado
+    tamanho = duracao * 400_000
+    alvo = alvo_por_tamanho(tamanho, duracao)
+    # silêncios na borda da janela: o planejamento estica cada segmento ao máximo
+    silencios = [(k * alvo * 1.2 - 0.1, k * alvo * 1.2 + 0.1) for k in range(1, 100)]
+
+    segmentos = planejar_segmentos(duracao, silencios, alvo=alvo)
+
+    assert len(segmentos) > 1
+    assert all((fim - ini) * tamanho / duracao < LIMITE_WHISPER_BYTES for ini, fim in segmentos)
@@ -0,0 +1,90 @@
+# ============================================================
+#  ILUMEO - TESTES DO MODO EM LOTE (BATCH API) COM O SUBSTITUTO LOCAL
+# ============================================================
+
+import os
+
+import pytest
+
+from conteudo_ilumeo import CANAIS, gerar_em_lote
+from openai_ilumeo import ClienteLoteLocal
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PESQUISAS = {"a.xlsx": "JSON-A", "b.xlsx": "JSON-B"}
+
+
+@pytest.fixture(autouse=True)
+def _na_raiz(monkeypatch):
+    # os prompts dos canais são lidos de prompts/, relativo à raiz
+    monkeypatch.chdir(RAIZ)
+
+
+def _identificar(corpo):
+    """(etapa, pesquisa) a partir do texto enviado numa requisição do lote."""
+    conteudo = corpo["messages"][-1]["content"]
+    for nome, json_text in PESQUISAS.items():
+        if json_text in conteudo:
+            return "insights", nome
+        if f"INSIGHTS-{nome}" in conteudo:
+            canal = next(chave for chave, _, _, esperado in CANAIS if esperado in conteudo)
+            return canal, nome
+    raise AssertionError("requisição sem pesquisa identificável")
+
+
+def _responder(falhas=()):
+    vistos = []
+
+    def responder(corpo):
+        etapa, nome = _identificar(corpo)
+        vistos.append((etapa, nome))
+        if (etapa, nome) in falhas:
+            raise RuntimeError(f"falha simulada em {etapa}")
+        return f"INSIGHTS-{nome}" if etapa == "insights" else f"{etapa} de {nome}"
+
+    return responder, vistos
+
+
+def test_respostas_mapeadas_por_custom_id():
+    responder, _ = _responder()
+    saida = gerar_em_lote(PESQUISAS, ClienteLoteLocal(responder), modelo="m", intervalo=0)
+
+    for nome in PESQUISAS:
+        assert saida[nome]["insights"] == f"INSIGHTS-{nome}"
+        assert saida[nome]["canais"] == {chave: f"{chave} de {nome}" for chave, _, _, _ in CANAIS}
+        assert saida[nome]["erros"] == []
+        assert f"## LinkedIn\n\nlinkedin de {nome}" in saida[nome]["conteudos"]
+
+
+def test_erro_de_uma_requisicao_fica_so_nela():
+    responder, _ = _responder(falhas={("release", "a.xlsx")})
+    saida = gerar_em_lote(PESQUISAS, ClienteLoteLocal(responder), modelo="m", intervalo=0)
+
+    assert saida["a.xlsx"]["erros"] == ["release: falha simulada em release"]
+    assert "release" not in saida["a.xlsx"]["canais"]
+    assert len(saida["a.xlsx"]["canais"]) == len(CANAIS) - 1
+    assert saida["a.xlsx"]["conteudos"] == ""  # incompleto: sem markdown montado
+
+    assert saida["b.xlsx"]["erros"] == []
+    assert len(saida["b.xlsx"]["canais"]) == len(CANAIS)
+
+
+def test_pesquisa_sem_insight_nao_gera_canais():
+    responder, vistos = _responder(falhas={("insights", "b.xlsx")})
+    saida = gerar_em_lote(PESQUISAS, ClienteLoteLocal(responder), modelo="m", intervalo=0)
+
+    assert saida["b.xlsx"]["erros"] == ["insights: falha simulada em insights"]
+    assert saida["b.xlsx"]["insights"] == ""
+    assert saida["b.xlsx"]["canais"] == {}
+    assert [etapa for etapa, nome in vistos if nome == "b.xlsx"] == ["insights"]
+
+    assert len(saida["a.xlsx"]["canais"]) == len(CANAIS)
+
+
+def test_todas_as_pesquisas_sem_insight_dispensa_o_segundo_lote():
+    responder, vistos = _responder(falhas={("insights", n) for n in PESQUISAS})
+    cliente = ClienteLoteLocal(responder)
+    saida = gerar_em_lote(PESQUISAS, cliente, modelo="m", intervalo=0)
+
+    assert all(item["canais"] == {} for item in saida.values())
+    assert {etapa for etapa, _ in vistos} == {"insights"}
+    assert len(cliente._lotes) == 1
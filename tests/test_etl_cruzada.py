@@ -0,0 +1,27 @@
+# ============================================================
+#  ILUMEO - TESTES DA TABELA CRUZADA (DUCKDB)
+# ============================================================
+
+import pandas as pd
+import pytest
+
+from etl_ilumeo2 import registrar_pesquisa_duckdb, tabela_cruzada, tabelas_simples
+
+pytest.importorskip("duckdb")
+
+
+def test_notas_mantem_os_rotulos_das_tabelas_de_frequencia():
+    df = pd.DataFrame({
+        "Nota": [10.0, 0.0, 10.0, 5.0],
+        "Gênero": ["F", "M", "F", "M"],
+        "Usa? - Nike": ["Nike", None, "Nike", "Nike"],
+    })
+    con = registrar_pesquisa_duckdb(df)
+
+    por_genero = tabela_cruzada(con, "Nota", "Gênero")
+    por_marca = tabela_cruzada(con, "Usa?", "Nota")
+
+    rotulos = set(tabelas_simples(df, ["Nota"])["Nota"].index)
+    assert set(por_genero.index) == rotulos == {0.0, 5.0, 10.0}
+    assert set(por_marca.columns) <= rotulos  # quem deu 0 não marcou Nike
+    assert por_genero.loc[10.0, "F"] == 2
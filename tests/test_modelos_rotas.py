@@ -0,0 +1,29 @@
+# ============================================================
+#  ILUMEO - TESTES DAS ROTAS DE MODELO VINDAS DO AMBIENTE
+# ============================================================
+
+import pytest
+
+from modelos_ilumeo import ROTAS_PADRAO, _carregar_rotas
+
+
+@pytest.mark.parametrize("valor", ["{release: economica}", '["economica"]', '"forte"'])
+def test_valor_malformado_volta_para_as_rotas_padrao(monkeypatch, caplog, valor):
+    monkeypatch.setenv("ILUMEO_ROTAS_MODELOS", valor)
+
+    assert _carregar_rotas() == ROTAS_PADRAO
+    assert "ILUMEO_ROTAS_MODELOS ignorado" in caplog.text
+
+
+def test_faixa_e_modelo_conhecido_valem_e_o_resto_e_ignorado(monkeypatch, caplog):
+    monkeypatch.setenv(
+        "ILUMEO_ROTAS_MODELOS",
+        '{"release": "economica", "blog": "gpt-4.1", "linkedin": "gtp-4o", "relese": "forte"}',
+    )
+    rotas = _carregar_rotas()
+
+    assert rotas["release"] == "economica"
+    assert rotas["blog"] == "gpt-4.1"
+    assert rotas["linkedin"] == ROTAS_PADRAO["linkedin"]
+    assert "relese" not in rotas
+    assert "'gtp-4o'" in caplog.text and "'relese'" in caplog.text
@@ -0,0 +1,29 @@
+# ============================================================
+#  ILUMEO - TESTES DO ARMAZÉM DE TRANSCRIÇÕES (SQLITE)
+# ============================================================
+
+import threading
+
+import transcricoes_ilumeo
+from transcricoes_ilumeo import buscar_transcricao, salvar_resumo_trecho, salvar_transcricao
+
+
+def test_esquema_roda_uma_vez_por_banco(monkeypatch, tmp_path):
+    chamadas = []
+    original = transcricoes_ilumeo._criar_esquema
+    monkeypatch.setattr(transcricoes_ilumeo, "_criar_esquema",
+                        lambda con: chamadas.append(1) or original(con))
+    caminho = str(tmp_path / "cache" / "t.sqlite3")
+
+    salvar_transcricao("v1", "olá mundo", "legenda", caminho=caminho)
+    salvar_resumo_trecho("h1", "resumo", caminho=caminho)
+    assert buscar_transcricao("v1", caminho=caminho)["texto"] == "olá mundo"
+
+    # outra thread abre a própria conexão, mas não recria o esquema
+    resultado = []
+    t = threading.Thread(target=lambda: resultado.append(buscar_transcricao("v1", caminho=caminho)))
+    t.start()
+    t.join()
+
+    assert resultado[0]["origem"] == "legenda"
+    assert len(chamadas) == 1
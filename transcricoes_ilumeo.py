@@ -0,0 +1,266 @@
+# ============================================================
+#  ILUMEO - ARMAZÉM PERSISTENTE DE TRANSCRIÇÕES
+#  SQLite por ID do vídeo + idioma (ou hash do áudio), com despejo LRU
+#  + resumos de trechos usados na geração de blogs longos
+#  Franciane Rodrigues
+# ============================================================
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from segmentos_ilumeo import para_bytes, de_bytes
+
+CAMINHO_BANCO = os.getenv("ILUMEO_TRANSCRICOES_DB", os.path.join("cache", "transcricoes.sqlite3"))
+
+# Limites do armazém: o que passar disso sai pelo acesso mais antigo (LRU)
+MAX_TRANSCRICOES = 2000
+MAX_BYTES = 200 * 1024 * 1024
+
+ORIGENS = ("legenda", "whisper", "upload")
+
+# Uploads sem vídeo associado entram com esta chave no lugar do video_id
+PREFIXO_AUDIO = "audio:"
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+MAX_RESUMOS = 20000
+
+
+# ------------------------------------------------------------
+# 1. CONEXÃO E ESQUEMA
+# ------------------------------------------------------------
+
+# Esquema pronto, por caminho do banco (uma vez por processo)
+_esquemas_prontos = set()
+_trava_esquema = threading.Lock()
+
+# Conexões abertas, por thread e caminho: sqlite3 não compartilha entre threads
+_por_thread = threading.local()
+
+
+def _criar_esquema(con):
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS transcricoes (
+            video_id      TEXT NOT NULL,
+            idioma        TEXT NOT NULL,
+            origem        TEXT NOT NULL,
+            hash_audio    TEXT,
+            texto         TEXT NOT NULL,
+            bytes         INTEGER NOT NULL,
+            criado_em     REAL NOT NULL,
+            ultimo_acesso REAL NOT NULL,
+            segmentos     BLOB,
+            PRIMARY KEY (video_id, idioma)
+        )
+        """
+    )
+    # bancos criados antes da coluna de segmentos com tempo
+    colunas = {linha[1] for linha in con.execute("PRAGMA table_info(transcricoes)")}
+    if "segmentos" not in colunas:
+        con.execute("ALTER TABLE transcricoes ADD COLUMN segmentos BLOB")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_acesso ON transcricoes (ultimo_acesso)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_hash_audio ON transcricoes (hash_audio)")
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS resumos_trechos (
+            hash_trecho   TEXT PRIMARY KEY,
+            resumo        TEXT NOT NULL,
+            ultimo_acesso REAL NOT NULL
+        )
+        """
+    )
+
+
+def _conexao(caminho):
+    conexoes = getattr(_por_thread, "conexoes", None)
+    if conexoes is None:
+        conexoes = _por_thread.conexoes = {}
+    con = conexoes.get(caminho)
+    if con is not None:
+        return con
+
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    con = sqlite3.connect(caminho, timeout=30)
+    with _trava_esquema:
+        if caminho not in _esquemas_prontos:
+            _criar_esquema(con)
+            _esquemas_prontos.add(caminho)
+    conexoes[caminho] = con
+    return con
+
+
+@contextmanager
+def _conectar(caminho=None):
+    """Transação na conexão desta thread com o banco (aberta uma vez e reaproveitada)."""
+    con = _conexao(os.path.abspath(caminho or CAMINHO_BANCO))
+    with con:
+        yield con
+
+
+# ------------------------------------------------------------
+# 2. LEITURA E GRAVAÇÃO
+# ------------------------------------------------------------
+
+def _segmentos_salvos(blob, texto):
+    return de_bytes(blob, texto) if blob else None
+
+
+def buscar_transcricao(video_id, idioma="pt", caminho=None):
+    """Devolve {"texto", "origem", "hash_audio", "segmentos"} ou None se o vídeo não estiver salvo.
+
+    ``segmentos`` é um Segmentos (com tempos) ou None para transcrições sem tempo.
+    """
+    with _conectar(caminho) as con:
+        linha = con.execute(
+            "SELECT texto, origem, hash_audio, segmentos FROM transcricoes WHERE video_id = ? AND idioma = ?",
+            (video_id, idioma),
+        ).fetchone()
+        if linha is None:
+            return None
+
+        con.execute(
+            "UPDATE transcricoes SET ultimo_acesso = ? WHERE video_id = ? AND idioma = ?",
+            (time.time(), video_id, idioma),
+        )
+
+    texto, origem, hash_audio, blob = linha
+    return {
+        "texto": texto,
+        "origem": origem,
+        "hash_audio": hash_audio,
+        "segmentos": _segmentos_salvos(blob, texto),
+    }
+
+
+def salvar_transcricao(video_id, texto, origem, idioma="pt", hash_audio=None,
+                       segmentos=None, caminho=None):
+    """Grava a transcrição; com ``segmentos`` o texto deve ser ``segmentos.texto``."""
+    if origem not in ORIGENS:
+        raise ValueError(f"Origem de transcrição inválida: {origem}")
+
+    blob = para_bytes(segmentos) if segmentos is not None else None
+    tamanho = len(texto.encode("utf-8")) + (len(blob) if blob else 0)
+
+    agora = time.time()
+    with _conectar(caminho) as con:
+        con.execute(
+            """
+            INSERT OR REPLACE INTO transcricoes
+                (video_id, idioma, origem, hash_audio, texto, bytes, criado_em, ultimo_acesso, segmentos)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (video_id, idioma, origem, hash_audio, texto, tamanho, agora, agora, blob),
+        )
+        _aplicar_limites(con)
+
+
+def buscar_por_hash_audio(hash_audio, idioma="pt", caminho=None):
+    """Procura a transcrição de um áudio idêntico (mesmo sha256), venha ele
+    de upload ou do download de um vídeo. Devolve o mesmo dict de
+    buscar_transcricao, com "video_id", ou None."""
+    with _conectar(caminho) as con:
+        linha = con.execute(
+            """
+            SELECT rowid, video_id, texto, origem, segmentos FROM transcricoes
+            WHERE hash_audio = ? AND idioma = ?
+            ORDER BY ultimo_acesso DESC LIMIT 1
+            """,
+            (hash_audio, idioma),
+        ).fetchone()
+        if linha is None:
+            return None
+
+        rowid, video_id, texto, origem, blob = linha
+        con.execute(
+            "UPDATE transcricoes SET ultimo_acesso = ? WHERE rowid = ?", (time.time(), rowid)
+        )
+
+    return {
+        "texto": texto,
+        "origem": origem,
+        "hash_audio": hash_audio,
+        "segmentos": _segmentos_salvos(blob, texto),
+        "video_id": video_id,
+    }
+
+
+def buscar_resumo_trecho(hash_trecho, caminho=None):
+    with _conectar(caminho) as con:
+        linha = con.execute(
+            "SELECT resumo FROM resumos_trechos WHERE hash_trecho = ?", (hash_trecho,)
+        ).fetchone()
+        if linha is None:
+            return None
+        con.execute(
+            "UPDATE resumos_trechos SET ultimo_acesso = ? WHERE hash_trecho = ?",
+            (time.time(), hash_trecho),
+        )
+    return linha[0]
+
+
+def salvar_resumo_trecho(hash_trecho, resumo, caminho=None):
+    with _conectar(caminho) as con:
+        con.execute(
+            "INSERT OR REPLACE INTO resumos_trechos (hash_trecho, resumo, ultimo_acesso) VALUES (?, ?, ?)",
+            (hash_trecho, resumo, time.time()),
+        )
+        con.execute(
+            """
+            DELETE FROM resumos_trechos WHERE hash_trecho IN (
+                SELECT hash_trecho FROM resumos_trechos
+                ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (MAX_RESUMOS,),
+        )
+
+
+# ------------------------------------------------------------
+# 3. HASH DO ÁUDIO
+# ------------------------------------------------------------
+
+def chave_audio(hash_audio):
+    return f"{PREFIXO_AUDIO}{hash_audio}"
+
+
+def hash_arquivo(caminho):
+    """sha256 do arquivo, lido em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+# ------------------------------------------------------------
+# 4. DESPEJO LRU
+# ------------------------------------------------------------
+
+def _aplicar_limites(con, max_itens=None, max_bytes=None):
+    max_itens = MAX_TRANSCRICOES if max_itens is None else max_itens
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+
+    total_itens, total_bytes = con.execute(
+        "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM transcricoes"
+    ).fetchone()
+    if total_itens <= max_itens and total_bytes <= max_bytes:
+        return
+
+    remover = []
+    for rowid, tamanho in con.execute(
+        "SELECT rowid, bytes FROM transcricoes ORDER BY ultimo_acesso ASC"
+    ):
+        if total_itens <= max_itens and total_bytes <= max_bytes:
+            break
+        remover.append((rowid,))
+        total_itens -= 1
+        total_bytes -= tamanho
+
+    con.executemany("DELETE FROM transcricoes WHERE rowid = ?", remover)